@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+"""
+Benchmarks of gsidiag on synthetic GSI diagnostics files (see gsidiag.synthetic).
+
+The files of a few cycles are written at each scale (number of observations of each
+conventional variable), and the main stages are timed: reading a first guess file,
+reading a pair of ges/anl files, time_series, statcount, tocsv and the map of one
+cycle. Each stage is run --repeat times and the best time is kept. The files are
+detached once read (see read_diag.detach), so the same files can be read again.
+
+The results are appended to a CSV file (one row per version, scale and stage), and
+compared with the results of the previous version (or commit) in the same file: the
+stages slower than the previous version by more than --threshold are reported, and
+the exit status is 1.
+
+    python benchmarks/bench.py --scales 10000,100000 --repeat 3
+    python benchmarks/bench.py --scales 10000 --only read_ges,read_pair
+
+The times depend on the machine, so the results of different machines should be kept
+in different files (--results).
+"""
+import argparse
+import csv
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+STAGES = ['read_ges', 'read_pair', 'time_series', 'statcount', 'tocsv', 'map']
+
+FIELDS = ['version', 'commit', 'date', 'scale', 'stage', 'seconds']
+
+
+def _commit():
+    try:
+        out = subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def _best(function, repeat):
+    """
+    Returns the best time of repeat runs of function (and its last result).
+    """
+    best, result = None, None
+    for _ in range(repeat):
+        start  = time.perf_counter()
+        result = function()
+        spent  = time.perf_counter() - start
+        best   = spent if best is None else min(best, spent)
+    return best, result
+
+
+def writeData(path, scale, nCycles, dateIni):
+    """
+    Writes the ges/anl conventional files of nCycles cycles (6 hours apart) and the
+    amsua files of the first cycle. Returns the templates of the files.
+    """
+    import gsidiag as gd
+
+    date = datetime.strptime(dateIni, '%Y%m%d%H')
+    for i in range(nCycles):
+        sensors = {'amsua': ['n19']} if i == 0 else None
+        gd.writeCycle(path, (date + timedelta(hours=6 * i)).strftime('%Y%m%d%H'), nobs=scale, sensors=sensors)
+
+    return (os.path.join(path, 'diag_conv_01.%Y%m%d%H'), os.path.join(path, 'diag_conv_03.%Y%m%d%H'),
+            os.path.join(path, 'diag_amsua_n19_01.%Y%m%d%H'))
+
+
+def runScale(scale, stages, repeat, nCycles, workdir):
+    """
+    Times the stages at one scale. Returns a dict {stage: seconds}.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import gsidiag as gd
+
+    dateIni = '2020010100'
+    data    = os.path.join(workdir, 'data_' + str(scale))
+    ges, anl, rad = writeData(data, scale, nCycles, dateIni)
+    date    = datetime.strptime(dateIni, '%Y%m%d%H')
+    dateFin = (date + timedelta(hours=6 * (nCycles - 1))).strftime('%Y%m%d%H')
+    first   = [date.strftime(ges), date.strftime(anl)]
+    period  = dict(dateIni=dateIni, dateFin=dateFin, nHour='06')
+
+    figs = os.path.join(workdir, 'figs_' + str(scale))
+    os.makedirs(figs, exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(figs)
+
+    times  = {}
+    cycles = None
+    try:
+        if 'read_ges' in stages:
+            times['read_ges'], diag = _best(lambda: gd.read_diag(first[0]).detach(), repeat)
+        if 'read_pair' in stages:
+            times['read_pair'], diag = _best(lambda: gd.read_diag(*first).detach(), repeat)
+        if 'read_rad' in stages:
+            times['read_rad'], diag = _best(lambda: gd.read_diag(date.strftime(rad)).detach(), repeat)
+
+        if any(stage in stages for stage in ['time_series', 'statcount', 'tocsv']):
+            cycles = [gd.read_diag((date + timedelta(hours=6 * i)).strftime(ges),
+                                   (date + timedelta(hours=6 * i)).strftime(anl)).detach() for i in range(nCycles)]
+
+        if 'time_series' in stages:
+            times['time_series'], _ = _best(lambda: gd.plot_diag.time_series(cycles, varName='t', varType=120, Level=500,
+                                                                            **period), repeat)
+            plt.close('all')
+        if 'statcount' in stages:
+            times['statcount'], _ = _best(lambda: gd.plot_diag.statcount(cycles, varName='t', varType=120, figTS=True,
+                                                                        **period), repeat)
+            plt.close('all')
+        if 'tocsv' in stages:
+            times['tocsv'], _ = _best(lambda: gd.read_diag.tocsv(cycles, varName='t', varType=120, Level=500, **period),
+                                      repeat)
+        if 'map' in stages:
+            if cycles is None:
+                cycles = [gd.read_diag(*first).detach()]
+
+            def drawMap():
+                gd.plot_diag.plot(cycles[0], 't', 120, 'omf', render='density', legend=True)
+                plt.savefig('map.png', dpi=100)
+                plt.close('all')
+            times['map'], _ = _best(drawMap, repeat)
+    finally:
+        os.chdir(cwd)
+    return times
+
+
+def loadResults(fileName):
+    if not os.path.exists(fileName):
+        return []
+    with open(fileName, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def saveResults(fileName, rows):
+    new = not os.path.exists(fileName)
+    with open(fileName, 'a', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        if new:
+            writer.writeheader()
+        writer.writerows(rows)
+
+
+def regressions(previous, rows, threshold):
+    """
+    Compares rows with the results of the last other version (or commit) in previous.
+    Returns a list of (scale, stage, before, now) of the stages slower than before by
+    more than threshold (a fraction).
+    """
+    current = {(rows[0]['version'], rows[0]['commit'])} if rows else set()
+    others  = [r for r in previous if (r['version'], r['commit']) not in current]
+    if len(others) == 0:
+        return []
+    last = (others[-1]['version'], others[-1]['commit'])
+    base = {}
+    for r in others:
+        if (r['version'], r['commit']) == last:
+            key = (r['scale'], r['stage'])
+            base[key] = min(base.get(key, float('inf')), float(r['seconds']))
+
+    slower = []
+    for r in rows:
+        key = (str(r['scale']), r['stage'])
+        if key in base and float(r['seconds']) > base[key] * (1.0 + threshold):
+            slower.append((r['scale'], r['stage'], base[key], float(r['seconds'])))
+    return slower
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description='Benchmarks of gsidiag on synthetic diagnostics files.')
+    p.add_argument('--scales', default='10000,100000',
+                   help='observations of each conventional variable, comma separated (default: 10000,100000)')
+    p.add_argument('--only', default=','.join(STAGES),
+                   help='stages to be run, comma separated (default: all; read_rad is also available)')
+    p.add_argument('--repeat', type=int, default=3, help='runs of each stage; the best time is kept (default: 3)')
+    p.add_argument('--cycles', type=int, default=4, help='cycles of the time series, statcount and tocsv (default: 4)')
+    p.add_argument('--results', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results.csv'),
+                   help='CSV file of the results (default: benchmarks/results.csv)')
+    p.add_argument('--threshold', type=float, default=0.25, help='slowdown reported as a regression (default: 0.25)')
+    p.add_argument('--workdir', default=None, help='directory of the synthetic files (default: a temporary directory)')
+    args = p.parse_args(argv)
+
+    import gsidiag as gd
+
+    stages  = args.only.split(',')
+    version = gd.__version__
+    commit  = _commit()
+    now     = datetime.now().strftime('%Y-%m-%d %H:%M')
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = args.workdir or tmp
+        for scale in [int(float(s)) for s in args.scales.split(',')]:
+            times = runScale(scale, stages, args.repeat, args.cycles, workdir)
+            for stage, seconds in times.items():
+                print('{:>10d} {:<12s} {:10.3f} s'.format(scale, stage, seconds))
+                rows.append(dict(version=version, commit=commit, date=now, scale=scale, stage=stage,
+                                 seconds='{:.4f}'.format(seconds)))
+
+    slower = regressions(loadResults(args.results), rows, args.threshold)
+    saveResults(args.results, rows)
+
+    for scale, stage, before, seconds in slower:
+        print('regression: {} at {}: {:.3f} s -> {:.3f} s'.format(stage, scale, before, seconds))
+    return 1 if slower else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
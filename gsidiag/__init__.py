@@ -21,8 +21,55 @@
 This package defines some functions to read and plot gsi diagnostic files.\
 For help please use help() function.
 """
-from .__main__ import (help,getColor,geoMap,setcolor,read_diag,plot_diag)
-from .datasources import getVarInfo
+import importlib
+
+# The public names of the package and the module defining each one. The modules are
+# imported on the first use of one of their names (PEP 562), so that importing gsidiag
+# is cheap; the plotting packages are only loaded when a figure is drawn.
+_EXPORTS = {'help'                 : '__main__',
+            'getColor'             : '__main__',
+            'geoMap'               : '__main__',
+            'setcolor'             : '__main__',
+            'read_diag'            : '__main__',
+            'plot_diag'            : '__main__',
+            'getVarInfo'           : 'datasources',
+            'getVarInfos'          : 'datasources',
+            'cycleDates'           : 'loader',
+            'loadCycles'           : 'loader',
+            'diagCollection'       : 'loader',
+            'publish'              : 'sharedmem',
+            'attach'               : 'sharedmem',
+            'diagCube'             : 'cube',
+            'impactSummary'        : 'cube',
+            'classify'             : 'qc',
+            'countCategories'      : 'qc',
+            'radTable'             : 'radiance',
+            'runningMoments'       : 'moments',
+            'diagSketch'           : 'sketch',
+            'innovationCorrelation': 'correlation',
+            'latlonGrid'           : 'grid',
+            'REGIONS'              : 'regions',
+            'spatialIndex'         : 'regions',
+            'compileMask'          : 'masks',
+            'readProfile'          : 'profiling',
+            'addHook'              : 'profiling',
+            'removeHook'           : 'profiling',
+            'writeConv'            : 'synthetic',
+            'writeRad'             : 'synthetic',
+            'writeCycle'           : 'synthetic',
+            'renderFigures'        : 'render'}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError("module 'gsidiag' has no attribute " + repr(name))
+    value = getattr(importlib.import_module('.' + _EXPORTS[name], 'gsidiag'), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
 
 __name__    = 'readDiag'
 __version__ = '1.3.2'
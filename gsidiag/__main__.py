@@ -24,22 +24,66 @@
 """
 This module defines the majority of gsidiag functions, including all plot types
 """
-from diag2python import diag2python as d2p
-from .datasources import getVarInfo
+import importlib
+from .datasources import getVarInfo, getVarInfos
+from .cube import diagCube, layerBounds
+from .qc import (classify, countCategories, ASSIMILATED, MONITORED, REJECTED, MONITORED_ASSIM,
+                 MONITORED_REJECT, NCATEGORIES)
+from .radiance import radTable, lazyTables
+from .grid import latlonGrid
+from .regions import spatialIndex, getRegion, regionKey, regionTable
+from .masks import compileMask, selectTable
+from .profiling import profiler, fileBytes
 import pandas as pd
-import geopandas as gpd
 import numpy as np
 from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
-from mpl_toolkits.axes_grid1 import make_axes_locatable
-from cartopy import crs as ccrs
 import gc
 import sys
 from textwrap import wrap
-import matplotlib as mpl
-import matplotlib.ticker as mticker
-from matplotlib.offsetbox import AnchoredOffsetbox, TextArea, HPacker, VPacker
+
+class _lazyModule(object):
+    """
+    A module imported on the first access to one of its attributes.
+
+    The reader of the diagnostics files and the plotting and geospatial packages are
+    only loaded by the functions that use them, so that importing gsidiag (e.g. in a
+    batch job that only writes tables with tocsv) does not pay their import time.
+
+    Args:
+        name (str): The name of the module.
+        attr (str): An attribute of the module to be used instead (e.g. the Fortran
+                    module of an f2py extension).
+    """
+    def __init__(self, name, attr=None):
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_attr', attr)
+        object.__setattr__(self, '_module', None)
+
+    def _load(self):
+        if self._module is None:
+            module = importlib.import_module(self._name)
+            if self._attr is not None:
+                module = getattr(module, self._attr)
+            object.__setattr__(self, '_module', module)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+d2p        = _lazyModule('diag2python', 'diag2python')
+gpd        = _lazyModule('geopandas')
+mpl        = _lazyModule('matplotlib')
+plt        = _lazyModule('matplotlib.pyplot')
+mpatches   = _lazyModule('matplotlib.patches')
+mticker    = _lazyModule('matplotlib.ticker')
+mpath      = _lazyModule('matplotlib.path')
+mcoll      = _lazyModule('matplotlib.collections')
+offsetbox  = _lazyModule('matplotlib.offsetbox')
+axes_grid1 = _lazyModule('mpl_toolkits.axes_grid1')
+ccrs       = _lazyModule('cartopy.crs')
 
 def help():
     print('Esta é uma ajudada')
@@ -57,7 +101,7 @@ def getColor(minVal, maxVal, value, hex=False, cmapName=None):
         cmapName='Paired'
 
     # Get a color map
-    cmap = cm.get_cmap(cmapName)
+    cmap = mpl.colormaps[cmapName]
 
     # Get normalize function (takes data in range [vmin, vmax] -> [0, 1])
     norm = Normalize(vmin=minVal, vmax=maxVal)
@@ -80,6 +124,42 @@ def getColor(minVal, maxVal, value, hex=False, cmapName=None):
 
     return color
 
+# base map layers already prepared: the Natural Earth table ('world'), its plot aspect
+# ('aspect') and the country outlines of each map area, as matplotlib paths
+_BASEMAP = {}
+
+def _polygonPath(polygon):
+    """
+    Converts a polygon (with its holes) to a matplotlib Path.
+    """
+    rings    = [np.asarray(polygon.exterior.coords)[:, :2]] + [np.asarray(r.coords)[:, :2] for r in polygon.interiors]
+    vertices = np.concatenate(rings)
+    codes    = np.concatenate([[mpath.Path.MOVETO] + [mpath.Path.LINETO]*(len(r)-2) + [mpath.Path.CLOSEPOLY] for r in rings])
+    return mpath.Path(vertices, codes)
+
+def _baseMap(area=None):
+    """
+    Returns the country outlines (a list of paths) of the map of area, and the aspect
+    of the map. The Natural Earth file is read once, and the outlines of each area
+    are converted once and reused by all the following maps.
+    """
+    if 'world' not in _BASEMAP:
+        world = gpd.read_file(gpd.datasets.get_path('naturalearth_lowres'))
+        miny, maxy = world.total_bounds[[1, 3]]
+        _BASEMAP['world']  = world
+        _BASEMAP['aspect'] = 1.0 / np.cos(np.radians((miny + maxy) / 2.0))
+
+    key = None if not area else tuple(area)
+    if key not in _BASEMAP:
+        world = _BASEMAP['world']
+        if key is not None and area[0] <= area[2]:
+            # only the countries seen in the map
+            world = world.cx[area[0]:area[2], area[1]:area[3]]
+        _BASEMAP[key] = [_polygonPath(polygon) for geom in world.geometry if geom is not None
+                                               for polygon in getattr(geom, 'geoms', [geom])]
+
+    return _BASEMAP[key], _BASEMAP['aspect']
+
 def geoMap(area=None,**kwargs):
     
     if 'ax' not in kwargs:
@@ -89,14 +169,10 @@ def geoMap(area=None,**kwargs):
         ax = kwargs['ax']
         del kwargs['ax']
 
-    
-    path=gpd.datasets.get_path('naturalearth_lowres')
-    
-    world = gpd.read_file(path)
-    gdp_max = world['gdp_md_est'].max()
-    gdp_min = world['gdp_md_est'].min()
-    
-    ax = world.plot(ax=ax, facecolor='lightgrey', edgecolor='k')#,**kwargs)
+    # the countries are drawn as a single collection of cached paths
+    paths, aspect = _baseMap(area)
+    ax.add_collection(mcoll.PathCollection(paths, facecolor='lightgrey', edgecolor='k'))
+    ax.set_aspect(aspect)
     
     ax.set_xlabel('Longitude')
     ax.set_ylabel('Latitude')
@@ -121,15 +197,562 @@ class setcolor:
     BOLD      = '\033[1m'
     UNDERLINE = '\033[4m'
 
+def _geoTable(d):
+    """
+    Builds the GeoDataFrame of a table of observations, with the point geometry
+    taken from its lat/lon columns (longitudes normalized to [-180, 180)).
+    The columns of d are not copied.
+    """
+    lon = (d.lon + 180) % 360 - 180
+    lat = d.lat
+    return gpd.GeoDataFrame(d, geometry=gpd.points_from_xy(lon,lat), copy=False)
+
+def _getCycle(cycles, f, date):
+    """
+    Returns the read_diag object of the cycle at date. Collections that know the
+    date of each cycle (cycleList, diagCollection) are searched by date; plain
+    lists are indexed by the position f. Missing cycles are returned as None.
+    """
+    dates = getattr(cycles, 'dates', None)
+    if dates is None:
+        if f >= len(cycles):
+            return None
+        return cycles[f]
+
+    if date not in dates:
+        return None
+
+    return cycles[dates.index(date)]
+
+def _cycleLevels(cycles, dates):
+    """
+    Returns the levels (zlevs) of the first cycle of dates that could be read, or those
+    of the cube if cycles is a diagCube or none of the cycles could be read.
+    """
+    if isinstance(cycles, diagCube):
+        return cycles.zlevs
+    for f, date in enumerate(dates):
+        diag = _getCycle(cycles, f, date)
+        if diag is not None:
+            return diag.zlevs
+    return diagCube().zlevs
+
+def _cycleCube(cycles, varName, mask, dates, cube=None, region=None):
+    """
+    Returns a diagCube with the cycles at dates reduced for varName, mask and region.
+    If cycles is already a diagCube it is returned as is; otherwise the cycles not
+    yet in cube (a new memory cube if None) are reduced and added to it, and the
+    cube is saved if it has a path.
+    """
+    if isinstance(cycles, diagCube):
+        return cycles
+
+    if cube is None:
+        cube = diagCube()
+
+    cube.update([(date, lambda f=f, date=date: _getCycle(cycles, f, date)) for f, date in enumerate(dates)], varName, mask, region)
+    if cube.path is not None:
+        cube.save()
+
+    return cube
+
+def _cubeGaps(cube, varName, mask, dates, region=None):
+    """
+    Prints a warning for each date without information in the cube.
+    """
+    found = set(cube.dates(varName, mask, region))
+    for date in dates:
+        if date not in found:
+            print(date.strftime(setcolor.WARNING + ' Preparing data for: ' + "%Y-%m-%d:%H"), ' - No information on this date ' + setcolor.ENDC, end='\n')
+
+def _cubeLayers(cube, varName, varType, mask, dates, bounds, region=None):
+    """
+    Returns the mean, standard deviation and count of OmF and OmA for each date (rows)
+    and layer (columns) as masked arrays, masked where there is no information.
+    """
+    return _cubeArrays(cube.layers(varName, varType, dates, bounds, mask=mask, region=region))
+
+def _cubeArrays(layers):
+    """
+    Converts the OmF and OmA accumulators returned by a diagCube to masked arrays
+    of mean, standard deviation and count.
+    """
+    values = []
+    for q in ['omf', 'oma']:
+        values.extend(layers[q].masked())
+
+    return values
+
+def _periodCube(cycles, varName, mask=None, dateIni=None, dateFin=None, nHour="06", cube=None, region=None):
+    """
+    Returns a diagCube with a read_diag object, or with the cycles from dateIni to
+    dateFin of a list of read_diag objects, a cycleList, a diagCollection or a diagCube,
+    and the dates to be summarized (None: all cycles of the cube).
+    """
+    if hasattr(cycles, 'obsInfo'):
+        single = diagCube()
+        single.add(datetime(1970, 1, 1), cycles, varName, mask, region)
+        return single, None
+
+    if dateIni is not None:
+        dates = []
+        date  = datetime.strptime(str(dateIni), "%Y%m%d%H")
+        datef = datetime.strptime(str(dateFin if dateFin is not None else dateIni), "%Y%m%d%H")
+        while (date <= datef):
+            dates.append(date)
+            date = date + timedelta(hours=int(nHour))
+    else:
+        dates = getattr(cycles, 'dates', None)
+
+    if not isinstance(cycles, diagCube):
+        if dates is None:
+            print(setcolor.WARNING + "    >>> dateIni and dateFin are needed to summarize a list of cycles <<< " + setcolor.ENDC)
+            return diagCube(), None
+        cycles = _cycleCube(cycles, varName, mask, dates, cube, region)
+        _cubeGaps(cycles, varName, mask, dates, region)
+
+    return cycles, dates
+
+def _impactSummary(cycles, varName, dateIni=None, dateFin=None, nHour="06", cube=None):
+    """
+    Returns the impact and DFS summary by kx/SatId (see gsidiag.cube.impactSummary) of
+    a read_diag object or of a period of cycles (see _periodCube).
+    """
+    cube, dates = _periodCube(cycles, varName, None, dateIni, dateFin, nHour, cube)
+    return cube.impact(varName, dates=dates)
+
+def _seriesLayers(cube, varName, varType, mask, dates, Level, Lay, SingleL, zlevs_def, region=None):
+    """
+    Returns the levels of a conventional time series and the (lower, upper) pressure
+    bounds of the layer of each level, following the Level/Lay/SingleL options of
+    time_series, and the strings used in the titles and file names of the figures.
+    """
+    Laydef = 50
+
+    forplot, forplotname = '', ''
+    if Level == None:
+        levs   = cube.levels(varName, varType, mask, dates, region=region)
+        bounds = [(lv, lv+1) for lv in levs]
+        forplotname = 'all_levels_byLevels'
+    elif Level == "Zlevs":
+        if Lay == None:
+            levs, bounds = layerBounds(zlevs_def)
+            forplotname = 'all_levels_filledLayers'
+        else:
+            levs   = sorted(set(zlevs_def))
+            bounds = [(lv-Lay, lv+Lay) for lv in levs]
+            forplotname = 'all_levels_bylayers_'+str(Lay)+"hPa"
+    else:
+        levs = [Level]
+        if SingleL == None:
+            bounds = [(Level, Level+1)]
+            forplot = ' Level='+str(Level) +'hPa'
+            forplotname = 'level_'+str(Level) +'hPa'
+        elif SingleL == "All":
+            bounds = [(-np.inf, np.inf)]
+            forplot = ' Layer=Entire Atmosphere'
+            forplotname = 'layer_allAtm'
+        elif SingleL == "OneL":
+            if Lay == None:
+                print("")
+                print(" Variable Lay is None, resetting it to its default value: "+str(Laydef)+" hPa.")
+                print("")
+                Lay = Laydef
+            bounds = [(Level-Lay, Level+Lay)]
+            forplot = ' Layer='+str(Level+Lay)+'-'+str(Level-Lay)+'hPa'
+            forplotname = 'layer_'+str(Level+Lay)+'-'+str(Level-Lay)+'hPa'
+        else:
+            print(" Wrong value for variable SingleL. Please, check it and rerun the script.")
+            bounds = [(0, 0)]
+
+    return levs, bounds, forplot, forplotname
+
+def _regionArea(area, region):
+    """
+    Returns the selection of the observations of a map (region, or else area) and
+    the extent of the map (area, or else the limits of region).
+    """
+    select = region if region is not None else area
+    if area is None and region is not None:
+        area = getRegion(region)
+    return select, area
+
+def _scatterMap(ax, table, category, colors, kwargs):
+    """
+    Draws the observations of table on a map, colored by the category (integer code)
+    of each observation. The coordinates of all categories are prepared at once and
+    each category is drawn by one scatter of a single color (the marker fast path
+    of the Agg renderer, much faster than a single scatter with one color per point);
+    the categories are drawn in order, so that the last ones are on top.
+
+    Args:
+        category (array): The category of each row of table (negative: not drawn).
+        colors (list): The color of each category.
+        kwargs (dict): GeoDataFrame.plot style options (marker, markersize, alpha,
+                       linewidth, ...), passed to scatter.
+    """
+    keep  = np.flatnonzero(category >= 0)
+    order = keep[np.argsort(category[keep], kind='stable')]
+    bound = np.searchsorted(category[order], np.arange(len(colors) + 1))
+
+    lon = (table['lon'].to_numpy(dtype=np.float64)[order] + 180) % 360 - 180
+    lat = table['lat'].to_numpy(dtype=np.float64)[order]
+
+    kwargs = dict(kwargs)
+    kwargs.pop('legend', None)
+    if 'markersize' in kwargs:
+        kwargs['s'] = kwargs.pop('markersize')
+    if 'linewidth' in kwargs:
+        kwargs['linewidths'] = kwargs.pop('linewidth')
+
+    for i, color in enumerate(colors):
+        if bound[i+1] > bound[i]:
+            ax.scatter(lon[bound[i]:bound[i+1]], lat[bound[i]:bound[i+1]], color=color, **kwargs)
+    return ax
+
+def _densityMap(ax, table, param, stat, minVal, maxVal, kwargs):
+    """
+    Draws the observations of table on a map as a single image: the observations are
+    aggregated in the pixels of ax (the number of observations, or the mean of param,
+    in each pixel), so that the cost of drawing depends on the size of the figure
+    instead of the number of observations.
+
+    Args:
+        stat (str): 'mean' (of param) or 'count'.
+        kwargs (dict): The options of plot; cmap, alpha and the colorbar axes (cax)
+                       are used, the options of the markers are ignored.
+
+    Returns:
+        The image (AxesImage).
+    """
+    if stat not in ('mean', 'count'):
+        raise ValueError('plot: stat must be mean or count')
+
+    ax.apply_aspect()   # the size of the axes as drawn, with the aspect of the map
+    bbox = ax.get_window_extent()
+    nx, ny = max(int(round(bbox.width)), 1), max(int(round(bbox.height)), 1)
+    x0, x1 = sorted(ax.get_xlim())
+    y0, y1 = sorted(ax.get_ylim())
+
+    lon = (table['lon'].to_numpy(dtype=np.float64) + 180) % 360 - 180
+    lat = table['lat'].to_numpy(dtype=np.float64)
+    i = np.floor((lat - y0) / (y1 - y0) * ny)
+    j = np.floor((lon - x0) / (x1 - x0) * nx)
+    keep = (i >= 0) & (i < ny) & (j >= 0) & (j < nx)
+    if stat == 'mean':
+        value = table[param].to_numpy(dtype=np.float64)
+        keep  = keep & np.isfinite(value)
+    cell = (i[keep] * nx + j[keep]).astype(np.int64)
+
+    count = np.bincount(cell, minlength=nx * ny)
+    if stat == 'count':
+        image = np.ma.masked_equal(count, 0)
+    else:
+        total = np.bincount(cell, weights=value[keep], minlength=nx * ny)
+        image = np.ma.masked_array(total / np.maximum(count, 1), mask=(count == 0))
+
+    img = ax.imshow(image.reshape(ny, nx), origin='lower', extent=[x0, x1, y0, y1], vmin=minVal, vmax=maxVal,
+                    cmap=kwargs.get('cmap'), alpha=kwargs.get('alpha'), aspect=ax.get_aspect(),
+                    interpolation='none', zorder=2)
+    ax.set_xlim(x0, x1)
+    ax.set_ylim(y0, y1)
+
+    if kwargs.get('cax') is not None:
+        plt.colorbar(img, cax=kwargs['cax'], label='count' if stat == 'count' else param)
+    return img
+
+def _statcountMap(df_list, name_list, marker_list, color_list, ncol, date, instrument_title, forplot, figName, area=None, **kwargs):
+    """
+    Plots the observations of each QC category of statcount on a map and saves the figure.
+    """
+    legend_labels = []
+
+    fig = plt.figure(figsize=(12, 6))
+    ax  = fig.add_subplot(1, 1, 1)
+    ax = geoMap(area=area,ax=ax)
+    for df,namedf,mk,cl in zip(df_list,name_list,marker_list,color_list):
+        legend_labels.append(mpatches.Patch(color=cl, label=namedf) )
+        ax = df.plot(ax=ax,legend=True, marker=mk, color=cl, **kwargs)
+        plt.legend(handles=legend_labels, numpoints=1, loc='lower center', bbox_to_anchor=(0.5, -0.02),
+                   fancybox=True, shadow=False, frameon=False, ncol=ncol, prop={"size": 10})
+
+    date_title = str(date.strftime("%d%b%Y - %H%M")) + ' GMT'
+    plt.title(date_title, loc='right', fontsize=10)
+    plt.title(instrument_title, loc='left', fontsize=9)
+    if forplot is not None:
+        plt.annotate(forplot, xy=(0.45, 1.015), xytext=(0, 0), xycoords='axes fraction', textcoords='offset points',
+                     color='gray', fontweight='bold', fontsize='10', horizontalalignment='left',
+                     verticalalignment='center')
+
+    plt.tight_layout()
+    plt.savefig(figName, bbox_inches='tight', dpi=100)
+
+def _statcountSeries(figName, series, x_axis, DayHour, date_title, instrument_title, forplot, legendLoc, ncol):
+    """
+    Plots the time series of the number of observations of each QC category of
+    statcount and saves the figure.
+
+    Args:
+        series (list): (counts, label, color) of each category; missing cycles are None.
+    """
+    plt.style.use('seaborn-v0_8-ticks')
+    fig, ax1 = plt.subplots(1, 1)
+
+    plt.axhline(y=0.0,ls='solid',c='#d3d3d3')
+
+    # List with value None (missing cycles): is removed to calculate sum, max and min
+    valid = [[x for x in counts if x != None] for counts, label, color in series]
+
+    for (counts, label, color), countsf in zip(series, valid):
+        ax1.plot(x_axis, counts, "o", label=label+" \n["+str(sum(countsf))+"]", color=color)
+    ax1.legend(fancybox=True, frameon=True, shadow=True, loc=legendLoc,ncol=ncol)
+    ax1.set_xlabel('Date (DayHour)', fontsize=10)
+    plt.title(date_title, loc='right', fontsize=10)
+    plt.title(instrument_title, loc='left', fontsize=9)
+    if forplot is not None:
+        plt.annotate(forplot, xy=(0.0, 0.965), xytext=(0, 0), xycoords='axes fraction', textcoords='offset points',
+                     color='lightgray', fontweight='bold', fontsize='12', horizontalalignment='left', verticalalignment='center')
+
+    ax1.set_ylim(np.round(-0.05*np.max(valid)), np.round(1.25*np.max(valid)))
+    ax1.set_ylabel('Total Observations', color='black', fontsize=10)
+    ax1.tick_params('y', colors='black')
+    plt.xticks(x_axis, DayHour)
+    major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
+    ax1.set_xticks(major_ticks)
+    for countsf in valid:
+        plt.axhline(y=np.mean(countsf),ls='dotted',c='lightgray')
+    plt.tight_layout()
+    plt.savefig(figName, bbox_inches='tight', dpi=100)
+
+def _seriesHeatmap(figName, mean, std, count, flag, ylabel, yticks, ylabels, nlevs, vmaxOMAabs, vminSTD, vmaxSTD,
+                   x_axis, DayHour, instrument_title, date_title, cmaski):
+    """
+    Draws the (time x level/channel) mean, standard deviation and number of observations
+    of OmF or OmA (flag) of the time series and saves the figure.
+    """
+    fig = plt.figure(figsize=(6, 9))
+    plt.rcParams['axes.facecolor'] = 'None'
+    plt.rcParams['hatch.linewidth'] = 0.3
+
+    panels = [(mean,  -vmaxOMAabs, vmaxOMAabs,     'seismic',     'Mean ('+flag+')'),
+              (std,   vminSTD,     vmaxSTD,        'Blues',       'Standard Deviation ('+flag+')'),
+              (count, 0.0,         np.max(count),  'gist_heat_r', 'Total Observations'+" ("+cmaski+")")]
+
+    for p, (values, vmin, vmax, cmap, xlabel) in enumerate(panels):
+        plt.subplot(3, 1, p+1)
+        ax = plt.gca()
+        ax.add_patch(mpl.patches.Rectangle((-1,-1),(len(DayHour)+1),(nlevs+3), hatch='xxxxx', color='black', fill=False, snap=False, zorder=0))
+        plt.imshow(np.flipud(values.T), origin='lower', vmin=vmin, vmax=vmax, cmap=cmap, aspect='auto', zorder=1,interpolation='none')
+        plt.colorbar(orientation='horizontal', pad=0.18, shrink=1.0)
+        if p < 2:
+            plt.tight_layout()
+        plt.title(instrument_title, loc='left', fontsize=10)
+        plt.title(date_title, loc='right', fontsize=10)
+        plt.ylabel(ylabel)
+        plt.xlabel(xlabel, labelpad=50)
+        plt.yticks(yticks, ylabels)
+        plt.xticks(x_axis, DayHour)
+        major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
+        ax.set_xticks(major_ticks)
+
+    plt.tight_layout()
+    plt.savefig(figName, bbox_inches='tight', dpi=100)
+
+def _seriesLine(figName, mean, std, count, flag, forplot, vminOMA, vmaxOMA, vminSTD, vmaxSTD, countTop, stdTicks,
+                x_axis, DayHour, instrument_title, date_title, cmaski):
+    """
+    Draws the mean, standard deviation and number of observations of OmF or OmA (flag)
+    of a single level or channel and saves the figure.
+    """
+    plt.style.use('seaborn-v0_8-ticks')
+    fig, ax1 = plt.subplots(1, 1)
+
+    plt.axhline(y=0.0,ls='solid',c='#d3d3d3')
+    plt.annotate(forplot, xy=(0.0, 0.965), xytext=(0,0), xycoords='axes fraction', textcoords='offset points', color='lightgray', fontweight='bold', fontsize='12',
+    horizontalalignment='left', verticalalignment='center')
+
+    ax1.plot(x_axis, mean, "b-", label="Mean ("+flag+")")
+    ax1.plot(x_axis, mean, "bo", label="Mean ("+flag+")")
+    ax1.set_xlabel('Date (DayHour)', fontsize=10)
+    # Make the y-axis label, ticks and tick labels match the line color.
+    ax1.set_ylim(vminOMA, vmaxOMA)
+    ax1.set_ylabel('Mean ('+flag+')', color='b', fontsize=10)
+    ax1.tick_params('y', colors='b')
+    plt.xticks(x_axis, DayHour)
+    major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
+    ax1.set_xticks(major_ticks)
+    plt.axhline(y=np.mean(mean),ls='dotted',c='blue')
+
+    ax2 = ax1.twinx()
+    ax2.plot(x_axis, std, "r-", label="Std. Deviation ("+flag+")")
+    ax2.plot(x_axis, std, "rs", label="Std. Deviation ("+flag+")")
+    ax2.set_ylim(vminSTD, vmaxSTD)
+    ax2.set_ylabel('Std. Deviation ('+flag+')', color='r', fontsize=10)
+    ax2.tick_params('y', colors='r')
+    if stdTicks:
+        major_ticks = np.arange(0, max(x_axis), len(DayHour)/len(list(filter(None, DayHour))))
+        ax2.set_xticks(major_ticks)
+    plt.axhline(y=np.mean(std),ls='dotted',c='red')
+
+    ax3 = ax1.twinx()
+    ax3.plot(x_axis, count, "g-", label="Total Observations"+" ("+cmaski+")")
+    ax3.plot(x_axis, count, "g^", label="Total Observations"+" ("+cmaski+")")
+    ax3.set_ylim(0, countTop*np.max(count))
+    ax3.set_ylabel('Total Observations'+" ("+cmaski+")", color='g', fontsize=10)
+    ax3.tick_params('y', colors='g')
+    ax3.spines["right"].set_position(("axes", 1.15))
+    plt.yticks(rotation=90)
+    plt.axhline(y=np.mean(count),ls='dotted',c='green')
+
+    ax3.set_title(instrument_title, loc='left', fontsize=10)
+    ax3.set_title(date_title, loc='right', fontsize=10)
+
+    plt.xticks(x_axis, DayHour)
+    major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
+    ax3.set_xticks(major_ticks)
+    plt.title(instrument_title, loc='left', fontsize=9)
+    plt.title(date_title, loc='right', fontsize=9)
+    plt.subplots_adjust(left=None, bottom=None, right=0.80, top=None)
+    plt.tight_layout()
+    plt.savefig(figName, bbox_inches='tight', dpi=100)
+
+def _seriesOmFOmA(figName, mean, meana, forplot, vminOMA, vmaxOMA, x_axis, DayHour, instrument_title, date_title):
+    """
+    Draws the mean OmF and OmA of a single level or channel and saves the figure.
+    """
+    plt.style.use('seaborn-v0_8-ticks')
+    fig, ax1 = plt.subplots(1, 1)
+
+    plt.annotate(forplot, xy=(0.0, 0.965), xytext=(0, 0), xycoords='axes fraction', textcoords='offset points', color='lightgray', fontweight='bold', fontsize='12',
+    horizontalalignment='left', verticalalignment='center')
+
+    plt.axhline(y=0.0,ls='solid',c='#d3d3d3')
+    ax1.plot(x_axis, mean, "b-", label="Mean (OmF)")
+    ax1.plot(x_axis, mean, "bo", label="")
+    ax1.set_xlabel('Date (DayHour)', fontsize=10)
+    # Make the y-axis label, ticks and tick labels match the line color.
+    ax1.set_ylim(vminOMA, vmaxOMA)
+    ax1.tick_params('y', colors='b')
+    plt.xticks(x_axis, DayHour)
+    major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
+    ax1.set_xticks(major_ticks)
+    plt.axhline(y=np.mean(mean),ls='dotted',c='blue')
+
+    ax1.plot(x_axis, meana, "r-", label="Mean (OmA)")
+    ax1.plot(x_axis, meana, "rs", label="")
+    ax1.set_ylim(vminOMA, vmaxOMA)
+    ax1.tick_params('y', colors='black')
+    plt.axhline(y=np.mean(meana),ls='dotted',c='red')
+
+    plt.xticks(x_axis, DayHour)
+    major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
+    ax1.set_xticks(major_ticks)
+    plt.title(instrument_title, loc='left', fontsize=9)
+    plt.title(date_title, loc='right', fontsize=9)
+    plt.subplots_adjust(left=None, bottom=None, right=0.80, top=None)
+
+    ybox1 = offsetbox.TextArea('Mean (OmF)' , textprops=dict(color="b", size=12,rotation=90,ha='left',va='bottom'))
+    ybox2 = offsetbox.TextArea(' and '      , textprops=dict(color="k", size=12,rotation=90,ha='left',va='bottom'))
+    ybox3 = offsetbox.TextArea('Mean (OmA)' , textprops=dict(color="r", size=12,rotation=90,ha='left',va='bottom'))
+
+    ybox = offsetbox.VPacker(children=[ybox3, ybox2, ybox1],align="bottom", pad=0, sep=5)
+
+    anchored_ybox = offsetbox.AnchoredOffsetbox(loc=3, child=ybox, pad=0., frameon=False, bbox_to_anchor=(-0.12, 0.16), 
+                                        bbox_transform=ax1.transAxes, borderpad=0.)
+
+    ax1.add_artist(anchored_ybox)
+    plt.legend()
+
+    plt.tight_layout()
+    plt.savefig(figName, bbox_inches='tight', dpi=100)
+
+def _seriesStdDev(figName, mean, std, count, meana, stda, counta, forplot, x_axis, DayHour, instrument_title, date_title, cmaski):
+    """
+    Draws the mean and standard deviation bands of OmF and OmA of a single level or
+    channel, with their number of observations, and saves the figure.
+    """
+    plt.style.use('seaborn-v0_8-ticks')
+    fig, ax1 = plt.subplots(1, 1)
+
+    OMF_inf, OMF_sup = mean-std, mean+std
+    OMA_inf, OMA_sup = meana-stda, meana+stda
+
+    omfoma_limit_inf =     (np.min(np.array([np.min(OMF_inf), np.min(OMA_inf)])))
+    if omfoma_limit_inf > 0:
+        omfoma_limit_inf = 0.9*omfoma_limit_inf
+    else:
+        omfoma_limit_inf = 1.1*omfoma_limit_inf  
+    omfoma_limit_sup = 1.1*(np.max(np.array([np.max(OMF_sup), np.max(OMA_sup)])))
+
+    ax1.plot(x_axis, mean, lw=2, label='OmF Mean', color='blue', zorder=1)
+    ax1.fill_between(x_axis, OMF_inf, OMF_sup, label='OmF Std Dev',  facecolor='blue', alpha=0.3, zorder=1)
+    ax1.plot(x_axis, meana, lw=2, label='OmA Mean', color='red', zorder=2)
+    ax1.fill_between(x_axis, OMA_inf, OMA_sup, label='OmA Std Dev',  facecolor='red', alpha=0.3, zorder=2)
+    ybox1 = offsetbox.TextArea(' OmF ' , textprops=dict(color="b", size=12,rotation=90,ha='left',va='bottom'))
+    ybox2 = offsetbox.TextArea(' | '   , textprops=dict(color="k", size=12,rotation=90,ha='left',va='bottom'))
+    ybox3 = offsetbox.TextArea(' OmA ' , textprops=dict(color="r", size=12,rotation=90,ha='left',va='bottom'))
+
+    ybox = offsetbox.VPacker(children=[ybox3, ybox2, ybox1],align="bottom", pad=0, sep=5)
+
+    anchored_ybox = offsetbox.AnchoredOffsetbox(loc=3, child=ybox, pad=0., frameon=False, bbox_to_anchor=(-0.125, 0.42), 
+                                        bbox_transform=ax1.transAxes, borderpad=0.)
+
+    ax1.add_artist(anchored_ybox)
+    ax1.set_xlabel('Date (DayHour)', fontsize=12)
+    ax1.set_ylim(omfoma_limit_inf,omfoma_limit_sup)
+    ax1.legend(bbox_to_anchor=(-0.11, -0.25),ncol=4,loc='lower left', fancybox=True, shadow=False, frameon=True, framealpha=1.0, fontsize='11', facecolor='white', edgecolor='lightgray')
+    plt.grid(axis='y', color='lightgray', linestyle='-.', linewidth=0.5, zorder=0)
+
+    ax2 = ax1.twinx()
+    ax2.plot(x_axis, counta, lw=2, label='OmA', linestyle='--', color='green', zorder=3)
+    ax2.plot(x_axis, count, lw=2, label='OmF', linestyle=':', color='purple', zorder=3)
+    ax2.set_ylabel('Total Observations (OmF | OmA)'+"\n ("+cmaski+")", fontsize=12)
+    ax2.set_ylim(0, (np.max(counta) + np.max(counta)/5))
+    ax2.legend(loc='upper left', ncol=2, fancybox=True, shadow=False, frameon=True, framealpha=1.0, fontsize='11', facecolor='white', edgecolor='lightgray')
+
+    plt.xticks(x_axis, DayHour)
+    major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
+    ax2.set_xticks(major_ticks)
+    plt.title(instrument_title, loc='left', fontsize=10)
+    plt.title(date_title, loc='right', fontsize=10)
+
+    t = plt.annotate(forplot, xy=(0.78, 0.995), xytext=(-9, -9), xycoords='axes fraction', textcoords='offset points', color='darkgray', fontweight='bold', fontsize='10',
+                        horizontalalignment='center', verticalalignment='center')
+    t.set_bbox(dict(facecolor='whitesmoke', alpha=1.0, edgecolor='whitesmoke', boxstyle="square,pad=0.3"))
+
+    plt.tight_layout()
+    plt.savefig(figName, bbox_inches='tight', dpi=100)
+
+def _seriesJobs(figName, mean, std, count, meana, stda, counta, forplot, vminOMA, vmaxOMA, vminSTD, vmaxSTD, frame):
+    """
+    Returns the figure jobs (see gsidiag.render) of the time series of a single level
+    or channel: OmF, OmA, both means and both means with standard deviation bands.
+    figName is formatted with the kind of each figure.
+    """
+    return [(_seriesLine,   (figName.format('OmF'), mean, std, count, 'OmF', forplot, vminOMA, vmaxOMA, vminSTD, vmaxSTD, 1.125, True), frame),
+            (_seriesLine,   (figName.format('OmA'), meana, stda, counta, 'OmA', forplot, vminOMA, vmaxOMA, vminSTD, vmaxSTD, 1.2, False), frame),
+            (_seriesOmFOmA, (figName.format('OmFOmA'), mean, meana, forplot, vminOMA, vmaxOMA),
+                            {k: frame[k] for k in ['x_axis', 'DayHour', 'instrument_title', 'date_title']}),
+            (_seriesStdDev, (figName.format('OmFOmA_StdDev'), mean, std, count, meana, stda, counta, forplot), frame)]
+
 class read_diag(object):
 
     """
     read a diagnostic file from gsi. Return an array with
     some information.
+
+    With channelMajor=True the radiance data are kept in radInfo in channel-major
+    layout (one row per spot, see gsidiag.radiance) and the flat tables of obsInfo
+    are only built when accessed.
+
+    With profile=True (or a function, called with the report) the stages of the read
+    (Fortran I/O, table fill, transfer, replace, GeoDataFrame construction) are timed
+    for each variable and kx, and the report is kept in profile (see
+    gsidiag.profiling); profileMemory=True also traces the peak memory of each stage.
     """
-    #@profile(precision=8)
 
-    def __init__(self, diagFile, diagFileAnl=None, isisList=None, zlevs=None, zchan=None):
+    def __init__(self, diagFile, diagFileAnl=None, isisList=None, zlevs=None, zchan=None, channelMajor=False,
+                 profile=False, profileMemory=False):
 
         print(' ')
         print('>>> GSI DIAG <<<')
@@ -159,15 +782,21 @@ class read_diag(object):
                 l.append(i.ljust(s,' '))
             isis = np.array(l,dtype='c').T
             
-        self._FNumber    = d2p.open(self._diagFile, self._diagFileAnl, isis)
+        prof = profiler([diagFile, diagFileAnl], profile, profileMemory)
+        self.profile = prof if prof.enabled else None
+
+        with prof.stage('open', nbytes=fileBytes(diagFile, diagFileAnl)):
+            self._FNumber = d2p.open(self._diagFile, self._diagFileAnl, isis)
         if (self._FNumber <= -1):
             self._FNumber = None
             print('Some was was wrong during reading files ...')
+            prof.finish()
             return
 
         self._FileType   = d2p.getFileType(self._FNumber)
         if (self._FileType == -1):
             print('Some wrong was happening!')
+            prof.finish()
             return
         
         self._undef = d2p.getUndef(self._FNumber)
@@ -186,6 +815,7 @@ class read_diag(object):
         vnames,nTypes   = d2p.getObsVarInfo(self._FNumber,self._nVars);
         self.varNames   = []
         self.obsInfo    = {}
+        self.radInfo    = {}
         for i, name in enumerate(vnames):
             obsName = name.tostring().decode('UTF-8').strip()
             self.varNames.append(obsName)
@@ -195,50 +825,231 @@ class read_diag(object):
             if self._FileType == 1:
             # for convetional data
                for i, vType in enumerate(vTypes):
-                   nObs = d2p.getobs(self._FNumber, obsName, vType, 'None', self.zlevs, len(self.zlevs))
-                   if extraInfo is True:
-                       d = pd.DataFrame(d2p.array2d.copy().T,index=convIndex).T
-                       d2p.array2d = None
-                   else:
-                       d = pd.DataFrame(d2p.array2d.copy().T,index=convIndex[:17]).T
-                       d2p.array2d = None
+                   with prof.stage('fill', obsName, vType) as record:
+                       nObs = d2p.getobs(self._FNumber, obsName, vType, 'None', self.zlevs, len(self.zlevs))
+                       record['bytes'] = d2p.array2d.nbytes
+
+                   with prof.stage('transfer', obsName, vType, d2p.array2d.nbytes):
+                       if extraInfo is True:
+                           d = pd.DataFrame(d2p.array2d.copy().T,index=convIndex).T
+                           d2p.array2d = None
+                       else:
+                           d = pd.DataFrame(d2p.array2d.copy().T,index=convIndex[:17]).T
+                           d2p.array2d = None
 
                    # convert all undef to NaN
-                   d.replace(to_replace = self._undef,
-                             value      = np.nan,
-                             inplace    = True)
+                   with prof.stage('replace', obsName, vType):
+                       d.replace(to_replace = self._undef,
+                                 value      = np.nan,
+                                 inplace    = True)
 
-                   lon = (d.lon + 180) % 360 - 180
-                   lat = d.lat
-                   df[vType] = gpd.GeoDataFrame(d, geometry=gpd.points_from_xy(lon,lat))
+                   with prof.stage('geometry', obsName, vType):
+                       df[vType] = _geoTable(d)
                 
             elif self._FileType == 2:
             # for satellite data
                for i, sType in enumerate(sTypes):
-                   nObs = d2p.getobs(self._FNumber, obsName, 0, sType, self.zlevs, len(self.zlevs))
-                   if extraInfo is True:
-                       d   = pd.DataFrame(d2p.array2d.copy().T,index=radIndex).T
-                       d2p.array2d = None
-                   else:
-                       d = pd.DataFrame(d2p.array2d.copy().T,index=radIndex[:13]).T
-                       d2p.array2d = None
+                   with prof.stage('fill', obsName, sType) as record:
+                       nObs = d2p.getobs(self._FNumber, obsName, 0, sType, self.zlevs, len(self.zlevs))
+                       record['bytes'] = d2p.array2d.nbytes
+
+                   if channelMajor is True:
+                       # one row per spot and (spot x channel) arrays, see gsidiag.radiance
+                       try:
+                           with prof.stage('transfer', obsName, sType, d2p.array2d.nbytes):
+                               if extraInfo is True:
+                                   df[sType] = radTable.fromArray(d2p.array2d, radIndex, self._undef)
+                               else:
+                                   df[sType] = radTable.fromArray(d2p.array2d, radIndex[:13], self._undef)
+                               d2p.array2d = None
+                           continue
+                       except ValueError as e:
+                           print(setcolor.WARNING + '    >>> ' + obsName + ' ' + sType + ': ' + str(e) + ', read in flat layout <<< ' + setcolor.ENDC)
+
+                   with prof.stage('transfer', obsName, sType, d2p.array2d.nbytes):
+                       if extraInfo is True:
+                           d   = pd.DataFrame(d2p.array2d.copy().T,index=radIndex).T
+                           d2p.array2d = None
+                       else:
+                           d = pd.DataFrame(d2p.array2d.copy().T,index=radIndex[:13]).T
+                           d2p.array2d = None
 
                    # convert all undef to NaN
-                   d.replace(to_replace = self._undef,
-                             value      = np.nan,
-                             inplace    = True)
+                   with prof.stage('replace', obsName, sType):
+                       d.replace(to_replace = self._undef,
+                                 value      = np.nan,
+                                 inplace    = True)
+
+                   with prof.stage('geometry', obsName, sType):
+                       df[sType] = _geoTable(d)
+
+
+            with prof.stage('concat', obsName):
+                if self._FileType == 1:
+                    self.obsInfo[obsName] = pd.concat(df.values(),keys=df.keys(), names=['kx','points'])
+                elif self._FileType == 2 and channelMajor is True and all(isinstance(t, radTable) for t in df.values()):
+                    self.radInfo[obsName] = df
+                elif self._FileType == 2:
+                    # a sensor is kept in channel-major layout only if all its platforms are
+                    df = {k: _geoTable(t.flat()) if isinstance(t, radTable) else t for k, t in df.items()}
+                    self.obsInfo[obsName] = pd.concat(df.values(),keys=df.keys(), names=['SatId','points'])
+
+        self._lazyObsInfo()
+        self._obs = None
+        prof.finish()
+
+    def _lazyObsInfo(self):
+
+        # The flat tables of the channel-major radiance data (radInfo) are built
+        # only when some function uses obsInfo[sensor]
+        radInfo = self.__dict__.get('radInfo')
+        if not radInfo:
+            return
 
-                   lon = (d.lon + 180) % 360 - 180
-                   lat = d.lat
-                   df[sType] = gpd.GeoDataFrame(d, geometry=gpd.points_from_xy(lon,lat))
+        builders = {}
+        for obsName in radInfo:
+            if obsName not in self.obsInfo:
+                builders[obsName] = lambda obsName=obsName: self.flatTable(obsName)
+        self.obsInfo = lazyTables(dict(self.obsInfo), builders)
 
+    def flatTable(self, obsName):
 
-            if self._FileType == 1:
-                self.obsInfo[obsName] = pd.concat(df.values(),keys=df.keys(), names=['kx','points'])
-            elif self._FileType == 2:
-                self.obsInfo[obsName] = pd.concat(df.values(),keys=df.keys(), names=['SatId','points'])
-            
-        self.obs  = pd.concat(self.obsInfo, sort=False).reset_index(level=2, drop=True)
+        """
+        Builds the flat table (one row per spot and channel, with geometry) of a radiance
+        sensor read in channel-major layout (channelMajor=True). This is the table
+        returned by obsInfo[obsName].
+
+        Usage: flatTable('amsua')
+        """
+
+        tables = self.radInfo[obsName]
+        df = [_geoTable(table.flat()) for table in tables.values()]
+        return pd.concat(df, keys=list(tables.keys()), names=['SatId','points'])
+
+    def regionRows(self, varName, region, res=5.0):
+
+        """
+        Returns the positions of the rows of obsInfo[varName] inside a region, given by
+        its name (see gsidiag.regions.REGIONS, e.g. 'SouthAmerica', 'Tropics', 'NH') or by
+        its limits [Loni, Lati, Lonf, Latf]. The spatial index of each table is built
+        once, and the rows of each region are cached.
+
+        Usage: obsInfo['uv'].iloc[regionRows('uv', 'SouthAmerica')]
+        """
+
+        if '_spatial' not in self.__dict__:
+            self._spatial = {}
+            self._regions = {}
+
+        key = (varName, regionKey(region))
+        if key not in self._regions:
+            if varName not in self._spatial:
+                table = self.obsInfo[varName]
+                self._spatial[varName] = spatialIndex(table['lat'].to_numpy(), table['lon'].to_numpy(), res)
+            self._regions[key] = self._spatial[varName].select(region)
+
+        return self._regions[key]
+
+    def maskRows(self, varName, mask=None, region=None):
+
+        """
+        Returns the positions of the rows of obsInfo[varName] selected by a mask (a
+        DataFrame.query expression, e.g. 'iuse == 1 & idqc == 0') and inside a region
+        (see regionRows). The mask is compiled once (see gsidiag.masks), and the rows
+        of each (varName, mask, region) are cached.
+
+        Usage: obsInfo['uv'].iloc[maskRows('uv', 'iuse == 1', 'SouthAmerica')]
+        """
+
+        if '_masks' not in self.__dict__:
+            self._masks = {}
+
+        key = (varName, mask, regionKey(region))
+        if key not in self._masks:
+            table = self.obsInfo[varName]
+            if region is not None:
+                rows = self.regionRows(varName, region)
+                if mask is not None:
+                    rows = rows[compileMask(mask)(table.iloc[rows])]
+            elif mask is not None:
+                rows = np.flatnonzero(compileMask(mask)(table))
+            else:
+                rows = np.arange(table.shape[0])
+            self._masks[key] = rows
+
+        return self._masks[key]
+
+    @property
+    def obs(self):
+
+        """
+        All observations of all variables in a single table. It is built on first
+        use, since it duplicates the data held in obsInfo.
+        """
+
+        if self.__dict__.get('_obs') is None:
+            self._obs = pd.concat(self.obsInfo, sort=False).reset_index(level=2, drop=True)
+        return self._obs
+
+    def _indexName(self):
+        if self._FileType == 2:
+            return 'SatId'
+        return 'kx'
+
+    def detach(self):
+
+        """
+        Releases the Fortran file handle, keeping all tables already read. A detached
+        object does not depend on the Fortran module anymore, so it can be pickled and
+        sent to or returned from other processes (multiprocessing, concurrent.futures).
+
+        Usage: detach()
+        """
+
+        if self._FNumber is not None:
+            d2p.close(self._FNumber)
+            self._FNumber = None
+
+        return self
+
+    def __getstate__(self):
+
+        # Only the columnar tables and metadata are serialized: the Fortran handle is
+        # meaningless in another process, and the geometry and the concatenated obs
+        # table are derived from the tables when unpickling (or on first use).
+        state = self.__dict__.copy()
+        state['_FNumber'] = None
+        state['_obs'] = None
+        state.pop('_shm', None)
+        state.pop('_spatial', None)
+        state.pop('_regions', None)
+        state.pop('_masks', None)
+
+        obsInfo = state.pop('obsInfo', None)
+        if isinstance(obsInfo, lazyTables):
+            obsInfo = obsInfo.built()
+        if obsInfo is not None:
+            tables = {}
+            for varName, table in obsInfo.items():
+                columns = [c for c in table.columns if c != 'geometry']
+                keys    = table.index.get_level_values(0).unique().to_numpy()
+                data    = [np.ascontiguousarray(table.loc[key, columns].to_numpy().T) for key in keys]
+                tables[varName] = (columns, keys, data)
+            state['_tables'] = tables
+
+        return state
+
+    def __setstate__(self, state):
+
+        tables = state.pop('_tables', None)
+        self.__dict__.update(state)
+
+        if tables is not None:
+            self.obsInfo = {}
+            for varName, (columns, keys, data) in tables.items():
+                df = [_geoTable(pd.DataFrame(array.T, columns=columns)) for array in data]
+                self.obsInfo[varName] = pd.concat(df, keys=list(keys), names=[self._indexName(),'points'])
+            self._lazyObsInfo()
 
     def overview(self):
 
@@ -281,7 +1092,10 @@ class read_diag(object):
         Usage: close()
         """
 
-        iret = d2p.close(self._FNumber)
+        if self._FNumber is not None:
+            iret = d2p.close(self._FNumber)
+        else:
+            iret = 0 # detached object, nothing left open in the Fortran side
         self._FileName = None # File name
         self._FNumber  = None # File unit number to be closed
         self._nVars    = None # Total of variables
@@ -293,20 +1107,30 @@ class read_diag(object):
         
         return iret
     @staticmethod
-    def tocsv(self, varName=None, varType=None, dateIni=None, dateFin=None, nHour="06", Level=None, Lay = None, SingleL=None):
+    def tocsv(self, varName=None, varType=None, dateIni=None, dateFin=None, nHour="06", Level=None, Lay = None, SingleL=None, cube=None, region=None, mask=None, area=None):
         
         '''
         The function tocsv is similar to the time_series funcion, however, it outputs a CSV file instead of figures. 
         Refers to the time_series description below for more information.
 
+        The statistics are computed from a diagCube (see gsidiag.cube): self may be a cube,
+        and if a cube is given, only the cycles not yet in it are read and reduced.
+
+        With region (a name of gsidiag.regions.REGIONS or [Loni, Lati, Lonf, Latf]; area is
+        also accepted, as in the maps) only the observations of the region are used, and
+        with mask (e.g. 'iuse == 1') only those selected by the mask.
+
+        Returns the names of the CSV files (OmF and OmA).
+
         '''
 
+        if region is None:
+            region = area
+
         delta = nHour
         omflag = "OmF"
         omflaga = "OmA"
 
-        Laydef = 50
-
         separator = " ====================================================================================================="
 
         print()
@@ -320,65 +1144,36 @@ class read_diag(object):
         print(separator)
         print()
 
-        zlevs_def = list(map(int,self[0].zlevs))
-
-
         datei = datetime.strptime(str(dateIni), "%Y%m%d%H")
         datef = datetime.strptime(str(dateFin), "%Y%m%d%H")
         date  = datei
 
-        levs_tmp, DayHour_tmp = [], []
-        info_check = {}
-        f = 0
+        dates = []
         while (date <= datef):
-            
-            datefmt = date.strftime("%Y%m%d%H")
-            DayHour_tmp.append(date.strftime("%d%H"))
-            
-            dataDict = self[f].obsInfo[varName].loc[varType]
-            info_check.update({date.strftime("%d%H"):True})
-
-            if 'prs' in dataDict and (Level == None or Level == "Zlevs"):
-                if(Level == None):
-                    levs_tmp.extend(list(set(map(int,dataDict['prs']))))
-                else:
-                    levs_tmp = zlevs_def[::-1]
-                info_check.update({date.strftime("%d%H"):True})
-                print(date.strftime(' Preparing data for: ' + "%Y-%m-%d:%H"))
-                print(' Levels: ', sorted(levs_tmp), end='\n')
-                print("")
-                f = f + 1
-            else:
-                if (Level != None and Level != "Zlevs") and info_check[date.strftime("%d%H")] == True:
-                    levs_tmp.extend([Level])
-                    print(date.strftime(' Preparing data for: ' + "%Y-%m-%d:%H"), ' - Level: ', Level , end='\n')
-                    f = f + 1
-                else:
-                    info_check.update({date.strftime("%d%H"):False})
-                    print(date.strftime(setcolor.WARNING + ' Preparing data for: ' + "%Y-%m-%d:%H"), ' - No information on this date ' + setcolor.ENDC, end='\n')
-
-            del(dataDict)
-            
+            dates.append(date)
             date = date + timedelta(hours=int(delta))
-        
 
-        if(len(DayHour_tmp) > 4):
-            DayHour = [hr if (ix % int(len(DayHour_tmp) / 4)) == 0 else '' for ix, hr in enumerate(DayHour_tmp)]
+        if type(Level) == list:
+            zlevs_def = Level
+            Level = "Zlevs"
         else:
-            DayHour = DayHour_tmp
+            zlevs_def = list(map(int,_cycleLevels(self, dates)))
+
+        cube = _cycleCube(self, varName, mask, dates, cube, region)
+        _cubeGaps(cube, varName, mask, dates, region)
 
-        zlevs = [z if z in zlevs_def else "" for z in sorted(set(levs_tmp+zlevs_def))]
+        levs, bounds, forplot, forplotname = _seriesLayers(cube, varName, varType, mask, dates, Level, Lay, SingleL, zlevs_def, region)
+        print(' Levels: ', levs, end='\n')
 
         print()
         print(separator)
         print()
 
-        list_meanByLevs, list_stdByLevs, list_countByLevs = [], [], []
-        list_meanByLevsa, list_stdByLevsa, list_countByLevsa = [], [], []
-        date = datei
-        levs = sorted(list(set(levs_tmp)))
-        levs_tmp.clear()
-        del(levs_tmp[:])
+        list_meanByLevs, list_stdByLevs, list_countByLevs, list_meanByLevsa, list_stdByLevsa, list_countByLevsa = _cubeLayers(cube, varName, varType, mask, dates, bounds, region)
+
+        # cells without information are written as empty (NaN) mean and std and zero count
+        list_meanByLevs, list_stdByLevs, list_meanByLevsa, list_stdByLevsa = [l.filled(np.nan).tolist() for l in [list_meanByLevs, list_stdByLevs, list_meanByLevsa, list_stdByLevsa]]
+        list_countByLevs, list_countByLevsa = [l.filled(0).tolist() for l in [list_countByLevs, list_countByLevsa]]
 
         head_levs = ['datetime']
         for lev in levs:
@@ -388,148 +1183,22 @@ class read_diag(object):
 
         dset = []
         dseta = []
-        f = 0
-        while (date <= datef):
-
-            print(date.strftime(' Calculating for ' + "%Y-%m-%d:%H"))
+        for t, date in enumerate(dates):
             datefmt = date.strftime("%Y%m%d%H")
 
-            try:
-                dataByLevs, mean_dataByLevs, std_dataByLevs, count_dataByLevs = {}, {}, {}, {}
-                dataByLevsa, mean_dataByLevsa, std_dataByLevsa, count_dataByLevsa = {}, {}, {}, {}
-                
-                if info_check[date.strftime("%d%H")] == True:
-                    dataDict = self[f].obsInfo[varName].loc[varType]
-
-                    [dataByLevs.update({int(lvl): []}) for lvl in levs]
-                    [dataByLevsa.update({int(lvl): []}) for lvl in levs]
-                    if Level != None and Level != "Zlevs":
-                        if SingleL == None:
-                            [ dataByLevs[int(p)].append(v) for p,v in zip(self[f].obsInfo[varName].loc[varType].prs,self[f].obsInfo[varName].loc[varType].omf) if int(p) == Level ]
-                            [ dataByLevsa[int(p)].append(v) for p,v in zip(self[f].obsInfo[varName].loc[varType].prs,self[f].obsInfo[varName].loc[varType].oma) if int(p) == Level ]
-                            forplot = ' Level='+str(Level) +'hPa'
-                            forplotname = 'level_'+str(Level) +'hPa'
-                        else:
-                            if SingleL == "All":
-                                [ dataByLevs[Level].append(v) for v in self[f].obsInfo[varName].loc[varType].omf ]
-                                [ dataByLevsa[Level].append(v) for v in self[f].obsInfo[varName].loc[varType].oma ]
-                                forplot = ' Layer=Entire Atmosphere'
-                                forplotname = 'layer_allAtm'
-                            else:
-                                if SingleL == "OneL":
-                                    if Lay == None:
-                                        print("")
-                                        print(" Variable Lay is None, resetting it to its default value: "+str(Laydef)+" hPa.")
-                                        print("")
-                                        Lay = Laydef
-                                    [ dataByLevs[int(Level)].append(v) for p,v in zip(self[f].obsInfo[varName].loc[varType].prs,self[f].obsInfo[varName].loc[varType].omf) if int(p) >=Level-Lay and int(p) <Level+Lay ]
-                                    [ dataByLevsa[int(Level)].append(v) for p,v in zip(self[f].obsInfo[varName].loc[varType].prs,self[f].obsInfo[varName].loc[varType].oma) if int(p) >=Level-Lay and int(p) <Level+Lay ]
-                                    forplot = ' Layer='+str(Level+Lay)+'-'+str(Level-Lay)+'hPa'
-                                    forplotname = 'layer_'+str(Level+Lay)+'-'+str(Level-Lay)+'hPa'
-                                else:
-                                    print(" Wrong value for variable SingleL. Please, check it and rerun the script.")    
-                    else:
-                        if Level == None:
-                            [ dataByLevs[int(p)].append(v) for p,v in zip(self[f].obsInfo[varName].loc[varType].prs,self[f].obsInfo[varName].loc[varType].omf) ]
-                            [ dataByLevsa[int(p)].append(v) for p,v in zip(self[f].obsInfo[varName].loc[varType].prs,self[f].obsInfo[varName].loc[varType].oma) ]
-                            forplotname = 'all_levels_byLevels'
-                        else:
-                            for ll in range(len(levs)):
-                                if Lay == None:
-                                    lv = levs[ll]
-                                    if ll == 0:
-                                        Llayi = 0
-                                    else:
-                                        Llayi = (levs[ll] - levs[ll-1]) / 2.0
-                                    if ll == len(levs)-1:
-                                        Llayf = Llayi
-                                    else:
-                                        Llayf = (levs[ll+1] - levs[ll]) / 2.0
-                                    cutlevs = [ v for p,v in zip(self[f].obsInfo[varName].loc[varType].prs,self[f].obsInfo[varName].loc[varType].omf) if int(p) >=lv-Llayi and int(p) <lv+Llayf ]
-                                    cutlevsa = [ v for p,v in zip(self[f].obsInfo[varName].loc[varType].prs,self[f].obsInfo[varName].loc[varType].oma) if int(p) >=lv-Llayi and int(p) <lv+Llayf ]
-                                    forplotname = 'all_levels_filledLayers'
-                                else:
-                                    cutlevs = [ v for p,v in zip(self[f].obsInfo[varName].loc[varType].prs,self[f].obsInfo[varName].loc[varType].omf) if int(p) >=lv-Lay and int(p) <lv+Lay ]
-                                    cutlevsa = [ v for p,v in zip(self[f].obsInfo[varName].loc[varType].prs,self[f].obsInfo[varName].loc[varType].oma) if int(p) >=lv-Lay and int(p) <lv+Lay ]
-                                    forplotname = 'all_levels_bylayers'
-                                [ dataByLevs[lv].append(il) for il in cutlevs ]
-                                [ dataByLevsa[lv].append(il) for il in cutlevsa ]
-                    f = f + 1
-                for lv in levs:
-                    if len(dataByLevs[lv]) != 0 and info_check[date.strftime("%d%H")] == True:
-                        mean_dataByLevs.update({int(lv): np.mean(np.array(dataByLevs[lv]))})
-                        std_dataByLevs.update({int(lv): np.std(np.array(dataByLevs[lv]))})
-                        count_dataByLevs.update({int(lv): len(np.array(dataByLevs[lv]))})
-                        mean_dataByLevsa.update({int(lv): np.mean(np.array(dataByLevsa[lv]))})
-                        std_dataByLevsa.update({int(lv): np.std(np.array(dataByLevsa[lv]))})
-                        count_dataByLevsa.update({int(lv): len(np.array(dataByLevsa[lv]))})
-                    else:
-                        mean_dataByLevs.update({int(lv): -99})
-                        std_dataByLevs.update({int(lv): -99})
-                        count_dataByLevs.update({int(lv): -99})
-                        mean_dataByLevsa.update({int(lv): -99})
-                        std_dataByLevsa.update({int(lv): -99})
-                        count_dataByLevsa.update({int(lv): -99})
-            
-            except:
-                if info_check[date.strftime("%d%H")] == True:
-                    print("ERROR in time_series function.")
-                else:
-                    print(setcolor.WARNING + "    >>> No information on this date (" + str(date.strftime("%Y-%m-%d:%H")) +") <<< " + setcolor.ENDC)
-
-                for lv in levs:
-                    mean_dataByLevs.update({int(lv): -99})
-                    std_dataByLevs.update({int(lv): -99})
-                    count_dataByLevs.update({int(lv): -99})
-                    mean_dataByLevsa.update({int(lv): -99})
-                    std_dataByLevsa.update({int(lv): -99})
-                    count_dataByLevsa.update({int(lv): -99})
-
-            if Level == None or Level == "Zlevs":
-                list_meanByLevs.append(list(mean_dataByLevs.values()))
-                list_stdByLevs.append(list(std_dataByLevs.values()))
-                list_countByLevs.append(list(count_dataByLevs.values()))
-                list_meanByLevsa.append(list(mean_dataByLevsa.values()))
-                list_stdByLevsa.append(list(std_dataByLevsa.values()))
-                list_countByLevsa.append(list(count_dataByLevsa.values()))
-            else:
-                list_meanByLevs.append(mean_dataByLevs[int(Level)])
-                list_stdByLevs.append(std_dataByLevs[int(Level)])
-                list_countByLevs.append(count_dataByLevs[int(Level)])
-                list_meanByLevsa.append(mean_dataByLevsa[int(Level)])
-                list_stdByLevsa.append(std_dataByLevsa[int(Level)])
-                list_countByLevsa.append(count_dataByLevsa[int(Level)])
-                
-            dataByLevs.clear()
-            mean_dataByLevs.clear()
-            std_dataByLevs.clear()
-            count_dataByLevs.clear()
-            dataByLevsa.clear()
-            mean_dataByLevsa.clear()
-            std_dataByLevsa.clear()
-            count_dataByLevsa.clear()
-
-            date_finale = date
-            date = date + timedelta(hours=int(delta))
-
             values_levs = [datefmt]
             values_levsa = [datefmt]
-            for me,sd,nd in zip(list_meanByLevs[-1][:],list_stdByLevs[-1][:],list_countByLevs[-1][:]):
+            for me,sd,nd in zip(list_meanByLevs[t],list_stdByLevs[t],list_countByLevs[t]):
                 values_levs.append(me)
                 values_levs.append(sd)
                 values_levs.append(nd)
-            for me,sd,nd in zip(list_meanByLevsa[-1][:],list_stdByLevsa[-1][:],list_countByLevsa[-1][:]):
+            for me,sd,nd in zip(list_meanByLevsa[t],list_stdByLevsa[t],list_countByLevsa[t]):
                 values_levsa.append(me)
                 values_levsa.append(sd)
                 values_levsa.append(nd)
             dset.append(values_levs)
             dseta.append(values_levsa)
 
-        print()
-        print(separator)
-        print()
-
-
         # ==============================================================================================================
         # Save dataset into CSV File ===================================================================================
 
@@ -545,7 +1214,7 @@ class read_diag(object):
         del(df)
         print(" Done \n")
 
-        return
+        return [dataout_file, dataout_filea]
 
 
 class plot_diag(object):
@@ -553,7 +1222,7 @@ class plot_diag(object):
     plot diagnostic file from gsi. 
     """
 
-    def plot(self, varName, varType, param, minVal=None, maxVal=None, mask=None, area=None, **kwargs):
+    def plot(self, varName, varType, param, minVal=None, maxVal=None, mask=None, area=None, region=None, render=None, stat='mean', **kwargs):
         '''
         The plot function makes a plot for the selected observation by using information of the following columns available within the dataframe.
  
@@ -578,6 +1247,18 @@ class plot_diag(object):
         In the above example, a plot will be made displaying by using the values of the used surface pressure observations of the kind 187 (ADPSFC).
 
         area = [Loni, Lati, Lonf, Latf]
+        region = a region name (e.g. 'SouthAmerica', 'Tropics', 'NH', see gsidiag.regions.REGIONS) or [Loni, Lati, Lonf, Latf]
+
+        Only the observations inside region (or area) are drawn, taken from the cached region rows of
+        the read_diag object. The map extent is area, or the limits of region.
+
+        render = 'density' draws the observations as a single image instead of one marker per observation:
+        the observations are aggregated in the pixels of the map, showing the mean of param in each pixel
+        (stat='mean') or the number of observations (stat='count'). The cost of drawing depends on the size
+        of the figure instead of the number of observations (e.g. tens of millions of radiances).
+
+        Example:
+        gd.plot('amsua', 'n19', 'omf', mask='nchan == 5', render='density', legend=True)
 
         '''
         #
@@ -597,7 +1278,7 @@ class plot_diag(object):
             del kwargs['ax']
 
         if kwargs.get('legend') is True:
-            divider = make_axes_locatable(ax)
+            divider = axes_grid1.make_axes_locatable(ax)
             cax     = divider.append_axes("right", size="5%", pad=0.1)
             kwargs['cax'] = cax
 
@@ -607,16 +1288,18 @@ class plot_diag(object):
         if 'cmap' not in kwargs:
             kwargs['cmap'] = 'jet'
 
+        select, area = _regionArea(area, region)
         ax = geoMap(area=area,ax=ax)
         
         # try: For issues reading the file (file not found)
         # in the except statement an error message is printed and continues for other dates
         try:
-            if mask is None:
-                ax  = self.obsInfo[varName].loc[varType].plot(param, ax=ax, vmin=minVal, vmax=maxVal, **kwargs, legend_kwds={'shrink': 0.5})
+            df = selectTable(self, varName, mask, select).loc[varType]
+
+            if render == 'density':
+                _densityMap(ax, df, param, stat, minVal, maxVal, kwargs)
             else:
-                df = self.obsInfo[varName].loc[varType]
-                ax = df.query(mask).plot(param, ax=ax, vmin=minVal, vmax=maxVal, **kwargs, legend_kwds={'shrink': 0.5})
+                ax = df.plot(param, ax=ax, vmin=minVal, vmax=maxVal, **kwargs, legend_kwds={'shrink': 0.5})
                     
         except:
             ax = None
@@ -626,7 +1309,84 @@ class plot_diag(object):
         
         return ax
 
-    def ptmap(self, varName, varType=None, mask=None, area=None, **kwargs):
+    def gridmap(self, varName, varType=None, param='omf', stat='mean', res=1.0, mask=None, area=None, minVal=None, maxVal=None,
+                dateIni=None, dateFin=None, nHour="06", **kwargs):
+        '''
+        The gridmap function maps the mean, standard deviation or number of observations (stat = 'mean', 'std'
+        or 'count') of a column (omf, oma, imp, obs, ...) binned on a regular lat/lon grid of res degrees.
+        The grid is drawn as a single image, instead of one marker per observation.
+
+        self may be a read_diag object, a list of cycles (from dateIni to dateFin), a cycleList, a
+        diagCollection, or a latlonGrid already filled (see gsidiag.grid).
+
+        Example:
+        gd.plot_diag.gridmap(gdf, 'amsua', 'n19', 'omf', stat='mean', res=2.0, mask='nchan == 5 & iuse == 1')
+
+        In the above example, the mean OmF of the channel 5 of AMSU-A/NOAA-19 is mapped on a 2 degrees grid.
+
+        area = [Loni, Lati, Lonf, Latf]
+
+        '''
+        #
+        # Parse options
+        #
+        if 'style' in kwargs:
+            plt.style.use(kwargs['style'])
+            del kwargs['style']
+        else:
+            plt.style.use('seaborn-v0_8')
+
+        if 'ax' not in kwargs:
+            fig = plt.figure(figsize=(12, 6))
+            ax  = fig.add_subplot(1, 1, 1)
+        else:
+            ax = kwargs['ax']
+            del kwargs['ax']
+
+        if 'title' in kwargs:
+            ax.set_title(kwargs['title'])
+            del kwargs['title']
+
+        if isinstance(self, latlonGrid):
+            grid = self
+        else:
+            grid = latlonGrid(res=res, area=area)
+            if hasattr(self, 'obsInfo'):
+                grid.add(datetime(1970, 1, 1), self, varName, varType, [param], mask)
+            else:
+                if dateIni is not None:
+                    dates = []
+                    date  = datetime.strptime(str(dateIni), "%Y%m%d%H")
+                    while (date <= datetime.strptime(str(dateFin), "%Y%m%d%H")):
+                        dates.append(date)
+                        date = date + timedelta(hours=int(nHour))
+                else:
+                    dates = self.dates
+                grid.update([(date, lambda f=f, date=date: _getCycle(self, f, date)) for f, date in enumerate(dates)],
+                            varName, varType, [param], mask)
+
+        if area is not None:
+            area = getRegion(area)
+            if area[0] > area[2]:
+                # crosses the dateline: the map shows all longitudes
+                area = [-180.0, area[1], 180.0, area[3]]
+        ax = geoMap(area=area,ax=ax)
+
+        try:
+            image = grid.plot(param, stat, ax=ax, minVal=minVal, maxVal=maxVal, zorder=2, **kwargs)
+
+            divider = axes_grid1.make_axes_locatable(ax)
+            cax     = divider.append_axes("right", size="5%", pad=0.1)
+            plt.colorbar(image, cax=cax, label=str(param)+' ('+str(stat)+')')
+
+        except:
+            ax = None
+            print("++++++++++++++++++++++++++ ERROR: file reading --> gridmap ++++++++++++++++++++++++++")
+            print(setcolor.WARNING + "    >>> No information on this date <<< " + setcolor.ENDC)
+
+        return ax
+
+    def ptmap(self, varName, varType=None, mask=None, area=None, region=None, **kwargs):
         '''
         The ptmap function plots the selected observation for the selected kinds.
 
@@ -639,6 +1399,9 @@ class plot_diag(object):
         the plot.
 
         area = [Loni, Lati, Lonf, Latf]
+        region = a region name (see gsidiag.regions.REGIONS) or [Loni, Lati, Lonf, Latf]
+
+        Only the observations inside region (or area) are drawn.
 
         '''
         #
@@ -682,7 +1445,9 @@ class plot_diag(object):
             kwargs['legend'] = False
                 
         
+        select, area = _regionArea(area, region)
         ax = geoMap(area=area,ax=ax)
+        table = selectTable(self, varName, mask, select)
 
         # color range
         if type(varType) is list:
@@ -693,23 +1458,15 @@ class plot_diag(object):
             cmin = 0
             cmax = 1
 
-        legend_labels = []
-        for i, kx in enumerate(varType):
-            df    = self.obsInfo[varName].loc[kx]
-
-            color = getColor(minVal=cmin, maxVal=cmax,
-                             value=i,hex=True,cmapName='Paired')
-            instr = getVarInfo(kx,varName,'instrument')
-            
-            label = '\n'.join(wrap(varName + '-' + str(kx) + ' | ' + instr,30))
-            legend_labels.append(mpatches.Patch(color=color, 
-                                 label=label)
-                                )
+        # category table: one color and legend label for each kx
+        colors = getColor(minVal=cmin, maxVal=cmax, value=list(range(len(varType))), hex=True, cmapName='Paired')
+        labels = ['\n'.join(wrap(varName + '-' + str(kx) + ' | ' + str(instrument),30))
+                  for kx, instrument in zip(varType, getVarInfos(varType, varName, 'instrument'))]
+        legend_labels = [mpatches.Patch(color=color, label=label) for color, label in zip(colors, labels)]
 
-            if mask is None:
-               ax = df.plot(ax=ax,c=color, **kwargs)
-            else:
-               ax = df.query(mask).plot(ax=ax,c=color, **kwargs)
+        # all kx are drawn at once, colored by the position of their kx in varType
+        category = pd.Index(varType).get_indexer(table.index.get_level_values(0))
+        ax = _scatterMap(ax, table, category, colors, kwargs)
         
         if legend is True:
             plt.subplots_adjust(bottom=0.30)
@@ -719,7 +1476,7 @@ class plot_diag(object):
 
         return ax
 
-    def pvmap(self, varName=None, mask=None, area=None, **kwargs):
+    def pvmap(self, varName=None, mask=None, area=None, region=None, **kwargs):
         '''
         The pvmap function plots the selected observations without specifying its kinds. It used the flag iuse instead. 
 
@@ -729,6 +1486,9 @@ class plot_diag(object):
         In the above example, a plot for the used (iuse=1) observations of wind (uv), surface pressure (ps), temperature (t) and moisture (q) will be made. 
 
         area = [Loni, Lati, Lonf, Latf]
+        region = a region name (see gsidiag.regions.REGIONS) or [Loni, Lati, Lonf, Latf]
+
+        Only the observations inside region (or area) are drawn.
 
         '''
         #
@@ -771,7 +1531,7 @@ class plot_diag(object):
         # total by var
         #
         
-        total = self.obs.groupby(level=0).size()
+        total = pd.Series({var: self.obsInfo[var].shape[0] for var in self.obsInfo})
 
         #
         # parse options em kwargs
@@ -784,21 +1544,25 @@ class plot_diag(object):
             else:
                 varName = [varName]
         
+        select, area = _regionArea(area, region)
         ax = geoMap(area=area,ax=ax)
 
         
         colors_palette = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22']
-        setColor = 0
-        legend_labels = []
-        for var in varName:
-            df    = self.obsInfo[var]
-            legend_labels.append(mpatches.Patch(color=colors_palette[setColor], label=var) )
-
-            if mask is None:
-               ax = df.plot(ax=ax,c=colors_palette[setColor], **kwargs)
-            else:
-               ax = df.query(mask).plot(ax=ax,c=colors_palette[setColor], **kwargs)
-            setColor += 1
+        colors = [colors_palette[i % len(colors_palette)] for i in range(len(varName))]
+        legend_labels = [mpatches.Patch(color=color, label=var) for color, var in zip(colors, varName)]
+
+        # the coordinates of all variables are drawn at once, with the category (variable) of each point
+        lat, lon, category = [], [], []
+        for i, var in enumerate(varName):
+            df = selectTable(self, var, mask, select)
+            lat.append(df['lat'].to_numpy(dtype=np.float64))
+            lon.append(df['lon'].to_numpy(dtype=np.float64))
+            category.append(np.full(df.shape[0], i, dtype=np.int64))
+
+        if len(category) > 0:
+            points = pd.DataFrame({'lat': np.concatenate(lat), 'lon': np.concatenate(lon)})
+            ax = _scatterMap(ax, points, np.concatenate(category), colors, kwargs)
 
         if legend is True:
             plt.legend(handles=legend_labels, numpoints=1, loc='best', bbox_to_anchor=(1.1, 0.6), 
@@ -854,12 +1618,15 @@ class plot_diag(object):
         plt.xlabel('KX')
         plt.title('Variable Name : '+varName)
  
-    def impConv(self,varName):
+    def impConv(self, varName, dateIni=None, dateFin=None, nHour="06", cube=None):
 
         """
         Plots the impacts of observations of the total average of each variable.
+        self may also be a list of cycles (or a diagCube): the impacts are then averaged
+        over the cycles from dateIni to dateFin (see diagCube.impact).
 
         Usage: impConv(fileopen,var) var='t','p','q','uv','gps'
+               impConv(gdf_list,'uv',dateIni=2019121000,dateFin=2019121118)
         """
 
         try:
@@ -869,8 +1636,8 @@ class plot_diag(object):
         except ImportError:
            pass # module doesn't exist, deal with it.
         #
-        df0 = self.obsInfo[varName].drop(columns='geometry')
-        df = df0.groupby(level=0).mean().reset_index()
+        df = _impactSummary(self, varName, dateIni, dateFin, nHour, cube)
+        df = df.rename(columns={'imp_mean': 'imp'}).rename_axis('kx').reset_index()
 
         sb.barplot(data=df, x='imp', y='kx', orient='h', errorbar=None, color = "darkseagreen")
 
@@ -879,10 +1646,11 @@ class plot_diag(object):
         plt.title('Variable Name : '+varName)
 
 
-    def impRad(self,varName):
+    def impRad(self, varName, dateIni=None, dateFin=None, nHour="06", cube=None):
 
         """
         Plots the impacts of observations of the total average of radiances.
+        self may also be a list of cycles (or a diagCube), see impConv.
 
         Usage: impRad(fileopen,var) var='amsua'
         """
@@ -894,18 +1662,19 @@ class plot_diag(object):
         except ImportError:
            pass
         #
-        df0 = self.obsInfo[varName].drop(columns='geometry')
-        df = df0.groupby(level=0).mean().reset_index()
+        df = _impactSummary(self, varName, dateIni, dateFin, nHour, cube)
+        df = df.rename(columns={'imp_mean': 'imp'}).rename_axis('SatId').reset_index()
 
         sb.barplot(data=df, x='imp', y='SatId', orient='h', errorbar=None, color = "darkcyan")
         plt.ylabel('Satellite_ID')
         plt.xlabel('Impact of observations')
         plt.title('Variable Name : '+varName)
 
-    def ibfConv(self,varName):
+    def ibfConv(self, varName, dateIni=None, dateFin=None, nHour="06", cube=None):
 
         """
         Plots the impacts beneficial fractional of observations of the total average of each variable (impact < 0).
+        self may also be a list of cycles (or a diagCube), see impConv.
 
         Usage: ibfConv(fileopen,var) var='t','p','q','uv','gps'
         """
@@ -917,8 +1686,7 @@ class plot_diag(object):
         except ImportError:
            pass # module doesn't exist, deal with it.
         #
-        df0 = self.obsInfo[varName].drop(columns='geometry')
-        df = ((df0.query('imp<0').groupby('kx').size()/df0.groupby('kx').size())*100).reset_index(name='ibf')
+        df = _impactSummary(self, varName, dateIni, dateFin, nHour, cube).rename_axis('kx').reset_index()
 
         sb.barplot(data=df, x='ibf', y='kx', orient='h', errorbar=None, color = "aqua")
 
@@ -927,10 +1695,11 @@ class plot_diag(object):
         plt.title('Variable Name : '+varName)
 
 
-    def ibfRad(self,varName):
+    def ibfRad(self, varName, dateIni=None, dateFin=None, nHour="06", cube=None):
 
         """
         Plots the impacts beneficial fractional of observations  of the total average of radiances (impact < 0).
+        self may also be a list of cycles (or a diagCube), see impConv.
 
         Usage: ibfRad(fileopen,var) var='amsua'
         """
@@ -942,8 +1711,7 @@ class plot_diag(object):
         except ImportError:
            pass
         #
-        df0 = self.obsInfo[varName].drop(columns='geometry')
-        df = ((df0.query('imp<0').groupby('SatId').size()/df0.groupby('SatId').size())*100).reset_index(name='ibf')
+        df = _impactSummary(self, varName, dateIni, dateFin, nHour, cube).rename_axis('SatId').reset_index()
 
         sb.barplot(data=df, x='ibf', y='SatId', orient='h', errorbar=None, color = "aqua")
 
@@ -951,6 +1719,50 @@ class plot_diag(object):
         plt.xlabel('Fractional beneficial impact')
         plt.title('Variable Name : '+varName)
 
+    def desroziers(self, varName, varType=None, mask=None, dateIni=None, dateFin=None, nHour="06", cube=None, region=None, area=None, **kwargs):
+
+        """
+        Estimates the observation (sigma_o) and background (sigma_b) errors of varName/varType
+        with the Desroziers diagnostics, accumulated over the cycles from dateIni to dateFin
+        (the cycles must be read with the analysis file). Plots the assigned and estimated
+        errors by level (or channel) and returns the table of diagCube.desroziers.
+
+        self may be a read_diag object, a list of cycles, a cycleList, a diagCollection or
+        a diagCube. With region (see gsidiag.regions.REGIONS, or [Loni, Lati, Lonf, Latf]; area
+        is also accepted, as in the maps) only its observations are used.
+
+        Usage: tab = desroziers(gdf_list, 'uv', 220, mask='iuse == 1', dateIni=2019121000, dateFin=2019121118)
+        """
+
+        if region is None:
+            region = area
+        cube, dates = _periodCube(self, varName, mask, dateIni, dateFin, nHour, cube, region)
+        df = cube.desroziers(varName, varType, dates=dates, mask=mask, by='lev', region=region)
+
+        fig, ax = plt.subplots(1, 1, figsize=(5, 6))
+        ax.plot(df['oer'], df.index, 'k-o', label='Assigned')
+        ax.plot(df['sigma_o'], df.index, 'b-s', label='Desroziers $\\sigma_o$')
+        ax.plot(df['sigma_b'], df.index, 'r--^', label='Desroziers $\\sigma_b$')
+
+        if varType is not None:
+            varInfo = getVarInfo(varType, varName, 'instrument')
+        else:
+            varInfo = None
+        if varInfo is None:
+            varInfo = 'Unknown instrument'
+
+        if varType is not None and not str(varType).isdigit():   # SatId: radiance channels
+            ax.set_ylabel('Channel')
+        else:
+            ax.set_ylabel('Pressure (hPa)')
+            ax.invert_yaxis()
+        ax.set_xlabel('Error')
+        ax.legend(fancybox=True, frameon=True, shadow=True, loc='best')
+        plt.title(str(varName) + '-' + str(varType) + '  |  ' + varInfo, loc='left', fontsize=9)
+        plt.tight_layout()
+
+        return df
+
     def vcount(self,**kwargs):
 
         """
@@ -1044,7 +1856,7 @@ class plot_diag(object):
         plt.xlabel('KX number')
         plt.title('Total Number of Observations')
  
-    def time_series(self, varName=None, varType=None, mask=None, dateIni=None, dateFin=None, nHour="06", vminOMA=None, vmaxOMA=None, vminSTD=0.0, vmaxSTD=14.0, Level=None, Lay = None, SingleL=None, Clean=None):
+    def time_series(self, varName=None, varType=None, mask=None, dateIni=None, dateFin=None, nHour="06", vminOMA=None, vmaxOMA=None, vminSTD=0.0, vmaxSTD=14.0, Level=None, Lay = None, SingleL=None, Clean=None, cube=None, region=None, nWorkers=1, area=None):
         
         '''
         The time_series function plots a time series for different levels/layers or for a single level/layer considering
@@ -1067,17 +1879,28 @@ class plot_diag(object):
         SingleL = "OneL"      # When level is fixed, ex: 1000 hPa, the plot can be exactly in this level (SingleL = None),
                               # on all levels as a single layer (SingleL = "All") or on a layer centered in Level and bounded by
                               # Level-Lay and Level+Lay (SingleL="OneL"). If Lay is not defined, it will be used a standard value of 50 hPa. 
+        cube = None           # A diagCube (see gsidiag.cube) where the cycles are reduced: only the cycles not yet in the cube are read.
+                              # self may also be a diagCube, and then the figures are made from the cube only.
+        region = None         # Only the observations of a region (e.g. 'SouthAmerica', 'Tropics', 'NH', see gsidiag.regions.REGIONS)
+                              # or of [Loni, Lati, Lonf, Latf]. Defaults to all observations.
+        area = None           # The same as region (the name used by the maps).
+        nWorkers = 1          # Number of processes drawing the figures (Agg backend, see gsidiag.render). None: number of cores.
+
+        Returns the number of figures saved.
 
         '''
+        from .render import renderFigures
+
         if Clean == None:
             Clean = True
 
+        if region is None:
+            region = area
+
         delta = nHour
         omflag = "OmF"
         omflaga = "OmA"
 
-        Laydef = 50
-
         separator = " ====================================================================================================="
 
         print()
@@ -1093,197 +1916,49 @@ class plot_diag(object):
         print()
 
         if mask == None:
-            maski  = "iuse>-99999.9"
             cmaski = "iuse = All"
         else:
-            maski  = mask
             cmaski = mask
 
+        datei = datetime.strptime(str(dateIni), "%Y%m%d%H")
+        datef = datetime.strptime(str(dateFin), "%Y%m%d%H")
+        date  = datei
+
+        dates, DayHour_tmp = [], []
+        while (date <= datef):
+            dates.append(date)
+            DayHour_tmp.append(date.strftime("%d%H"))
+            date = date + timedelta(hours=int(delta))
+        date_finale = dates[-1]
+
         if type(Level) == list:
             zlevs_def = Level
             Level = "Zlevs"
         else:
-            zlevs_def = list(map(int,self[0].zlevs))
+            zlevs_def = list(map(int,_cycleLevels(self, dates)))
 
         print(zlevs_def)
 
-        datei = datetime.strptime(str(dateIni), "%Y%m%d%H")
-        datef = datetime.strptime(str(dateFin), "%Y%m%d%H")
-        date  = datei
+        cube = _cycleCube(self, varName, mask, dates, cube, region)
+        _cubeGaps(cube, varName, mask, dates, region)
 
-        levs_tmp, DayHour_tmp = [], []
-        info_check = {}
-        f = 0
-        while (date <= datef):
-            
-            datefmt = date.strftime("%Y%m%d%H")
-            DayHour_tmp.append(date.strftime("%d%H"))
-            
-            dataDict = self[f].obsInfo[varName].query(maski).loc[varType]
-            info_check.update({date.strftime("%d%H"):True})
+        levs, bounds, forplot, forplotname = _seriesLayers(cube, varName, varType, mask, dates, Level, Lay, SingleL, zlevs_def, region)
+        print(' Levels: ', levs, end='\n')
 
-            if 'prs' in dataDict and (Level == None or Level == "Zlevs"):
-                if(Level == None):
-                    levs_tmp.extend(list(set(map(int,dataDict['prs']))))
-                else:
-                    levs_tmp = zlevs_def[::-1]
-                info_check.update({date.strftime("%d%H"):True})
-                print(date.strftime(' Preparing data for: ' + "%Y-%m-%d:%H"))
-                print(' Levels: ', sorted(levs_tmp), end='\n')
-                print("")
-                f = f + 1
-            else:
-                if (Level != None and Level != "Zlevs") and info_check[date.strftime("%d%H")] == True:
-                    levs_tmp.extend([Level])
-                    print(date.strftime(' Preparing data for: ' + "%Y-%m-%d:%H"), ' - Level: ', Level , end='\n')
-                    f = f + 1
-                else:
-                    info_check.update({date.strftime("%d%H"):False})
-                    print(date.strftime(setcolor.WARNING + ' Preparing data for: ' + "%Y-%m-%d:%H"), ' - No information on this date ' + setcolor.ENDC, end='\n')
-
-            del(dataDict)
-            
-            date = date + timedelta(hours=int(delta))
-            
         if(len(DayHour_tmp) > 4):
             DayHour = [hr if (ix % int(len(DayHour_tmp) / 4)) == 0 else '' for ix, hr in enumerate(DayHour_tmp)]
         else:
             DayHour = DayHour_tmp
 
-        zlevs = [z if z in zlevs_def else "" for z in sorted(set(levs_tmp+zlevs_def))]
+        zlevs = [z if z in zlevs_def else "" for z in sorted(set(levs+zlevs_def))]
 
         print()
         print(separator)
         print()
 
-        list_meanByLevs, list_stdByLevs, list_countByLevs = [], [], []
-        list_meanByLevsa, list_stdByLevsa, list_countByLevsa = [], [], []
-        date = datei
-        levs = sorted(list(set(levs_tmp)))
-        levs_tmp.clear()
-        del(levs_tmp[:])
-
-        f = 0
-        while (date <= datef):
-
-            print(date.strftime(' Calculating for ' + "%Y-%m-%d:%H"))
-            datefmt = date.strftime("%Y%m%d%H")
-
-            try: 
-                if info_check[date.strftime("%d%H")] == True:
-                    dataDict = self[f].obsInfo[varName].query(maski).loc[varType]
-                    dataByLevs, mean_dataByLevs, std_dataByLevs, count_dataByLevs = {}, {}, {}, {}
-                    dataByLevsa, mean_dataByLevsa, std_dataByLevsa, count_dataByLevsa = {}, {}, {}, {}
-                    [dataByLevs.update({int(lvl): []}) for lvl in levs]
-                    [dataByLevsa.update({int(lvl): []}) for lvl in levs]
-                    if Level != None and Level != "Zlevs":
-                        if SingleL == None:
-                            [ dataByLevs[int(p)].append(v) for p,v in zip(self[f].obsInfo[varName].query(maski).loc[varType].prs,self[f].obsInfo[varName].query(maski).loc[varType].omf) if int(p) == Level ]
-                            [ dataByLevsa[int(p)].append(v) for p,v in zip(self[f].obsInfo[varName].query(maski).loc[varType].prs,self[f].obsInfo[varName].query(maski).loc[varType].oma) if int(p) == Level ]
-                            forplot = ' Level='+str(Level) +'hPa'
-                            forplotname = 'level_'+str(Level) +'hPa'
-                        else:
-                            if SingleL == "All":
-                                [ dataByLevs[Level].append(v) for v in self[f].obsInfo[varName].query(maski).loc[varType].omf ]
-                                [ dataByLevsa[Level].append(v) for v in self[f].obsInfo[varName].query(maski).loc[varType].oma ]
-                                forplot = ' Layer=Entire Atmosphere'
-                                forplotname = 'layer_allAtm'
-                            else:
-                                if SingleL == "OneL":
-                                    if Lay == None:
-                                        print("")
-                                        print(" Variable Lay is None, resetting it to its default value: "+str(Laydef)+" hPa.")
-                                        print("")
-                                        Lay = Laydef
-                                    [ dataByLevs[int(Level)].append(v) for p,v in zip(self[f].obsInfo[varName].query(maski).loc[varType].prs,self[f].obsInfo[varName].query(maski).loc[varType].omf) if int(p) >=Level-Lay and int(p) <Level+Lay ]
-                                    [ dataByLevsa[int(Level)].append(v) for p,v in zip(self[f].obsInfo[varName].query(maski).loc[varType].prs,self[f].obsInfo[varName].query(maski).loc[varType].oma) if int(p) >=Level-Lay and int(p) <Level+Lay ]
-                                    forplot = ' Layer='+str(Level+Lay)+'-'+str(Level-Lay)+'hPa'
-                                    forplotname = 'layer_'+str(Level+Lay)+'-'+str(Level-Lay)+'hPa'
-                                else:
-                                    print(" Wrong value for variable SingleL. Please, check it and rerun the script.")    
-                    else:
-                        if Level == None:
-                            [ dataByLevs[int(p)].append(v) for p,v in zip(self[f].obsInfo[varName].query(maski).loc[varType].prs,self[f].obsInfo[varName].query(maski).loc[varType].omf) ]
-                            [ dataByLevsa[int(p)].append(v) for p,v in zip(self[f].obsInfo[varName].query(maski).loc[varType].prs,self[f].obsInfo[varName].query(maski).loc[varType].oma) ]
-                            forplotname = 'all_levels_byLevels'
-                        else:
-                            for ll in range(len(levs)):
-                                lv = levs[ll]
-                                if Lay == None:
-                                    if ll == 0:
-                                        Llayi = 0
-                                    else:
-                                        Llayi = (levs[ll] - levs[ll-1]) / 2.0
-                                    if ll == len(levs)-1:
-                                        Llayf = Llayi
-                                    else:
-                                        Llayf = (levs[ll+1] - levs[ll]) / 2.0
-                                    cutlevs = [ v for p,v in zip(self[f].obsInfo[varName].query(maski).loc[varType].prs,self[f].obsInfo[varName].query(maski).loc[varType].omf) if int(p) >=lv-Llayi and int(p) <lv+Llayf ]
-                                    cutlevsa = [ v for p,v in zip(self[f].obsInfo[varName].query(maski).loc[varType].prs,self[f].obsInfo[varName].query(maski).loc[varType].oma) if int(p) >=lv-Llayi and int(p) <lv+Llayf ]
-                                    forplotname = 'all_levels_filledLayers'
-                                else:
-                                    cutlevs = [ v for p,v in zip(self[f].obsInfo[varName].query(maski).loc[varType].prs,self[f].obsInfo[varName].query(maski).loc[varType].omf) if int(p) >=lv-Lay and int(p) <lv+Lay ]
-                                    cutlevsa = [ v for p,v in zip(self[f].obsInfo[varName].query(maski).loc[varType].prs,self[f].obsInfo[varName].query(maski).loc[varType].oma) if int(p) >=lv-Lay and int(p) <lv+Lay ]
-                                    forplotname = 'all_levels_bylayers_'+str(Lay)+"hPa"
-                                [ dataByLevs[lv].append(il) for il in cutlevs ]
-                                [ dataByLevsa[lv].append(il) for il in cutlevsa ]
-                    f = f + 1
-                for lv in levs:
-                    if len(dataByLevs[lv]) != 0 and info_check[date.strftime("%d%H")] == True:
-                        mean_dataByLevs.update({int(lv): np.mean(np.array(dataByLevs[lv]))})
-                        std_dataByLevs.update({int(lv): np.std(np.array(dataByLevs[lv]))})
-                        count_dataByLevs.update({int(lv): len(np.array(dataByLevs[lv]))})
-                        mean_dataByLevsa.update({int(lv): np.mean(np.array(dataByLevsa[lv]))})
-                        std_dataByLevsa.update({int(lv): np.std(np.array(dataByLevsa[lv]))})
-                        count_dataByLevsa.update({int(lv): len(np.array(dataByLevsa[lv]))})
-                    else:
-                        mean_dataByLevs.update({int(lv): -99})
-                        std_dataByLevs.update({int(lv): -99})
-                        count_dataByLevs.update({int(lv): -99})
-                        mean_dataByLevsa.update({int(lv): -99})
-                        std_dataByLevsa.update({int(lv): -99})
-                        count_dataByLevsa.update({int(lv): -99})
-            
-            except:
-                if info_check[date.strftime("%d%H")] == True:
-                    print("ERROR in time_series function.")
-                else:
-                    print(setcolor.WARNING + "    >>> No information on this date (" + str(date.strftime("%Y-%m-%d:%H")) +") <<< " + setcolor.ENDC)
-
-                for lv in levs:
-                    mean_dataByLevs.update({int(lv): -99})
-                    std_dataByLevs.update({int(lv): -99})
-                    count_dataByLevs.update({int(lv): -99})
-                    mean_dataByLevsa.update({int(lv): -99})
-                    std_dataByLevsa.update({int(lv): -99})
-                    count_dataByLevsa.update({int(lv): -99})
-
-            if Level == None or Level == "Zlevs":
-                list_meanByLevs.append(list(mean_dataByLevs.values()))
-                list_stdByLevs.append(list(std_dataByLevs.values()))
-                list_countByLevs.append(list(count_dataByLevs.values()))
-                list_meanByLevsa.append(list(mean_dataByLevsa.values()))
-                list_stdByLevsa.append(list(std_dataByLevsa.values()))
-                list_countByLevsa.append(list(count_dataByLevsa.values()))
-            else:
-                list_meanByLevs.append(mean_dataByLevs[int(Level)])
-                list_stdByLevs.append(std_dataByLevs[int(Level)])
-                list_countByLevs.append(count_dataByLevs[int(Level)])
-                list_meanByLevsa.append(mean_dataByLevsa[int(Level)])
-                list_stdByLevsa.append(std_dataByLevsa[int(Level)])
-                list_countByLevsa.append(count_dataByLevsa[int(Level)])
-
-            dataByLevs.clear()
-            mean_dataByLevs.clear()
-            std_dataByLevs.clear()
-            count_dataByLevs.clear()
-            dataByLevsa.clear()
-            mean_dataByLevsa.clear()
-            std_dataByLevsa.clear()
-            count_dataByLevsa.clear()
-
-            date_finale = date
-            date = date + timedelta(hours=int(delta))
+        list_meanByLevs, list_stdByLevs, list_countByLevs, list_meanByLevsa, list_stdByLevsa, list_countByLevsa = _cubeLayers(cube, varName, varType, mask, dates, bounds, region)
+        if Level != None and Level != "Zlevs":
+            list_meanByLevs, list_stdByLevs, list_countByLevs, list_meanByLevsa, list_stdByLevsa, list_countByLevsa = [l[:, 0] for l in [list_meanByLevs, list_stdByLevs, list_countByLevs, list_meanByLevsa, list_stdByLevsa, list_countByLevsa]]
 
         print()
         print(separator)
@@ -1294,17 +1969,8 @@ class plot_diag(object):
         y_axis      = np.arange(0, len(zlevs), 1)
         x_axis      = np.arange(0, len(DayHour), 1)
 
-        mean_final  = np.ma.masked_array(np.array(list_meanByLevs), np.array(list_meanByLevs) == -99)
-        std_final   = np.ma.masked_array(np.array(list_stdByLevs), np.array(list_stdByLevs) == -99)
-        count_final = np.ma.masked_array(np.array(list_countByLevs), np.array(list_countByLevs) == -99)
-        mean_finala  = np.ma.masked_array(np.array(list_meanByLevsa), np.array(list_meanByLevsa) == -99)
-        std_finala   = np.ma.masked_array(np.array(list_stdByLevsa), np.array(list_stdByLevsa) == -99)
-        count_finala = np.ma.masked_array(np.array(list_countByLevsa), np.array(list_countByLevsa) == -99)
-
-        OMF_inf = np.array(list_meanByLevs)-np.array(list_stdByLevs)
-        OMF_sup = np.array(list_meanByLevs)+np.array(list_stdByLevs)
-        OMA_inf = np.array(list_meanByLevsa)-np.array(list_stdByLevsa)
-        OMA_sup = np.array(list_meanByLevsa)+np.array(list_stdByLevsa)
+        mean_final,  std_final,  count_final  = list_meanByLevs,  list_stdByLevs,  list_countByLevs
+        mean_finala, std_finala, count_finala = list_meanByLevsa, list_stdByLevsa, list_countByLevsa
 
         mean_limit_inf = np.min(np.array([np.min(mean_final), np.min(mean_finala)]))
         mean_limit_sup = np.max(np.array([np.max(mean_final), np.max(mean_finala)]))
@@ -1312,13 +1978,6 @@ class plot_diag(object):
         std_limit_inf = np.min(np.array([np.min(std_final), np.min(std_finala)]))
         std_limit_sup = np.max(np.array([np.max(std_final), np.max(std_finala)]))
 
-        omfoma_limit_inf =     (np.min(np.array([np.min(OMF_inf), np.min(OMA_inf)])))
-        if omfoma_limit_inf > 0:
-            omfoma_limit_inf = 0.9*omfoma_limit_inf
-        else:
-            omfoma_limit_inf = 1.1*omfoma_limit_inf  
-        omfoma_limit_sup = 1.1*(np.max(np.array([np.max(OMF_sup), np.max(OMA_sup)])))
-
         if (vminOMA == None) and (vmaxOMA == None): vminOMA, vmaxOMA = mean_limit_inf, 1.1*mean_limit_sup
         if vminOMA > 0:
             vminOMA = 0.9*vminOMA
@@ -1332,339 +1991,34 @@ class plot_diag(object):
         date_title = str(datei.strftime("%d%b")) + '-' + str(date_finale.strftime("%d%b")) + ' ' + str(date_finale.strftime("%Y"))
         instrument_title = str(varName) + '-' + str(varType) + '  |  ' + getVarInfo(varType, varName, 'instrument')
 
+        # the data of each figure are prepared here, and the figures are drawn by renderFigures
+        frame = {'x_axis': x_axis, 'DayHour': DayHour, 'instrument_title': instrument_title, 'date_title': date_title, 'cmaski': cmaski}
+        figName = 'time_series_'+str(varName) + '-' + str(varType)+'_{}_'+forplotname+'.png'
+
         # Figure with more than one level - default levels: [600, 700, 800, 900, 1000]
         if Level == None or Level == "Zlevs":
-            fig = plt.figure(figsize=(6, 9))
-            plt.rcParams['axes.facecolor'] = 'None'
-            plt.rcParams['hatch.linewidth'] = 0.3
-
-            ##### OMF
-
-            plt.subplot(3, 1, 1)
-            ax = plt.gca()
-            ax.add_patch(mpl.patches.Rectangle((-1,-1),(len(DayHour)+1),(len(levs)+3), hatch='xxxxx', color='black', fill=False, snap=False, zorder=0))
-            plt.imshow(np.flipud(mean_final.T), origin='lower', vmin=-vmaxOMAabs, vmax=vmaxOMAabs, cmap='seismic', aspect='auto', zorder=1,interpolation='none')
-            plt.colorbar(orientation='horizontal', pad=0.18, shrink=1.0)
-            plt.tight_layout()
-            plt.title(instrument_title, loc='left', fontsize=10)
-            plt.title(date_title, loc='right', fontsize=10)
-            plt.ylabel('Vertical Levels (hPa)')
-            plt.xlabel('Mean ('+omflag+')', labelpad=50)
-            plt.yticks(y_axis, zlevs[::-1])
-            plt.xticks(x_axis, DayHour)
-            major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-            ax.set_xticks(major_ticks)
-
-            plt.subplot(3, 1, 2)
-            ax = plt.gca()
-            ax.add_patch(mpl.patches.Rectangle((-1,-1),(len(DayHour)+1),(len(levs)+3), hatch='xxxxx', color='black', fill=False, snap=False, zorder=0))
-            plt.imshow(np.flipud(std_final.T), origin='lower', vmin=vminSTD, vmax=vmaxSTD, cmap='Blues', aspect='auto', zorder=1,interpolation='none')
-            plt.colorbar(orientation='horizontal', pad=0.18, shrink=1.0)
-            plt.tight_layout()
-            plt.title(instrument_title, loc='left', fontsize=10)
-            plt.title(date_title, loc='right', fontsize=10)
-            plt.ylabel('Vertical Levels (hPa)')
-            plt.xlabel('Standard Deviation ('+omflag+')', labelpad=50)
-            plt.yticks(y_axis, zlevs[::-1])
-            plt.xticks(x_axis, DayHour)
-            major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-            ax.set_xticks(major_ticks)
-
-            plt.subplot(3, 1, 3)
-            ax = plt.gca()
-            ax.add_patch(mpl.patches.Rectangle((-1,-1),(len(DayHour)+1),(len(levs)+3), hatch='xxxxx', color='black', fill=False, snap=False, zorder=0))
-            plt.imshow(np.flipud(count_final.T), origin='lower', vmin=0.0, vmax=np.max(count_final), cmap='gist_heat_r', aspect='auto', zorder=1,interpolation='none')
-            plt.colorbar(orientation='horizontal', pad=0.18, shrink=1.0)
-            plt.title(instrument_title, loc='left', fontsize=10)
-            plt.title(date_title, loc='right', fontsize=10)
-            plt.ylabel('Vertical Levels (hPa)')
-            plt.xlabel('Total Observations'+" ("+cmaski+")", labelpad=50)
-            plt.yticks(y_axis, zlevs[::-1])
-            plt.xticks(x_axis, DayHour)
-            major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-            ax.set_xticks(major_ticks)
-
-            plt.tight_layout()
-            plt.savefig('time_series_'+str(varName) + '-' + str(varType)+'_'+omflag+'_'+forplotname+'.png', bbox_inches='tight', dpi=100)
-            if Clean:
-                plt.clf()
-
-            ##### OMA
-
-            fig = plt.figure(figsize=(6, 9))
-            plt.rcParams['axes.facecolor'] = 'None'
-            plt.rcParams['hatch.linewidth'] = 0.3
-
-            plt.subplot(3, 1, 1)
-            ax = plt.gca()
-            ax.add_patch(mpl.patches.Rectangle((-1,-1),(len(DayHour)+1),(len(levs)+3), hatch='xxxxx', color='black', fill=False, snap=False, zorder=0))
-            plt.imshow(np.flipud(mean_finala.T), origin='lower', vmin=-vmaxOMAabs, vmax=vmaxOMAabs, cmap='seismic', aspect='auto', zorder=1,interpolation='none')
-            plt.colorbar(orientation='horizontal', pad=0.18, shrink=1.0)
-            plt.tight_layout()
-            plt.title(instrument_title, loc='left', fontsize=10)
-            plt.title(date_title, loc='right', fontsize=10)
-            plt.ylabel('Vertical Levels (hPa)')
-            plt.xlabel('Mean ('+omflaga+')', labelpad=50)
-            plt.yticks(y_axis, zlevs[::-1])
-            plt.xticks(x_axis, DayHour)
-            major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-            ax.set_xticks(major_ticks)
-
-            plt.subplot(3, 1, 2)
-            ax = plt.gca()
-            ax.add_patch(mpl.patches.Rectangle((-1,-1),(len(DayHour)+1),(len(levs)+3), hatch='xxxxx', color='black', fill=False, snap=False, zorder=0))
-            plt.imshow(np.flipud(std_finala.T), origin='lower', vmin=vminSTD, vmax=vmaxSTD, cmap='Blues', aspect='auto', zorder=1,interpolation='none')
-            plt.colorbar(orientation='horizontal', pad=0.18, shrink=1.0)
-            plt.tight_layout()
-            plt.title(instrument_title, loc='left', fontsize=10)
-            plt.title(date_title, loc='right', fontsize=10)
-            plt.ylabel('Vertical Levels (hPa)')
-            plt.xlabel('Standard Deviation ('+omflaga+')', labelpad=50)
-            plt.yticks(y_axis, zlevs[::-1])
-            plt.xticks(x_axis, DayHour)
-            major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-            ax.set_xticks(major_ticks)
-
-            plt.subplot(3, 1, 3)
-            ax = plt.gca()
-            ax.add_patch(mpl.patches.Rectangle((-1,-1),(len(DayHour)+1),(len(levs)+3), hatch='xxxxx', color='black', fill=False, snap=False, zorder=0))
-            plt.imshow(np.flipud(count_finala.T), origin='lower', vmin=0.0, vmax=np.max(count_finala), cmap='gist_heat_r', aspect='auto', zorder=1,interpolation='none')
-            plt.colorbar(orientation='horizontal', pad=0.18, shrink=1.0)
-            plt.title(instrument_title, loc='left', fontsize=10)
-            plt.title(date_title, loc='right', fontsize=10)
-            plt.ylabel('Vertical Levels (hPa)')
-            plt.xlabel('Total Observations'+" ("+cmaski+")", labelpad=50)
-            plt.yticks(y_axis, zlevs[::-1])
-            plt.xticks(x_axis, DayHour)
-            major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-            ax.set_xticks(major_ticks)
-
-            plt.tight_layout()
-            plt.savefig('time_series_'+str(varName) + '-' + str(varType)+'_'+omflaga+'_'+forplotname+'.png', bbox_inches='tight', dpi=100)
-            if Clean:
-                plt.clf()
+            jobs = [(_seriesHeatmap, (figName.format(omflag), mean_final, std_final, count_final, omflag, 'Vertical Levels (hPa)',
+                                      y_axis, zlevs[::-1], len(levs), vmaxOMAabs, vminSTD, vmaxSTD), frame),
+                    (_seriesHeatmap, (figName.format(omflaga), mean_finala, std_finala, count_finala, omflaga, 'Vertical Levels (hPa)',
+                                      y_axis, zlevs[::-1], len(levs), vmaxOMAabs, vminSTD, vmaxSTD), frame)]
 
         # Figure with only one level
         else:
-        
-            ##### OMF
-
-            fig = plt.figure(figsize=(6, 4))
-            fig, ax1 = plt.subplots(1, 1)
-            plt.style.use('seaborn-v0_8-ticks')
-
-            plt.axhline(y=0.0,ls='solid',c='#d3d3d3')
-            plt.annotate(forplot, xy=(0.0, 0.965), xytext=(0,0), xycoords='axes fraction', textcoords='offset points', color='lightgray', fontweight='bold', fontsize='12',
-            horizontalalignment='left', verticalalignment='center')
-
-            ax1.plot(x_axis, list_meanByLevs, "b-", label="Mean ("+omflag+")")
-            ax1.plot(x_axis, list_meanByLevs, "bo", label="Mean ("+omflag+")")
-            ax1.set_xlabel('Date (DayHour)', fontsize=10)
-            # Make the y-axis label, ticks and tick labels match the line color.
-            ax1.set_ylim(vminOMA, vmaxOMA)
-            ax1.set_ylabel('Mean ('+omflag+')', color='b', fontsize=10)
-            ax1.tick_params('y', colors='b')
-            plt.xticks(x_axis, DayHour)
-            major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-            ax1.set_xticks(major_ticks)
-            plt.axhline(y=np.mean(list_meanByLevs),ls='dotted',c='blue')
-            
-            ax2 = ax1.twinx()
-            ax2.plot(x_axis, std_final, "r-", label="Std. Deviation ("+omflag+")")
-            ax2.plot(x_axis, std_final, "rs", label="Std. Deviation ("+omflag+")")
-            ax2.set_ylim(vminSTD, vmaxSTD)
-            ax2.set_ylabel('Std. Deviation ('+omflag+')', color='r', fontsize=10)
-            ax2.tick_params('y', colors='r')
-            major_ticks = np.arange(0, max(x_axis), len(DayHour)/len(list(filter(None, DayHour))))
-            ax2.set_xticks(major_ticks)
-            plt.axhline(y=np.mean(std_final),ls='dotted',c='red')
-
-            ax3 = ax1.twinx()
-            ax3.plot(x_axis, count_final, "g-", label="Total Observations"+" ("+cmaski+")")
-            ax3.plot(x_axis, count_final, "g^", label="Total Observations"+" ("+cmaski+")")
-            ax3.set_ylim(0, np.max(count_final) + (np.max(count_final)/8))
-            ax3.set_ylabel('Total Observations'+" ("+cmaski+")", color='g', fontsize=10)
-            ax3.tick_params('y', colors='g')
-            ax3.spines["right"].set_position(("axes", 1.15))
-            plt.yticks(rotation=90)
-            plt.axhline(y=np.mean(count_final),ls='dotted',c='green')
-
-            ax3.set_title(instrument_title, loc='left', fontsize=10)
-            ax3.set_title(date_title, loc='right', fontsize=10)
-
-            plt.xticks(x_axis, DayHour)
-            major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-            ax3.set_xticks(major_ticks)
-            plt.title(instrument_title, loc='left', fontsize=9)
-            plt.title(date_title, loc='right', fontsize=9)
-            plt.subplots_adjust(left=None, bottom=None, right=0.80, top=None)
-            plt.tight_layout()
-            plt.savefig('time_series_'+str(varName) + '-' + str(varType)+'_'+omflag+'_'+forplotname+'.png', bbox_inches='tight', dpi=100)
-            if Clean:
-                plt.clf()
-
-            ##### OMA
-
-            fig = plt.figure(figsize=(6, 4))
-            fig, ax1 = plt.subplots(1, 1)
-            plt.style.use('seaborn-v0_8-ticks')
-
-            plt.axhline(y=0.0,ls='solid',c='#d3d3d3')
-            plt.annotate(forplot, xy=(0.0, 0.965), xytext=(0, 0), xycoords='axes fraction', textcoords='offset points', color='lightgray', fontweight='bold', fontsize='12',
-            horizontalalignment='left', verticalalignment='center')
-
-            ax1.plot(x_axis, list_meanByLevsa, "b-", label="Mean ("+omflaga+")")
-            ax1.plot(x_axis, list_meanByLevsa, "bo", label="Mean ("+omflaga+")")
-            ax1.set_xlabel('Date (DayHour)', fontsize=10)
-            # Make the y-axis label, ticks and tick labels match the line color.
-            ax1.set_ylim(vminOMA, vmaxOMA)
-            ax1.set_ylabel('Mean ('+omflaga+')', color='b', fontsize=10)
-            ax1.tick_params('y', colors='b')
-            plt.xticks(x_axis, DayHour)
-            major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-            ax1.set_xticks(major_ticks)
-            plt.axhline(y=np.mean(list_meanByLevsa),ls='dotted',c='blue')
-            
-            ax2 = ax1.twinx()
-            ax2.plot(x_axis, std_finala, "r-", label="Std. Deviation ("+omflaga+")")
-            ax2.plot(x_axis, std_finala, "rs", label="Std. Deviation ("+omflaga+")")
-            ax2.set_ylim(vminSTD, vmaxSTD)
-            ax2.set_ylabel('Std. Deviation ('+omflaga+')', color='r', fontsize=10)
-            ax2.tick_params('y', colors='r')
-            plt.axhline(y=np.mean(std_finala),ls='dotted',c='red')
-
-            ax3 = ax1.twinx()
-            ax3.plot(x_axis, count_finala, "g-", label="Total Observations"+" ("+cmaski+")")
-            ax3.plot(x_axis, count_finala, "g^", label="Total Observations"+" ("+cmaski+")")
-            ax3.set_ylim(0, 1.2*np.max(count_finala))
-            ax3.set_ylabel('Total Observations'+" ("+cmaski+")", color='g', fontsize=10)
-            ax3.tick_params('y', colors='g')
-            ax3.spines["right"].set_position(("axes", 1.15))
-            plt.yticks(rotation=90)
-            plt.axhline(y=np.mean(count_finala),ls='dotted',c='green')
-
-            ax3.set_title(instrument_title, loc='left', fontsize=10)
-            ax3.set_title(date_title, loc='right', fontsize=10)
-
-            plt.xticks(x_axis, DayHour)
-            major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-            ax3.set_xticks(major_ticks)
-            plt.title(instrument_title, loc='left', fontsize=9)
-            plt.title(date_title, loc='right', fontsize=9)
-            plt.subplots_adjust(left=None, bottom=None, right=0.80, top=None)
-            plt.tight_layout()
-            plt.savefig('time_series_'+str(varName) + '-' + str(varType)+'_'+omflaga+'_'+forplotname+'.png', bbox_inches='tight', dpi=100)
-            if Clean:
-                plt.clf()
-
-            ##### OMF and OMA
-
-            fig = plt.figure(figsize=(6, 4))
-            fig, ax1 = plt.subplots(1, 1)
-            plt.style.use('seaborn-v0_8-ticks')
-
-            plt.annotate(forplot, xy=(0.0, 0.965), xytext=(0, 0), xycoords='axes fraction', textcoords='offset points', color='lightgray', fontweight='bold', fontsize='12',
-            horizontalalignment='left', verticalalignment='center')
-
-            plt.axhline(y=0.0,ls='solid',c='#d3d3d3')
-            ax1.plot(x_axis, list_meanByLevs, "b-", label="Mean ("+omflag+")")
-            ax1.plot(x_axis, list_meanByLevs, "bo", label="")
-            ax1.set_xlabel('Date (DayHour)', fontsize=10)
-            # Make the y-axis label, ticks and tick labels match the line color.
-            ax1.set_ylim(vminOMA, vmaxOMA)
-            ax1.tick_params('y', colors='b')
-            plt.xticks(x_axis, DayHour)
-            major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-            ax1.set_xticks(major_ticks)
-            plt.axhline(y=np.mean(list_meanByLevs),ls='dotted',c='blue')
-            
-            ax1.plot(x_axis, list_meanByLevsa, "r-", label="Mean ("+omflaga+")")
-            ax1.plot(x_axis, list_meanByLevsa, "rs", label="")
-            ax1.set_ylim(vminOMA, vmaxOMA)
-            ax1.tick_params('y', colors='black')
-            plt.axhline(y=np.mean(list_meanByLevsa),ls='dotted',c='red')
-
-            plt.xticks(x_axis, DayHour)
-            major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-            ax1.set_xticks(major_ticks)
-            plt.title(instrument_title, loc='left', fontsize=9)
-            plt.title(date_title, loc='right', fontsize=9)
-            plt.subplots_adjust(left=None, bottom=None, right=0.80, top=None)
-
-            ybox1 = TextArea('Mean ('+omflag+')' , textprops=dict(color="b", size=12,rotation=90,ha='left',va='bottom'))
-            ybox2 = TextArea(' and '             , textprops=dict(color="k", size=12,rotation=90,ha='left',va='bottom'))
-            ybox3 = TextArea('Mean ('+omflaga+')', textprops=dict(color="r", size=12,rotation=90,ha='left',va='bottom'))
-
-            ybox = VPacker(children=[ybox3, ybox2, ybox1],align="bottom", pad=0, sep=5)
-
-            anchored_ybox = AnchoredOffsetbox(loc=3, child=ybox, pad=0., frameon=False, bbox_to_anchor=(-0.12, 0.16), 
-                                                bbox_transform=ax1.transAxes, borderpad=0.)
+            jobs = _seriesJobs(figName, mean_final, std_final, count_final, mean_finala, std_finala, count_finala,
+                               forplot, vminOMA, vmaxOMA, vminSTD, vmaxSTD, frame)
 
-            ax1.add_artist(anchored_ybox)
-            plt.legend()
-
-            plt.tight_layout()
-            plt.savefig('time_series_'+str(varName) + '-' + str(varType)+'_OmFOmA_'+ forplotname +'.png', bbox_inches='tight', dpi=100)
-
-            # OMF and OMA and StdDev
-
-            fig = plt.figure(figsize=(6, 4))
-            fig, ax1 = plt.subplots(1, 1)
-            plt.style.use('seaborn-v0_8-ticks')
-            
-            ax1.plot(x_axis, list_meanByLevs, lw=2, label='OmF Mean', color='blue', zorder=1)
-            ax1.fill_between(x_axis, OMF_inf, OMF_sup, label='OmF Std Dev',  facecolor='blue', alpha=0.3, zorder=1)
-            ax1.plot(x_axis, list_meanByLevsa, lw=2, label='OmA Mean', color='red', zorder=2)
-            ax1.fill_between(x_axis, OMA_inf, OMA_sup, label='OmA Std Dev',  facecolor='red', alpha=0.3, zorder=2)
-            ybox1 = TextArea(' OmF ' , textprops=dict(color="b", size=12,rotation=90,ha='left',va='bottom'))
-            ybox2 = TextArea(' | '             , textprops=dict(color="k", size=12,rotation=90,ha='left',va='bottom'))
-            ybox3 = TextArea(' OmA ', textprops=dict(color="r", size=12,rotation=90,ha='left',va='bottom'))
-
-            ybox = VPacker(children=[ybox3, ybox2, ybox1],align="bottom", pad=0, sep=5)
-
-            anchored_ybox = AnchoredOffsetbox(loc=3, child=ybox, pad=0., frameon=False, bbox_to_anchor=(-0.125, 0.42), 
-                                                bbox_transform=ax1.transAxes, borderpad=0.)
-
-            ax1.add_artist(anchored_ybox)
-            ax1.set_xlabel('Date (DayHour)', fontsize=12)
-            ax1.set_ylim(omfoma_limit_inf,omfoma_limit_sup)
-            ax1.legend(bbox_to_anchor=(-0.11, -0.25),ncol=4,loc='lower left', fancybox=True, shadow=False, frameon=True, framealpha=1.0, fontsize='11', facecolor='white', edgecolor='lightgray')
-            plt.grid(axis='y', color='lightgray', linestyle='-.', linewidth=0.5, zorder=0)
-
-            ax2 = ax1.twinx()
-            ax2.plot(x_axis, list_countByLevsa, lw=2, label='OmA', linestyle='--', color='green', zorder=3)
-            ax2.plot(x_axis, list_countByLevs, lw=2, label='OmF', linestyle=':', color='purple', zorder=3)
-            ax2.set_ylabel('Total Observations (OmF | OmA)'+"\n ("+cmaski+")", fontsize=12)
-            ax2.set_ylim(0, (np.max(list_countByLevsa) + np.max(list_countByLevsa)/5))
-            ax2.legend(loc='upper left', ncol=2, fancybox=True, shadow=False, frameon=True, framealpha=1.0, fontsize='11', facecolor='white', edgecolor='lightgray')
-            
-            plt.xticks(x_axis, DayHour)
-            major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-            ax2.set_xticks(major_ticks)
-            plt.title(instrument_title, loc='left', fontsize=10)
-            plt.title(date_title, loc='right', fontsize=10)
-        
-            t = plt.annotate(forplot, xy=(0.78, 0.995), xytext=(-9, -9), xycoords='axes fraction', textcoords='offset points', color='darkgray', fontweight='bold', fontsize='10',
-                                horizontalalignment='center', verticalalignment='center')
-            t.set_bbox(dict(facecolor='whitesmoke', alpha=1.0, edgecolor='whitesmoke', boxstyle="square,pad=0.3"))
-
-            plt.tight_layout()
-            plt.savefig('time_series_'+str(varName) + '-' + str(varType)+'_OmFOmA_StdDev_'+ forplotname +'.png', bbox_inches='tight', dpi=100)
-
-        # Cleaning up
-        if Clean:
-            plt.close('all')
+        nFigures = renderFigures(jobs, nWorkers, close=Clean)
 
         print(' Done!')
         print()
         
                
 
-        return
+        return nFigures
         
 # radiance inicio
 
-    def time_series_radi(self, varName=None, varType=None, mask=None, dateIni=None, dateFin=None, nHour="06", vminOMA=None, vmaxOMA=None, vminSTD=0.0, vmaxSTD=14.0, channel=None, Clean=None):
+    def time_series_radi(self, varName=None, varType=None, mask=None, dateIni=None, dateFin=None, nHour="06", vminOMA=None, vmaxOMA=None, vminSTD=0.0, vmaxSTD=14.0, channel=None, Clean=None, cube=None, region=None, nWorkers=1, area=None):
         
         '''
         The time_series_radi function plots a time series for radiance data in different chanell OmF and OmA. This function is different from time_series because the level are not defined by radiance dada.
@@ -1681,12 +2035,25 @@ class plot_diag(object):
         vmaxOMA = 4.0         # Y-axis Maximum Value for OmF or OmA
         vminSTD = 0.0         # Y-axis Minimum Value for Standard Deviation
         vmaxSTD = 14.0        # Y-axis Maximum Value for Standard Deviation
-        channel = 1           # Time Series channel, if any (None), all nchan are plotted 
+        channel = 1           # Time Series channel, if any (None), all channels found in the files are plotted 
+        cube = None           # A diagCube (see gsidiag.cube) where the cycles are reduced: only the cycles not yet in the cube are read.
+                              # self may also be a diagCube, and then the figures are made from the cube only.
+        region = None         # Only the observations of a region (e.g. 'SouthAmerica', 'Tropics', 'NH', see gsidiag.regions.REGIONS)
+                              # or of [Loni, Lati, Lonf, Latf]. Defaults to all observations.
+        area = None           # The same as region (the name used by the maps).
+        nWorkers = 1          # Number of processes drawing the figures (Agg backend, see gsidiag.render). None: number of cores.
+
+        Returns the number of figures saved.
 
         '''
+        from .render import renderFigures
+
         if Clean == None:
             Clean = True
 
+        if region is None:
+            region = area
+
         delta = nHour
         omflag = "OmF"
         omflaga = "OmA"
@@ -1706,189 +2073,67 @@ class plot_diag(object):
         print()
 
         if mask == None:
-            maski  = "iuse>-99999.9"
             cmaski = "iuse = All"
         else:
-            maski  = mask
             cmaski = mask
 
         if type(channel) == list:
             zchan = channel
             chanList = 1
-            zchans_def = zchan
-        elif channel == None:
-            zchan = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15]  #list of all channels of the amsua sensor 
-            chanList = 0
-            zchans_def = zchan
         else:
             zchan = channel
-            chanList = 0 
-            zchans_def = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15]  #list of all channels of the amsua sensor 
-
-            
-#         print(zchan,chanList)
+            chanList = 0
 
         datei = datetime.strptime(str(dateIni), "%Y%m%d%H")
         datef = datetime.strptime(str(dateFin), "%Y%m%d%H")
         date  = datei
 
-        levs_tmp, DayHour_tmp = [], []
-        info_check = {}
-        f = 0
-        
+        dates, DayHour_tmp = [], []
         while (date <= datef):
-            
-            datefmt = date.strftime("%Y%m%d%H")
+            dates.append(date)
             DayHour_tmp.append(date.strftime("%d%H"))
-            
-            # Try: For issues reading the file (file not found), 
-            # in the except statement an error message is printed and continues for other dates
-            try:
-                dataDict = self[f].obsInfo[varName].query(maski).loc[varType]
-                info_check.update({date.strftime("%d%H"):True})
-
-                if 'nchan' in dataDict and (channel == None or chanList == 1):
-                    levs_tmp = zchans_def[::-1]
-                    info_check.update({date.strftime("%d%H"):True})
-                    print(date.strftime(' Preparing data for: Canais de radiancia' + "%Y-%m-%d:%H"))
-                    print(' Channels: ', sorted(levs_tmp), end='\n')
-                    print("")
-                    f = f + 1
-                else:
-                    if (channel != None and chanList != 1) and info_check[date.strftime("%d%H")] == True:
-                        levs_tmp.extend([zchan])
-                        info_check.update({date.strftime("%d%H"):True})
-                        print(date.strftime(' Preparing data for: ' + "%Y-%m-%d:%H"), ' - Channel de radiancia: ', zchan , end='\n')
-                        f = f + 1
-                    else:
-                        info_check.update({date.strftime("%d%H"):False})
-                        print(date.strftime(setcolor.WARNING + ' Preparing data for: ' + "%Y-%m-%d:%H"), ' - No information on this date ' + setcolor.ENDC, end='\n')
-                
-                del(dataDict)
-                
-            except:
-                print("++++++++++++++++++++++++++ ERROR: file reading --> time_series_radi ++++++++++++++++++++++++++")
-                print(setcolor.WARNING + "    >>> No information on this date (" + str(date.strftime("%Y-%m-%d:%H")) +") <<< " + setcolor.ENDC)
-                info_check.update({date.strftime("%d%H"):False})
-                print(" Update info --> info_check[date.strftime(%d%H)]",info_check[date.strftime("%d%H")])
-                print("")
-                f = f + 1
-            
             date = date + timedelta(hours=int(delta))
-            
+        date_finale = dates[-1]
+
+        cube = _cycleCube(self, varName, mask, dates, cube, region)
+        _cubeGaps(cube, varName, mask, dates, region)
+
+        # channels of the sensor/platform found in the files
+        if chanList == 1:
+            zchans_def = zchan
+        else:
+            zchans_def = cube.levels(varName, varType, mask, dates, observed=False, region=region)
+
+        if channel == None or chanList == 1:
+            levs = sorted(set(zchans_def))
+            forplot = ''
+            forplotname = 'List_Channel'
+        else:
+            levs = [zchan]
+            forplot = 'Channel ='+str(zchan)
+            forplotname = 'Channel_'+str(zchan)
+
         if(len(DayHour_tmp) > 4):
             DayHour = [hr if (ix % int(len(DayHour_tmp) / 4)) == 0 else '' for ix, hr in enumerate(DayHour_tmp)]
         else:
             DayHour = DayHour_tmp
         
-        zlevs = [z if z in zchans_def else "" for z in sorted(set(levs_tmp+zchans_def))]
+        zlevs = [z if z in zchans_def else "" for z in sorted(set(levs+zchans_def))]
 
         print()
         print(separator)
         print()
 
-        list_meanByLevs, list_stdByLevs, list_countByLevs = [], [], []
-        list_meanByLevsa, list_stdByLevsa, list_countByLevsa = [], [], []
-        date = datei
-        levs = sorted(list(set(levs_tmp)))
-        levs_tmp.clear()
-        del(levs_tmp[:])
-        
         print('channels = ',levs)
 
-        
-        f = 0
-        while (date <= datef):
-
-            print(date.strftime(' Calculating for ' + "%Y-%m-%d:%H"))
-            datefmt = date.strftime("%Y%m%d%H")
-
-
-            try: 
-                if info_check[date.strftime("%d%H")] == True:
-                    dataDict = self[f].obsInfo[varName].query(maski).loc[varType]
-                    dataByLevs, mean_dataByLevs, std_dataByLevs, count_dataByLevs = {}, {}, {}, {}
-                    dataByLevsa, mean_dataByLevsa, std_dataByLevsa, count_dataByLevsa = {}, {}, {}, {}
-                    [dataByLevs.update({int(lvl): []}) for lvl in levs]
-                    [dataByLevsa.update({int(lvl): []}) for lvl in levs]
-                    if channel != None and chanList != 1: 
-                        forplot = 'Channel ='+str(zchan)
-                        forplotname = 'Channel_'+str(zchan)
-                        [ dataByLevs[int(zchan)].append(v) for p,v in zip(self[f].obsInfo[varName].query(maski).loc[varType].nchan,self[f].obsInfo[varName].query(maski).loc[varType].omf) if int(p) == zchan ]
-                        [ dataByLevsa[int(zchan)].append(v) for p,v in zip(self[f].obsInfo[varName].query(maski).loc[varType].nchan,self[f].obsInfo[varName].query(maski).loc[varType].oma) if int(p) == zchan ]   
-                    else:
-                        for ll in range(len(levs)):
-                            lv = levs[ll]
-                            cutlevs = [ v for p,v in zip(self[f].obsInfo[varName].query(maski).loc[varType].nchan,self[f].obsInfo[varName].query(maski).loc[varType].omf) if int(p) == lv ]
-                            cutlevsa = [ v for p,v in zip(self[f].obsInfo[varName].query(maski).loc[varType].nchan,self[f].obsInfo[varName].query(maski).loc[varType].oma) if int(p) == lv ]
-                            forplotname = 'List_Channel'
-                            [ dataByLevs[lv].append(il) for il in cutlevs ]
-                            [ dataByLevsa[lv].append(il) for il in cutlevsa ]
-                            cutlevs.clear()
-                            cutlevsa.clear()
-                    f = f + 1
-                for lv in levs:
-                    if len(dataByLevs[lv]) != 0 and info_check[date.strftime("%d%H")] == True:
-                        mean_dataByLevs.update({int(lv): np.mean(np.array(dataByLevs[lv]))})
-                        std_dataByLevs.update({int(lv): np.std(np.array(dataByLevs[lv]))})
-                        count_dataByLevs.update({int(lv): len(np.array(dataByLevs[lv]))})
-                        mean_dataByLevsa.update({int(lv): np.mean(np.array(dataByLevsa[lv]))})
-                        std_dataByLevsa.update({int(lv): np.std(np.array(dataByLevsa[lv]))})
-                        count_dataByLevsa.update({int(lv): len(np.array(dataByLevsa[lv]))})
-                    else:
-                        mean_dataByLevs.update({int(lv): -99})
-                        std_dataByLevs.update({int(lv): -99})
-                        count_dataByLevs.update({int(lv): -99})
-                        mean_dataByLevsa.update({int(lv): -99})
-                        std_dataByLevsa.update({int(lv): -99})
-                        count_dataByLevsa.update({int(lv): -99})
-            
-            except:
-                dataByLevs, mean_dataByLevs, std_dataByLevs, count_dataByLevs = {}, {}, {}, {}
-                dataByLevsa, mean_dataByLevsa, std_dataByLevsa, count_dataByLevsa = {}, {}, {}, {}
-                if info_check[date.strftime("%d%H")] == True:
-                    print("ERROR in time_series function.")
-                else:
-                    f = f + 1 # Estava faltando: sem essa atualização o dataDict do próximo UTC não é concatenado corretamente
-                    print(setcolor.WARNING + "    >>> No information on this date (" + str(date.strftime("%Y-%m-%d:%H")) +") <<< " + setcolor.ENDC)
-
-                for lv in levs:
-                    mean_dataByLevs.update({int(lv): -99})
-                    std_dataByLevs.update({int(lv): -99})
-                    count_dataByLevs.update({int(lv): -99})
-                    mean_dataByLevsa.update({int(lv): -99})
-                    std_dataByLevsa.update({int(lv): -99})
-                    count_dataByLevsa.update({int(lv): -99})
-
-            
-            if channel == None or chanList == 1:
-                list_meanByLevs.append(list(reversed(mean_dataByLevs.values())))
-                list_stdByLevs.append(list(reversed(std_dataByLevs.values())))
-                list_countByLevs.append(list(reversed(count_dataByLevs.values())))
-                list_meanByLevsa.append(list(reversed(mean_dataByLevsa.values())))
-                list_stdByLevsa.append(list(reversed(std_dataByLevsa.values())))
-                list_countByLevsa.append(list(reversed(count_dataByLevsa.values())))
-            else:
-                list_meanByLevs.append(mean_dataByLevs[int(zchan)])
-                list_stdByLevs.append(std_dataByLevs[int(zchan)])
-                list_countByLevs.append(count_dataByLevs[int(zchan)])
-                list_meanByLevsa.append(mean_dataByLevsa[int(zchan)])
-                list_stdByLevsa.append(std_dataByLevsa[int(zchan)])
-                list_countByLevsa.append(count_dataByLevsa[int(zchan)])
-
-            dataByLevs.clear()
-            mean_dataByLevs.clear()
-            std_dataByLevs.clear()
-            count_dataByLevs.clear()
-            dataByLevsa.clear()
-            mean_dataByLevsa.clear()
-            std_dataByLevsa.clear()
-            count_dataByLevsa.clear()
-
-            date_finale = date
-            date = date + timedelta(hours=int(delta))
+        # (time x channel) statistics of all channels at once
+        levs, layers = cube.channelSeries(varName, varType, dates, mask=mask, channels=levs, region=region)
+        list_meanByLevs, list_stdByLevs, list_countByLevs, list_meanByLevsa, list_stdByLevsa, list_countByLevsa = _cubeArrays(layers)
+        if channel == None or chanList == 1:
+            list_meanByLevs, list_stdByLevs, list_countByLevs, list_meanByLevsa, list_stdByLevsa, list_countByLevsa = [l[:, ::-1] for l in [list_meanByLevs, list_stdByLevs, list_countByLevs, list_meanByLevsa, list_stdByLevsa, list_countByLevsa]]
+        else:
+            list_meanByLevs, list_stdByLevs, list_countByLevs, list_meanByLevsa, list_stdByLevsa, list_countByLevsa = [l[:, 0] for l in [list_meanByLevs, list_stdByLevs, list_countByLevs, list_meanByLevsa, list_stdByLevsa, list_countByLevsa]]
 
-        
         print()
         print(separator)
         print()
@@ -1898,17 +2143,14 @@ class plot_diag(object):
         y_axis      = np.arange(0, len(zlevs), 1)
         x_axis      = np.arange(0, len(DayHour), 1)
 
-        mean_final  = np.ma.masked_array(np.array(list_meanByLevs), np.array(list_meanByLevs) == -99)
-        std_final   = np.ma.masked_array(np.array(list_stdByLevs), np.array(list_stdByLevs) == -99)
-        count_final = np.ma.masked_array(np.array(list_countByLevs), np.array(list_countByLevs) == -99)
-        mean_finala  = np.ma.masked_array(np.array(list_meanByLevsa), np.array(list_meanByLevsa) == -99)
-        std_finala   = np.ma.masked_array(np.array(list_stdByLevsa), np.array(list_stdByLevsa) == -99)
-        count_finala = np.ma.masked_array(np.array(list_countByLevsa), np.array(list_countByLevsa) == -99)
+        if len(zlevs) > 30:
+            # hyperspectral sensors: label only some of the channels
+            step   = int(np.ceil(len(zlevs) / 20.0))
+            y_axis = y_axis[::step]
+            zlevs  = zlevs[::step]
 
-        OMF_inf = np.array(list_meanByLevs)-np.array(list_stdByLevs)
-        OMF_sup = np.array(list_meanByLevs)+np.array(list_stdByLevs)
-        OMA_inf = np.array(list_meanByLevsa)-np.array(list_stdByLevsa)
-        OMA_sup = np.array(list_meanByLevsa)+np.array(list_stdByLevsa)
+        mean_final,  std_final,  count_final  = list_meanByLevs,  list_stdByLevs,  list_countByLevs
+        mean_finala, std_finala, count_finala = list_meanByLevsa, list_stdByLevsa, list_countByLevsa
 
         mean_limit_inf = np.min(np.array([np.min(mean_final), np.min(mean_finala)]))
         mean_limit_sup = np.max(np.array([np.max(mean_final), np.max(mean_finala)]))
@@ -1916,13 +2158,6 @@ class plot_diag(object):
         std_limit_inf = np.min(np.array([np.min(std_final), np.min(std_finala)]))
         std_limit_sup = np.max(np.array([np.max(std_final), np.max(std_finala)]))
 
-        omfoma_limit_inf =     (np.min(np.array([np.min(OMF_inf), np.min(OMA_inf)])))
-        if omfoma_limit_inf > 0:
-            omfoma_limit_inf = 0.9*omfoma_limit_inf
-        else:
-            omfoma_limit_inf = 1.1*omfoma_limit_inf  
-        omfoma_limit_sup = 1.1*(np.max(np.array([np.max(OMF_sup), np.max(OMA_sup)])))
-
         if (vminOMA == None) and (vmaxOMA == None): vminOMA, vmaxOMA = mean_limit_inf, 1.1*mean_limit_sup
         if vminOMA > 0:
             vminOMA = 0.9*vminOMA
@@ -1934,343 +2169,36 @@ class plot_diag(object):
         if (vminSTD == None) and (vmaxSTD == None): vminSTD, vmaxSTD = std_limit_inf - 0.1*std_limit_inf,  1.1*std_limit_sup
 
         date_title = str(datei.strftime("%d%b")) + '-' + str(date_finale.strftime("%d%b")) + ' ' + str(date_finale.strftime("%Y"))
-        instrument_title = str(varName) + '-' + str(varType) + '  |  ' + getVarInfo(varType, varName, 'instrument')
+        instrument_title = str(varName) + '-' + str(varType) + '  |  ' + (varInfo if varInfo is not None else 'Unknown instrument')
+
+        # the data of each figure are prepared here, and the figures are drawn by renderFigures
+        frame = {'x_axis': x_axis, 'DayHour': DayHour, 'instrument_title': instrument_title, 'date_title': date_title, 'cmaski': cmaski}
 
         # Figure with more than one channel - default all channels
         if channel == None or chanList == 1:
-            fig = plt.figure(figsize=(6, 9))
-            plt.rcParams['axes.facecolor'] = 'None'
-            plt.rcParams['hatch.linewidth'] = 0.3
-
-            ##### OMF
-
-            plt.subplot(3, 1, 1)
-            ax = plt.gca()
-            ax.add_patch(mpl.patches.Rectangle((-1,-1),(len(DayHour)+1),(len(levs)+3), hatch='xxxxx', color='black', fill=False, snap=False, zorder=0))
-            plt.imshow(np.flipud(mean_final.T), origin='lower', vmin=-vmaxOMAabs, vmax=vmaxOMAabs, cmap='seismic', aspect='auto', zorder=1,interpolation='none')
-            plt.colorbar(orientation='horizontal', pad=0.18, shrink=1.0)
-            plt.tight_layout()
-            plt.title(instrument_title, loc='left', fontsize=10)
-            plt.title(date_title, loc='right', fontsize=10)
-            plt.ylabel('Channels')
-            plt.xlabel('Mean ('+omflag+')', labelpad=50)
-            plt.yticks(y_axis, zlevs)
-            plt.xticks(x_axis, DayHour)
-            major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-            ax.set_xticks(major_ticks)
-
-            plt.subplot(3, 1, 2)
-            ax = plt.gca()
-            ax.add_patch(mpl.patches.Rectangle((-1,-1),(len(DayHour)+1),(len(levs)+3), hatch='xxxxx', color='black', fill=False, snap=False, zorder=0))
-            plt.imshow(np.flipud(std_final.T), origin='lower', vmin=vminSTD, vmax=vmaxSTD, cmap='Blues', aspect='auto', zorder=1,interpolation='none')
-            plt.colorbar(orientation='horizontal', pad=0.18, shrink=1.0)
-            plt.tight_layout()
-            plt.title(instrument_title, loc='left', fontsize=10)
-            plt.title(date_title, loc='right', fontsize=10)
-            plt.ylabel('Channels')
-            plt.xlabel('Standard Deviation ('+omflag+')', labelpad=50)
-            plt.yticks(y_axis, zlevs)
-            plt.xticks(x_axis, DayHour)
-            major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-            ax.set_xticks(major_ticks)
-
-            plt.subplot(3, 1, 3)
-            ax = plt.gca()
-            ax.add_patch(mpl.patches.Rectangle((-1,-1),(len(DayHour)+1),(len(levs)+3), hatch='xxxxx', color='black', fill=False, snap=False, zorder=0))
-            plt.imshow(np.flipud(count_final.T), origin='lower', vmin=0.0, vmax=np.max(count_final), cmap='gist_heat_r', aspect='auto', zorder=1,interpolation='none')
-            plt.colorbar(orientation='horizontal', pad=0.18, shrink=1.0)
-            plt.title(instrument_title, loc='left', fontsize=10)
-            plt.title(date_title, loc='right', fontsize=10)
-            plt.ylabel('Channels')
-            plt.xlabel('Total Observations'+" ("+cmaski+")", labelpad=50)
-            plt.yticks(y_axis, zlevs)
-            plt.xticks(x_axis, DayHour)
-            major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-            ax.set_xticks(major_ticks)
-
-            plt.tight_layout()
             if chanList == 1:
-                plt.savefig('hovmoller_'+str(varName) + '-' + str(varType)+'_'+omflag+'_'+forplotname+'.png', bbox_inches='tight', dpi=100)
+                figName = 'hovmoller_'+str(varName) + '-' + str(varType)+'_{}_'+forplotname+'.png'
             else:
-                plt.savefig('hovmoller_'+str(varName) + '-' + str(varType)+'_'+omflag+'.png', bbox_inches='tight', dpi=100)
-            if Clean:
-                plt.clf()
-
-            ##### OMA
-
-            fig = plt.figure(figsize=(6, 9))
-            plt.rcParams['axes.facecolor'] = 'None'
-            plt.rcParams['hatch.linewidth'] = 0.3
-
-            plt.subplot(3, 1, 1)
-            ax = plt.gca()
-            ax.add_patch(mpl.patches.Rectangle((-1,-1),(len(DayHour)+1),(len(levs)+3), hatch='xxxxx', color='black', fill=False, snap=False, zorder=0))
-            plt.imshow(np.flipud(mean_finala.T), origin='lower', vmin=-vmaxOMAabs, vmax=vmaxOMAabs, cmap='seismic', aspect='auto', zorder=1,interpolation='none')
-            plt.colorbar(orientation='horizontal', pad=0.18, shrink=1.0)
-            plt.tight_layout()
-            plt.title(instrument_title, loc='left', fontsize=10)
-            plt.title(date_title, loc='right', fontsize=10)
-            plt.ylabel('Channels')
-            plt.xlabel('Mean ('+omflaga+')', labelpad=50)
-            plt.yticks(y_axis, zlevs)
-            plt.xticks(x_axis, DayHour)
-            major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-            ax.set_xticks(major_ticks)
-
-            plt.subplot(3, 1, 2)
-            ax = plt.gca()
-            ax.add_patch(mpl.patches.Rectangle((-1,-1),(len(DayHour)+1),(len(levs)+3), hatch='xxxxx', color='black', fill=False, snap=False, zorder=0))
-            plt.imshow(np.flipud(std_finala.T), origin='lower', vmin=vminSTD, vmax=vmaxSTD, cmap='Blues', aspect='auto', zorder=1,interpolation='none')
-            plt.colorbar(orientation='horizontal', pad=0.18, shrink=1.0)
-            plt.tight_layout()
-            plt.title(instrument_title, loc='left', fontsize=10)
-            plt.title(date_title, loc='right', fontsize=10)
-            plt.ylabel('Channels')
-            plt.xlabel('Standard Deviation ('+omflaga+')', labelpad=50)
-            plt.yticks(y_axis, zlevs)
-            plt.xticks(x_axis, DayHour)
-            major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-            ax.set_xticks(major_ticks)
-
-            plt.subplot(3, 1, 3)
-            ax = plt.gca()
-            ax.add_patch(mpl.patches.Rectangle((-1,-1),(len(DayHour)+1),(len(levs)+3), hatch='xxxxx', color='black', fill=False, snap=False, zorder=0))
-            plt.imshow(np.flipud(count_finala.T), origin='lower', vmin=0.0, vmax=np.max(count_finala), cmap='gist_heat_r', aspect='auto', zorder=1,interpolation='none')
-            plt.colorbar(orientation='horizontal', pad=0.18, shrink=1.0)
-            plt.title(instrument_title, loc='left', fontsize=10)
-            plt.title(date_title, loc='right', fontsize=10)
-            plt.ylabel('Channels')
-            plt.xlabel('Total Observations'+" ("+cmaski+")", labelpad=50)
-            plt.yticks(y_axis, zlevs)
-            plt.xticks(x_axis, DayHour)
-            major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-            ax.set_xticks(major_ticks)
-
-            plt.tight_layout()
-            if chanList == 1:
-                plt.savefig('hovmoller_'+str(varName) + '-' + str(varType)+'_'+omflaga+'_'+forplotname+'.png', bbox_inches='tight', dpi=100)
-            else:
-                plt.savefig('hovmoller_'+str(varName) + '-' + str(varType)+'_'+omflaga+'.png', bbox_inches='tight', dpi=100)
-            if Clean:
-                plt.clf()
+                figName = 'hovmoller_'+str(varName) + '-' + str(varType)+'_{}.png'
+            jobs = [(_seriesHeatmap, (figName.format(omflag), mean_final, std_final, count_final, omflag, 'Channels',
+                                      y_axis, zlevs, len(levs), vmaxOMAabs, vminSTD, vmaxSTD), frame),
+                    (_seriesHeatmap, (figName.format(omflaga), mean_finala, std_finala, count_finala, omflaga, 'Channels',
+                                      y_axis, zlevs, len(levs), vmaxOMAabs, vminSTD, vmaxSTD), frame)]
 
         # Figure with only one channel
         else:
-        
-            ##### OMF
-
-            fig = plt.figure(figsize=(6, 4))
-            fig, ax1 = plt.subplots(1, 1)
-            plt.style.use('seaborn-v0_8-ticks')
-
-            plt.axhline(y=0.0,ls='solid',c='#d3d3d3')
-            plt.annotate(forplot, xy=(0.0, 0.965), xytext=(0,0), xycoords='axes fraction', textcoords='offset points', color='lightgray', fontweight='bold', fontsize='12',
-            horizontalalignment='left', verticalalignment='center')
-
-            ax1.plot(x_axis, list_meanByLevs, "b-", label="Mean ("+omflag+")")
-            ax1.plot(x_axis, list_meanByLevs, "bo", label="Mean ("+omflag+")")
-            ax1.set_xlabel('Date (DayHour)', fontsize=10)
-            # Make the y-axis label, ticks and tick labels match the line color.
-            ax1.set_ylim(vminOMA, vmaxOMA)
-            ax1.set_ylabel('Mean ('+omflag+')', color='b', fontsize=10)
-            ax1.tick_params('y', colors='b')
-            plt.xticks(x_axis, DayHour)
-            major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-            ax1.set_xticks(major_ticks)
-            plt.axhline(y=np.mean(list_meanByLevs),ls='dotted',c='blue')
-            
-            ax2 = ax1.twinx()
-            ax2.plot(x_axis, std_final, "r-", label="Std. Deviation ("+omflag+")")
-            ax2.plot(x_axis, std_final, "rs", label="Std. Deviation ("+omflag+")")
-            ax2.set_ylim(vminSTD, vmaxSTD)
-            ax2.set_ylabel('Std. Deviation ('+omflag+')', color='r', fontsize=10)
-            ax2.tick_params('y', colors='r')
-            major_ticks = np.arange(0, max(x_axis), len(DayHour)/len(list(filter(None, DayHour))))
-            ax2.set_xticks(major_ticks)
-            plt.axhline(y=np.mean(std_final),ls='dotted',c='red')
-
-            ax3 = ax1.twinx()
-            ax3.plot(x_axis, count_final, "g-", label="Total Observations"+" ("+cmaski+")")
-            ax3.plot(x_axis, count_final, "g^", label="Total Observations"+" ("+cmaski+")")
-            ax3.set_ylim(0, np.max(count_final) + (np.max(count_final)/8))
-            ax3.set_ylabel('Total Observations'+" ("+cmaski+")", color='g', fontsize=10)
-            ax3.tick_params('y', colors='g')
-            ax3.spines["right"].set_position(("axes", 1.15))
-            plt.yticks(rotation=90)
-            plt.axhline(y=np.mean(count_final),ls='dotted',c='green')
-
-            ax3.set_title(instrument_title, loc='left', fontsize=10)
-            ax3.set_title(date_title, loc='right', fontsize=10)
-
-            plt.xticks(x_axis, DayHour)
-            major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-            ax3.set_xticks(major_ticks)
-            plt.title(instrument_title, loc='left', fontsize=9)
-            plt.title(date_title, loc='right', fontsize=9)
-            plt.subplots_adjust(left=None, bottom=None, right=0.80, top=None)
-            plt.tight_layout()
-            plt.savefig('time_series_'+str(varName) + '-' + str(varType)+'_'+omflag+'_'+forplotname+'.png', bbox_inches='tight', dpi=100)
-            if Clean:
-                plt.clf()
-
-            ##### OMA
-
-            fig = plt.figure(figsize=(6, 4))
-            fig, ax1 = plt.subplots(1, 1)
-            plt.style.use('seaborn-v0_8-ticks')
-
-            plt.axhline(y=0.0,ls='solid',c='#d3d3d3')
-            plt.annotate(forplot, xy=(0.0, 0.965), xytext=(0, 0), xycoords='axes fraction', textcoords='offset points', color='lightgray', fontweight='bold', fontsize='12',
-            horizontalalignment='left', verticalalignment='center')
-
-            ax1.plot(x_axis, list_meanByLevsa, "b-", label="Mean ("+omflaga+")")
-            ax1.plot(x_axis, list_meanByLevsa, "bo", label="Mean ("+omflaga+")")
-            ax1.set_xlabel('Date (DayHour)', fontsize=10)
-            # Make the y-axis label, ticks and tick labels match the line color.
-            ax1.set_ylim(vminOMA, vmaxOMA)
-            ax1.set_ylabel('Mean ('+omflaga+')', color='b', fontsize=10)
-            ax1.tick_params('y', colors='b')
-            plt.xticks(x_axis, DayHour)
-            major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-            ax1.set_xticks(major_ticks)
-            plt.axhline(y=np.mean(list_meanByLevsa),ls='dotted',c='blue')
-            
-            ax2 = ax1.twinx()
-            ax2.plot(x_axis, std_finala, "r-", label="Std. Deviation ("+omflaga+")")
-            ax2.plot(x_axis, std_finala, "rs", label="Std. Deviation ("+omflaga+")")
-            ax2.set_ylim(vminSTD, vmaxSTD)
-            ax2.set_ylabel('Std. Deviation ('+omflaga+')', color='r', fontsize=10)
-            ax2.tick_params('y', colors='r')
-            plt.axhline(y=np.mean(std_finala),ls='dotted',c='red')
-
-            ax3 = ax1.twinx()
-            ax3.plot(x_axis, count_finala, "g-", label="Total Observations"+" ("+cmaski+")")
-            ax3.plot(x_axis, count_finala, "g^", label="Total Observations"+" ("+cmaski+")")
-            ax3.set_ylim(0, 1.2*np.max(count_finala))
-            ax3.set_ylabel('Total Observations'+" ("+cmaski+")", color='g', fontsize=10)
-            ax3.tick_params('y', colors='g')
-            ax3.spines["right"].set_position(("axes", 1.15))
-            plt.yticks(rotation=90)
-            plt.axhline(y=np.mean(count_finala),ls='dotted',c='green')
-
-            ax3.set_title(instrument_title, loc='left', fontsize=10)
-            ax3.set_title(date_title, loc='right', fontsize=10)
-
-            plt.xticks(x_axis, DayHour)
-            major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-            ax3.set_xticks(major_ticks)
-            plt.title(instrument_title, loc='left', fontsize=9)
-            plt.title(date_title, loc='right', fontsize=9)
-            plt.subplots_adjust(left=None, bottom=None, right=0.80, top=None)
-            plt.tight_layout()
-            plt.savefig('time_series_'+str(varName) + '-' + str(varType)+'_'+omflaga+'_'+forplotname+'.png', bbox_inches='tight', dpi=100)
-            if Clean:
-                plt.clf()
-
-            ##### OMF and OMA
-
-            fig = plt.figure(figsize=(6, 4))
-            fig, ax1 = plt.subplots(1, 1)
-            plt.style.use('seaborn-v0_8-ticks')
-
-            plt.annotate(forplot, xy=(0.0, 0.965), xytext=(0, 0), xycoords='axes fraction', textcoords='offset points', color='lightgray', fontweight='bold', fontsize='12',
-            horizontalalignment='left', verticalalignment='center')
-
-            plt.axhline(y=0.0,ls='solid',c='#d3d3d3')
-            ax1.plot(x_axis, list_meanByLevs, "b-", label="Mean ("+omflag+")")
-            ax1.plot(x_axis, list_meanByLevs, "bo", label="")
-            ax1.set_xlabel('Date (DayHour)', fontsize=10)
-            # Make the y-axis label, ticks and tick labels match the line color.
-            ax1.set_ylim(vminOMA, vmaxOMA)
-            ax1.tick_params('y', colors='b')
-            plt.xticks(x_axis, DayHour)
-            major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-            ax1.set_xticks(major_ticks)
-            plt.axhline(y=np.mean(list_meanByLevs),ls='dotted',c='blue')
-            
-            ax1.plot(x_axis, list_meanByLevsa, "r-", label="Mean ("+omflaga+")")
-            ax1.plot(x_axis, list_meanByLevsa, "rs", label="")
-            ax1.set_ylim(vminOMA, vmaxOMA)
-            ax1.tick_params('y', colors='black')
-            plt.axhline(y=np.mean(list_meanByLevsa),ls='dotted',c='red')
-
-            plt.xticks(x_axis, DayHour)
-            major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-            ax1.set_xticks(major_ticks)
-            plt.title(instrument_title, loc='left', fontsize=9)
-            plt.title(date_title, loc='right', fontsize=9)
-            plt.subplots_adjust(left=None, bottom=None, right=0.80, top=None)
-
-            ybox1 = TextArea('Mean ('+omflag+')' , textprops=dict(color="b", size=12,rotation=90,ha='left',va='bottom'))
-            ybox2 = TextArea(' and '             , textprops=dict(color="k", size=12,rotation=90,ha='left',va='bottom'))
-            ybox3 = TextArea('Mean ('+omflaga+')', textprops=dict(color="r", size=12,rotation=90,ha='left',va='bottom'))
-
-            ybox = VPacker(children=[ybox3, ybox2, ybox1],align="bottom", pad=0, sep=5)
+            figName = 'time_series_'+str(varName) + '-' + str(varType)+'_{}_'+forplotname+'.png'
+            jobs = _seriesJobs(figName, mean_final, std_final, count_final, mean_finala, std_finala, count_finala,
+                               forplot, vminOMA, vmaxOMA, vminSTD, vmaxSTD, frame)
 
-            anchored_ybox = AnchoredOffsetbox(loc=3, child=ybox, pad=0., frameon=False, bbox_to_anchor=(-0.12, 0.16), 
-                                                bbox_transform=ax1.transAxes, borderpad=0.)
-
-            ax1.add_artist(anchored_ybox)
-            plt.legend()
-
-            plt.tight_layout()
-            plt.savefig('time_series_'+str(varName) + '-' + str(varType)+'_OmFOmA_'+ forplotname +'.png', bbox_inches='tight', dpi=100)
-
-            # OMF and OMA and StdDev
-
-            fig = plt.figure(figsize=(6, 4))
-            fig, ax1 = plt.subplots(1, 1)
-            plt.style.use('seaborn-v0_8-ticks')
-            
-            ax1.plot(x_axis, list_meanByLevs, lw=2, label='OmF Mean', color='blue', zorder=1)
-            ax1.fill_between(x_axis, OMF_inf, OMF_sup, label='OmF Std Dev',  facecolor='blue', alpha=0.3, zorder=1)
-            ax1.plot(x_axis, list_meanByLevsa, lw=2, label='OmA Mean', color='red', zorder=2)
-            ax1.fill_between(x_axis, OMA_inf, OMA_sup, label='OmA Std Dev',  facecolor='red', alpha=0.3, zorder=2)
-            ybox1 = TextArea(' OmF ' , textprops=dict(color="b", size=12,rotation=90,ha='left',va='bottom'))
-            ybox2 = TextArea(' | '             , textprops=dict(color="k", size=12,rotation=90,ha='left',va='bottom'))
-            ybox3 = TextArea(' OmA ', textprops=dict(color="r", size=12,rotation=90,ha='left',va='bottom'))
-
-            ybox = VPacker(children=[ybox3, ybox2, ybox1],align="bottom", pad=0, sep=5)
-
-            anchored_ybox = AnchoredOffsetbox(loc=3, child=ybox, pad=0., frameon=False, bbox_to_anchor=(-0.125, 0.42), 
-                                                bbox_transform=ax1.transAxes, borderpad=0.)
-
-            ax1.add_artist(anchored_ybox)
-            ax1.set_xlabel('Date (DayHour)', fontsize=12)
-            ax1.set_ylim(omfoma_limit_inf,omfoma_limit_sup)
-            ax1.legend(bbox_to_anchor=(-0.11, -0.25),ncol=4,loc='lower left', fancybox=True, shadow=False, frameon=True, framealpha=1.0, fontsize='11', facecolor='white', edgecolor='lightgray')
-            plt.grid(axis='y', color='lightgray', linestyle='-.', linewidth=0.5, zorder=0)
-
-            ax2 = ax1.twinx()
-            ax2.plot(x_axis, list_countByLevsa, lw=2, label='OmA', linestyle='--', color='green', zorder=3)
-            ax2.plot(x_axis, list_countByLevs, lw=2, label='OmF', linestyle=':', color='purple', zorder=3)
-            ax2.set_ylabel('Total Observations (OmF | OmA)'+"\n ("+cmaski+")", fontsize=12)
-            ax2.set_ylim(0, (np.max(list_countByLevsa) + np.max(list_countByLevsa)/5))
-            ax2.legend(loc='upper left', ncol=2, fancybox=True, shadow=False, frameon=True, framealpha=1.0, fontsize='11', facecolor='white', edgecolor='lightgray')
-            
-            plt.xticks(x_axis, DayHour)
-            major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-            ax2.set_xticks(major_ticks)
-            plt.title(instrument_title, loc='left', fontsize=10)
-            plt.title(date_title, loc='right', fontsize=10)
-        
-            t = plt.annotate(forplot, xy=(0.78, 0.995), xytext=(-9, -9), xycoords='axes fraction', textcoords='offset points', color='darkgray', fontweight='bold', fontsize='10',
-                                horizontalalignment='center', verticalalignment='center')
-            t.set_bbox(dict(facecolor='whitesmoke', alpha=1.0, edgecolor='whitesmoke', boxstyle="square,pad=0.3"))
-
-            plt.tight_layout()
-            plt.savefig('time_series_'+str(varName) + '-' + str(varType)+'_OmFOmA_StdDev_'+ forplotname +'.png', bbox_inches='tight', dpi=100)
-
-        # Cleaning up
-        if Clean:
-            plt.close('all')
+        nFigures = renderFigures(jobs, nWorkers, close=Clean)
 
         print(' Done!')
         print()
         
                
 
-        return
+        return nFigures
 
 
 
@@ -2279,7 +2207,7 @@ class plot_diag(object):
 
 # radiance final
 
-    def statcount(self, varName=None, varType=None, noiqc=False, dateIni=None, dateFin=None, nHour="06", channel=None, figTS=False, figMap=False, **kwargs):
+    def statcount(self, varName=None, varType=None, noiqc=False, dateIni=None, dateFin=None, nHour="06", channel=None, figTS=False, figMap=False, region=None, area=None, nWorkers=1, **kwargs):
 
         '''
         The StatCount function plots a time series of assimilated, monitored and rejected data. 
@@ -2292,9 +2220,15 @@ class plot_diag(object):
         dateIni = 2013010100     # Inicial Date
         dateFin = 2013010900     # Final Date
         nHour = "06"             # Time Interval
-        channel = None           # Radiance channel number (None for the conventional dataset)
+        channel = None           # Radiance channel number (None for the conventional dataset), a list of channels
+                                 # or 'all' for every channel found in the files
         figTS = True             # Creates the time series plot
         figMap = False           # Creates the spatial plot for each time
+        region = None            # Counts only the observations of a region (e.g. 'SouthAmerica', see gsidiag.regions.REGIONS)
+        area = None              # or of [Loni, Lati, Lonf, Latf]; also the extent of the maps
+        nWorkers = 1             # Number of processes drawing the figures (Agg backend, see gsidiag.render). None: number of cores.
+
+        Returns the number of figures saved.
         
         ! Case conventional dataset: channel = None
         ! The QC process creates a number indicating the data quality for each observation.
@@ -2346,266 +2280,153 @@ class plot_diag(object):
         '''
 
 
-        if(noiqc):
-            lim_qm = 8
-            if(varName == 'ps'):
-                lim_qm = 7
-        else:
-            lim_qm = 4
-
         varInfo = getVarInfo(varType, varName, 'instrument')
         if varInfo is not None:
             instrument_title = str(varName) + '-' + str(varType) + '  |  ' + varInfo
         else:
             instrument_title = str(varName) + '-' + str(varType) + '  |  ' + 'Unknown instrument'
 
+        from .render import renderFigures
+
+        select, area = _regionArea(area, region)
+
+        if channel == None or channel == 'all':
+            chans = channel
+        elif type(channel) == list:
+            chans = channel
+        else:
+            chans = [channel]
+
         datei = datetime.strptime(str(dateIni), "%Y%m%d%H")
         datef = datetime.strptime(str(dateFin), "%Y%m%d%H")
         date  = datei
 
         assi, reje, moni, DayHour_tmp = [], [], [], []
-        moniAssi, moniReje = [], []
-        assif, rejef, monif, moniAssif, moniRejef = [], [], [], [], []
+        radCounts = []
+        jobs = []   # figures, drawn by renderFigures once the data of all cycles are prepared
         f = 0
         while (date <= datef):
 
             datefmt = date.strftime("%Y%m%d%H")
             DayHour_tmp.append(date.strftime("%d%H"))
-            
+
+            diag = _getCycle(self, f, date)
+
             # try: For issues reading the file (file not found)
             # in the except statement an error message is printed and continues for other dates
             try:
-                
+
+                # one QC category code per observation, used for the counts and for the maps
+                table = regionTable(diag, varName, select).loc[varType]
+                codes = classify(table, varName, noiqc)
+
                 if(channel == None):  # Conventional
-                    exp = "(iuse==1)"
-                    assim = self[f].obsInfo[varName].loc[varType].query(exp)
-                    exp = "(iuse==-1) & (idqc >= "+str(lim_qm)+" and idqc <= 15)"
-                    monit = self[f].obsInfo[varName].loc[varType].query(exp)
-                    exp = "(iuse==-1) & ((idqc > 15 or idqc <= 0) or (idqc > 0 and idqc < "+str(lim_qm)+"))"
-                    rejei = self[f].obsInfo[varName].loc[varType].query(exp)
-                
-                    assi.append(len(assim))
-                    moni.append(len(monit))
-                    reje.append(len(rejei))
-                
+                    counts = countCategories(codes)
+
+                    assi.append(int(counts[ASSIMILATED]))
+                    moni.append(int(counts[MONITORED]))
+                    reje.append(int(counts[REJECTED]))
+
                     if (figMap):
-                        df_list = [assim, monit, rejei]
-                        name_list = ["Assimilated ["+str(len(assim))+"]","Monitored ["+str(len(monit))+"]","Rejected ["+str(len(rejei))+"]"]
-                        marker_list = [".","x","*"]     
+                        points = table[['geometry']]
+                        df_list = [points[codes == ASSIMILATED], points[codes == MONITORED], points[codes == REJECTED]]
+                        name_list = ["Assimilated ["+str(assi[-1])+"]","Monitored ["+str(moni[-1])+"]","Rejected ["+str(reje[-1])+"]"]
+                        marker_list = [".","x","*"]
                         color_list = ["green","blue","red"]
-                    
-                        setColor = 0 
-                        legend_labels = []
-                    
-                        fig = plt.figure(figsize=(12, 6))
-                        ax  = fig.add_subplot(1, 1, 1)
-                        ax = geoMap(area=None,ax=ax)
-                        for dfi,namedf,mk,cl in zip(df_list,name_list,marker_list,color_list):
-                            df    = dfi
-                            legend_labels.append(mpatches.Patch(color=cl, label=namedf) )
-                            ax = df.plot(ax=ax,legend=True, marker=mk, color=cl, **kwargs)
-                            setColor += 1
-                            plt.legend(handles=legend_labels, numpoints=1, loc='lower center', bbox_to_anchor=(0.5, -0.02), 
-                                    fancybox=True, shadow=False, frameon=False, ncol=3, prop={"size": 10})
-                    
-                        date_title = str(date.strftime("%d%b%Y - %H%M")) + ' GMT'
-                        plt.title(date_title, loc='right', fontsize=10)
-                        plt.title(instrument_title, loc='left', fontsize=9)
-                    
-                        plt.tight_layout()
-                        plt.savefig('TotalObs_'+str(varName) + '-' + str(varType)+'_'+datefmt+'.png', bbox_inches='tight', dpi=100)
-                
-                
+
+                        jobs.append((_statcountMap, (df_list, name_list, marker_list, color_list, 3, date, instrument_title, None,
+                                     'TotalObs_'+str(varName) + '-' + str(varType)+'_'+datefmt+'.png'), dict(kwargs, area=area)))
+
                 else:   # Radiance
-                    exp = "(nchan=="+str(channel)+") & (iuse >= 1 & idqc==0.0)"
-                    assim = self[f].obsInfo[varName].loc[varType].query(exp)
-                    exp = "(nchan=="+str(channel)+") & ((iuse >= -1 and iuse < 1) & idqc==0.0)"
-                    monitAssim = self[f].obsInfo[varName].loc[varType].query(exp)
-                    exp = "(nchan=="+str(channel)+") & ((iuse >= -1 and iuse < 1) & idqc!=0.0)"
-                    monitRejei = self[f].obsInfo[varName].loc[varType].query(exp)
-                    exp = "(nchan=="+str(channel)+") & (iuse >= 1 & idqc!=0.0)"
-                    rejei = self[f].obsInfo[varName].loc[varType].query(exp)
-                
-                    assi.append(len(assim))
-                    moniAssi.append(len(monitAssim))
-                    moniReje.append(len(monitRejei))
-                    reje.append(len(rejei))
-                    
-                    forplot = 'Channel ='+str(channel)
-                
+                    nchan  = table['nchan'].to_numpy()
+                    counts = countCategories(codes, nchan)
+                    radCounts.append(counts)
+
                     # Radiance plots
                     if (figMap):
-                        # Case: assimilated and rejected
-                        if ((len(assim)) != 0 or (len(rejei)) != 0):
-                            df_list = [assim, rejei]    
-                            name_list = ["Assimilated ["+str(len(assim))+"]","Rejected ["+str(len(rejei))+"]"]
-                            marker_list = ["^","v"]    
-                            color_list = ["green","red"]
-                    
-                            setColor = 0 
-                            legend_labels = []
-                    
-                            fig = plt.figure(figsize=(12, 6))
-                            ax  = fig.add_subplot(1, 1, 1)
-                            ax = geoMap(area=None,ax=ax)
-                            for dfi,namedf,mk,cl in zip(df_list,name_list,marker_list,color_list):
-                                df    = dfi
-                                legend_labels.append(mpatches.Patch(color=cl, label=namedf) )
-                                ax = df.plot(ax=ax,legend=True, marker=mk, color=cl, **kwargs) 
-                                setColor += 1
-                                plt.legend(handles=legend_labels, numpoints=1, loc='lower center', bbox_to_anchor=(0.5, -0.02), 
-                                        fancybox=True, shadow=False, frameon=False, ncol=2, prop={"size": 10})
-                        
-                            date_title = str(date.strftime("%d%b%Y - %H%M")) + ' GMT'
-                            plt.title(date_title, loc='right', fontsize=10)
-                            plt.title(instrument_title, loc='left', fontsize=9)
-                            plt.annotate(forplot, xy=(0.45, 1.015), xytext=(0, 0), xycoords='axes fraction', textcoords='offset points', 
-                                         color='gray', fontweight='bold', fontsize='10', horizontalalignment='left', 
-                                         verticalalignment='center')
-                    
-                            plt.tight_layout()
-                            plt.savefig('Assim-Rejei_'+str(varName) + '-' + str(varType)+'_'+ 'CH' + str(channel) + '_' +datefmt+'.png', 
-                                        bbox_inches='tight', dpi=100)
-                        else:
-                            print("channel ",channel," not assimilated or rejected on the date -->",date.strftime("%Y-%m-%d:%H"))
-                    
-                        # Monitored cases: would be assimilated or rejected 
-                        if ((len(monitAssim)) != 0 or (len(monitRejei)) != 0):
-                            df_list = [monitAssim, monitRejei]
-                            name_list = ["Monitored-Assimilated ["+str(len(monitAssim))+"]","Monitored-Rejected ["+str(len(monitRejei))+"]"]
-                            marker_list = ["^","v"]   
-                            color_list = ["teal","purple"]
-                    
-                            setColor = 0 
-                            legend_labels = []
-                    
-                            fig = plt.figure(figsize=(12, 6))
-                            ax  = fig.add_subplot(1, 1, 1)
-                            ax = geoMap(area=None,ax=ax)
-                            for dfi,namedf,mk,cl in zip(df_list,name_list,marker_list,color_list):
-                                df    = dfi
-                                legend_labels.append(mpatches.Patch(color=cl, label=namedf) )
-                                ax = df.plot(ax=ax,legend=True, marker=mk, color=cl, **kwargs) 
-                                setColor += 1
-                                plt.legend(handles=legend_labels, numpoints=1, loc='lower center', bbox_to_anchor=(0.5, -0.02), 
-                                        fancybox=True, shadow=False, frameon=False, ncol=2, prop={"size": 10})
-                        
-                            date_title = str(date.strftime("%d%b%Y - %H%M")) + ' GMT'
-                            plt.title(date_title, loc='right', fontsize=10)
-                            plt.title(instrument_title, loc='left', fontsize=9)
-                            plt.annotate(forplot, xy=(0.45, 1.015), xytext=(0, 0), xycoords='axes fraction', textcoords='offset points', 
-                                         color='gray', fontweight='bold', fontsize='10', horizontalalignment='left', 
-                                         verticalalignment='center')
-                    
-                            plt.tight_layout()
-                            plt.savefig('Monitored_'+str(varName) + '-' + str(varType)+'_'+ 'CH' + str(channel) + '_'+datefmt+'.png', 
-                                        bbox_inches='tight', dpi=100)
-                        else:
-                            print("channel ",channel," not monitored on the date -->",date.strftime("%Y-%m-%d:%H"))
-                    
+                        points = table[['geometry']]
+                        for ch in (sorted(counts) if chans == 'all' else chans):
+                            nc = counts.get(int(ch), np.zeros(NCATEGORIES, dtype=int))
+                            inChan = nchan == ch
+                            forplot = 'Channel ='+str(ch)
+
+                            # Case: assimilated and rejected
+                            if (nc[ASSIMILATED] != 0 or nc[REJECTED] != 0):
+                                df_list = [points[inChan & (codes == ASSIMILATED)], points[inChan & (codes == REJECTED)]]
+                                name_list = ["Assimilated ["+str(nc[ASSIMILATED])+"]","Rejected ["+str(nc[REJECTED])+"]"]
+                                marker_list = ["^","v"]
+                                color_list = ["green","red"]
+
+                                jobs.append((_statcountMap, (df_list, name_list, marker_list, color_list, 2, date, instrument_title, forplot,
+                                             'Assim-Rejei_'+str(varName) + '-' + str(varType)+'_'+ 'CH' + str(ch) + '_' +datefmt+'.png'), dict(kwargs, area=area)))
+                            else:
+                                print("channel ",ch," not assimilated or rejected on the date -->",date.strftime("%Y-%m-%d:%H"))
+
+                            # Monitored cases: would be assimilated or rejected
+                            if (nc[MONITORED_ASSIM] != 0 or nc[MONITORED_REJECT] != 0):
+                                df_list = [points[inChan & (codes == MONITORED_ASSIM)], points[inChan & (codes == MONITORED_REJECT)]]
+                                name_list = ["Monitored-Assimilated ["+str(nc[MONITORED_ASSIM])+"]","Monitored-Rejected ["+str(nc[MONITORED_REJECT])+"]"]
+                                marker_list = ["^","v"]
+                                color_list = ["teal","purple"]
+
+                                jobs.append((_statcountMap, (df_list, name_list, marker_list, color_list, 2, date, instrument_title, forplot,
+                                             'Monitored_'+str(varName) + '-' + str(varType)+'_'+ 'CH' + str(ch) + '_'+datefmt+'.png'), dict(kwargs, area=area)))
+                            else:
+                                print("channel ",ch," not monitored on the date -->",date.strftime("%Y-%m-%d:%H"))
+
             except:
-                print("++++++++++++++++++++++++++ ERROR: file reading --> STATCOUNT ++++++++++++++++++++++++++")
+                if diag is not None:
+                    print("++++++++++++++++++++++++++ ERROR: file reading --> STATCOUNT ++++++++++++++++++++++++++")
                 print(setcolor.WARNING + "    >>> No information on this date (" + str(date.strftime("%Y-%m-%d:%H")) +") <<< " + setcolor.ENDC)
                 if(channel == None):
                     assi.append(None)
                     moni.append(None)
                     reje.append(None)
                 else:
-                    assi.append(None)
-                    moniAssi.append(None)
-                    moniReje.append(None)
-                    reje.append(None)
-                    
+                    radCounts.append(None)
+
             f = f + 1
             date = date + timedelta(hours=int(nHour))
             date_finale = date
-            
+
 
 
         if (figTS):
+            if(len(DayHour_tmp) > 4):
+                DayHour = [hr if (ix % int(len(DayHour_tmp) / 4)) == 0 else '' for ix, hr in enumerate(DayHour_tmp)]
+            else:
+                DayHour = DayHour_tmp
+
+            x_axis      = np.arange(0, len(DayHour), 1)
+            date_title = str(datei.strftime("%d%b")) + '-' + str(date_finale.strftime("%d%b")) + ' ' + str(date_finale.strftime("%Y"))
+
             if(channel == None):   # Conventional
-                if(len(DayHour_tmp) > 4):
-                    DayHour = [hr if (ix % int(len(DayHour_tmp) / 4)) == 0 else '' for ix, hr in enumerate(DayHour_tmp)]
-                else:
-                    DayHour = DayHour_tmp
-                
-                x_axis      = np.arange(0, len(DayHour), 1)
-                date_title = str(datei.strftime("%d%b")) + '-' + str(date_finale.strftime("%d%b")) + ' ' + str(date_finale.strftime("%Y"))
-            
-                fig = plt.figure(figsize=(6, 4))
-                fig, ax1 = plt.subplots(1, 1)
-                plt.style.use('seaborn-v0_8-ticks')
-
-                plt.axhline(y=0.0,ls='solid',c='#d3d3d3')
-
-                ax1.plot(x_axis, assi, "o", label="Assimilated \n["+str(sum(assi))+"]", color='green')
-                ax1.plot(x_axis, moni, "o", label="Monitored \n["+str(sum(moni))+"]", color='blue')
-                ax1.plot(x_axis, reje, "o", label="Rejected \n["+str(sum(reje))+"]", color='red')
-                ax1.legend(fancybox=True, frameon=True, shadow=True, loc="upper center",ncol=3)
-                ax1.set_xlabel('Date (DayHour)', fontsize=10)
-                plt.title(date_title, loc='right', fontsize=10)
-                plt.title(instrument_title, loc='left', fontsize=9)
-                
-                ax1.set_ylim(np.round(-0.05*np.max([assi,moni,reje])), np.round(1.25*np.max([assi,moni,reje])))
-                ax1.set_ylabel('Total Observations', color='black', fontsize=10)
-                ax1.tick_params('y', colors='black')
-                plt.xticks(x_axis, DayHour)
-                major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-                ax1.set_xticks(major_ticks)
-                plt.axhline(y=np.mean(assi),ls='dotted',c='lightgray')
-                plt.axhline(y=np.mean(moni),ls='dotted',c='lightgray')
-                plt.axhline(y=np.mean(reje),ls='dotted',c='lightgray')
-                plt.tight_layout()
-                plt.savefig('time_series_'+str(varName) + '-' + str(varType)+'_TotalObs.png', bbox_inches='tight', dpi=100)
-                
+                series = [(assi, "Assimilated", 'green'), (moni, "Monitored", 'blue'), (reje, "Rejected", 'red')]
+                jobs.append((_statcountSeries, ('time_series_'+str(varName) + '-' + str(varType)+'_TotalObs.png', series,
+                             x_axis, DayHour, date_title, instrument_title, None, "upper center", 3), {}))
+
             else:   # Radiance
-                if(len(DayHour_tmp) > 4):
-                    DayHour = [hr if (ix % int(len(DayHour_tmp) / 4)) == 0 else '' for ix, hr in enumerate(DayHour_tmp)]
-                else:
-                    DayHour = DayHour_tmp
-                
-                x_axis      = np.arange(0, len(DayHour), 1)
-                date_title = str(datei.strftime("%d%b")) + '-' + str(date_finale.strftime("%d%b")) + ' ' + str(date_finale.strftime("%Y"))
-            
-                fig = plt.figure(figsize=(6, 4))
-                fig, ax1 = plt.subplots(1, 1)
-                plt.style.use('seaborn-v0_8-ticks')
+                if chans == 'all':
+                    chans = sorted(set().union(*[c.keys() for c in radCounts if c is not None]))
+
+                for ch in chans:
+                    zeros = np.zeros(NCATEGORIES, dtype=int)
+                    assi, moniAssi, moniReje, reje = [[None if c is None else int(c.get(int(ch), zeros)[cat]) for c in radCounts]
+                                                      for cat in [ASSIMILATED, MONITORED_ASSIM, MONITORED_REJECT, REJECTED]]
+                    forplot = 'Channel ='+str(ch)
+
+                    series = [(assi, "Assimilated", 'green'), (moniAssi, "Monitored-Assim", 'teal'),
+                              (moniReje, "Monitored-Rejei", 'purple'), (reje, "Rejected", 'red')]
+                    jobs.append((_statcountSeries, ('time_series_'+str(varName) + '-' + str(varType) +'_'+ 'CH' + str(ch) + '_'+'_TotalObs.png', series,
+                                 x_axis, DayHour, date_title, instrument_title, forplot, "best", 1), {}))
+
+        return renderFigures(jobs, nWorkers)
 
-                plt.axhline(y=0.0,ls='solid',c='#d3d3d3')
-                
-                # List with value None: is removed to calculate sum, max and min
-                # The lists below are only used to define the scale of the axes and the total sum of assi/rejei/monit data
-                assif     = [x for x in assi if x != None]
-                moniAssif = [x for x in moniAssi if x != None]
-                moniRejef = [x for x in moniReje if x != None]
-                rejef     = [x for x in reje if x != None]
-
-                ax1.plot(x_axis, assi, "o", label="Assimilated \n["+str(sum(assif))+"]", color='green')
-                ax1.plot(x_axis, moniAssi, "o", label="Monitored-Assim \n["+str(sum(moniAssif))+"]", color='teal')
-                ax1.plot(x_axis, moniReje, "o", label="Monitored-Rejei \n["+str(sum(moniRejef))+"]", color='purple')
-                ax1.plot(x_axis, reje, "o", label="Rejected \n["+str(sum(rejef))+"]", color='red')
-                ax1.legend(fancybox=True, frameon=True, shadow=True, loc="best",ncol=1)
-                ax1.set_xlabel('Date (DayHour)', fontsize=10)
-                plt.title(date_title, loc='right', fontsize=10)
-                plt.title(instrument_title, loc='left', fontsize=9)
-                plt.annotate(forplot, xy=(0.0, 0.965), xytext=(0, 0), xycoords='axes fraction', textcoords='offset points', 
-                             color='lightgray', fontweight='bold', fontsize='12', horizontalalignment='left', verticalalignment='center')
-                
-                ax1.set_ylim(np.round(-0.05*np.max([assif,moniAssif,moniRejef,rejef])),
-                             np.round(1.25*np.max([assif,moniAssif,moniRejef,rejef])))
-                ax1.set_ylabel('Total Observations', color='black', fontsize=10)
-                ax1.tick_params('y', colors='black')
-                plt.xticks(x_axis, DayHour)
-                major_ticks = [ DayHour.index(dh) for dh in filter(None,DayHour) ]
-                ax1.set_xticks(major_ticks)
-                plt.axhline(y=np.mean(assif),ls='dotted',c='lightgray')
-                plt.axhline(y=np.mean(moniAssif),ls='dotted',c='lightgray')
-                plt.axhline(y=np.mean(moniRejef),ls='dotted',c='lightgray')
-                plt.axhline(y=np.mean(rejef),ls='dotted',c='lightgray')
-                plt.tight_layout()
-                plt.savefig('time_series_'+str(varName) + '-' + str(varType) +'_'+ 'CH' + str(channel) + '_'+'_TotalObs.png',
-                            bbox_inches='tight', dpi=100)
 
+# python -m gsidiag: the command line interface (see gsidiag.cli)
+if __name__ == '__main__':
+    from .cli import main
+    sys.exit(main())
 
 #EOC
 #-----------------------------------------------------------------------------#
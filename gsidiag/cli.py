@@ -0,0 +1,231 @@
+"""
+This module defines the command line interface of gsidiag, used to make the
+diagnostics products of a period without a notebook (e.g. from cron):
+
+    python -m gsidiag '/dataout/%Y%m%d%H/diag_conv_01.%Y%m%d%H' 2019121000 2019121118 \\
+                      timeseries csv maps -v uv -k 220 -m 'iuse == 1' \\
+                      -a '/dataout/%Y%m%d%H/diag_conv_03.%Y%m%d%H' -o /dataout/figs \\
+                      --cache /dataout/cube -j 8
+
+The cycles are read lazily (see gsidiag.loader.diagCollection), with a pool of
+worker processes for the cycles that are needed, and the figures are rendered by
+a pool of processes (see gsidiag.render). With a cache directory, the time series
+and the CSV tables are made from a persistent diagCube, so only the cycles not yet
+reduced are read, and the maps already made from the current files are not redone.
+
+Exit status: 0 if all products were made, 1 if some product failed, 2 for invalid
+arguments and 3 if none of the cycles could be read.
+"""
+import argparse
+import os
+
+EXIT_OK      = 0
+EXIT_FAILED  = 1
+EXIT_USAGE   = 2
+EXIT_NO_DATA = 3
+
+PRODUCTS = ['timeseries', 'statcount', 'csv', 'maps']
+
+
+def _varType(value):
+    """
+    kx values are integers; radiance SatIds (e.g. 'n19') are kept as strings.
+    """
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def _level(value):
+    try:
+        return int(value)
+    except ValueError:
+        return [int(v) for v in value.split(',')]
+
+
+def _region(value):
+    if ',' in value:
+        return [float(v) for v in value.split(',')]
+    return value
+
+
+def parser():
+    """
+    Returns the ArgumentParser of the command line interface.
+    """
+    p = argparse.ArgumentParser(prog='python -m gsidiag',
+                                description='Makes diagnostics products (time series, statcount, CSV tables and maps) '
+                                            'of the GSI diagnostics files of a period.')
+    p.add_argument('template', help='path template of the first guess (ges) files, with strftime directives (e.g. %%Y%%m%%d%%H)')
+    p.add_argument('dateIni', help='initial date (YYYYMMDDHH)')
+    p.add_argument('dateFin', help='final date (YYYYMMDDHH)')
+    p.add_argument('products', nargs='+', choices=PRODUCTS, help='the products to be made')
+
+    p.add_argument('-a', '--anl', dest='templateAnl', default=None, help='path template of the analysis (anl) files')
+    p.add_argument('-n', '--nhour', dest='nHour', default='06', help='interval between cycles, in hours (default: 06)')
+    p.add_argument('-v', '--var', dest='varName', required=True, help="variable (e.g. 'uv', 't', 'amsua')")
+    p.add_argument('-k', '--kx', dest='varType', type=_varType, required=True, help="kx (or SatId, e.g. 'n19')")
+    p.add_argument('-m', '--mask', default=None, help="DataFrame.query expression (e.g. 'iuse == 1 & idqc == 0')")
+    p.add_argument('-r', '--region', type=_region, default=None,
+                   help="region name (see gsidiag.regions.REGIONS) or Loni,Lati,Lonf,Latf")
+    p.add_argument('-l', '--level', dest='Level', type=_level, default=None,
+                   help='level of the time series and tables (hPa), or a comma separated list of levels')
+    p.add_argument('--layer', dest='Lay', type=int, default=None, help='half size of the layers (hPa)')
+    p.add_argument('--single', dest='SingleL', choices=['OneL', 'All'], default=None, help='single level mode (see time_series)')
+    p.add_argument('-c', '--channel', type=int, default=None, help='channel (radiance)')
+    p.add_argument('--param', default='omf', help='column drawn by maps (default: omf)')
+    p.add_argument('--render', choices=['points', 'density'], default='points', help='how maps draw the observations')
+    p.add_argument('--statcount-maps', dest='figMap', action='store_true', help='statcount also draws the map of each cycle')
+
+    p.add_argument('-o', '--outdir', default='.', help='directory of the figures and tables (default: .)')
+    p.add_argument('--cache', default=None, help='directory of the persistent diagCube, reused between runs')
+    p.add_argument('-j', '--workers', dest='nWorkers', type=int, default=1, help='processes rendering the figures (default: 1)')
+    p.add_argument('--read-workers', dest='readWorkers', type=int, default=None,
+                   help='processes reading the files (default: the number of cores)')
+    p.add_argument('--max-memory', dest='maxMemory', default=None, help="memory limit of the cycles held (e.g. '8GB')")
+    return p
+
+
+def _mapFigure(diag, args, date, figName):
+    """
+    Draws and saves the map of one cycle.
+    """
+    import matplotlib.pyplot as plt
+    from .__main__ import plot_diag
+
+    render = 'density' if args['render'] == 'density' else None
+    ax = plot_diag.plot(diag, args['varName'], args['varType'], args['param'], mask=args['mask'], region=args['region'],
+                        render=render, legend=True)
+    if ax is None:
+        raise ValueError('no observations')
+    ax.set_title(date.strftime('%d%b%Y - %H%M') + ' GMT', loc='right', fontsize=10)
+    ax.set_title(args['varName'] + '-' + str(args['varType']) + ' | ' + args['param'], loc='left', fontsize=10)
+    plt.savefig(figName, bbox_inches='tight', dpi=100)
+
+
+def _maps(cycles, args, readWorkers, nWorkers):
+    """
+    Draws the map of each cycle. Maps newer than the files of their cycle are kept.
+    """
+    from .render import renderFigures
+
+    todo = []
+    for date in cycles.dates:
+        figName = 'map_{}-{}_{}_{}.png'.format(args['varName'], args['varType'], args['param'], date.strftime('%Y%m%d%H'))
+        files = [f for f in cycles._files(date) if f is not None]
+        if os.path.exists(figName) and all(os.path.exists(f) and os.path.getmtime(f) <= os.path.getmtime(figName) for f in files):
+            continue
+        todo.append((date, figName))
+
+    cycles.prefetch([date for date, figName in todo], readWorkers)
+    jobs = []
+    for date, figName in todo:
+        diag = cycles[date]
+        if diag is not None:
+            jobs.append((_mapFigure, (diag, args, date, figName), {}))
+
+    # raises if some map failed, once the others are saved
+    renderFigures(jobs, nWorkers)
+    return True
+
+
+def run(args):
+    """
+    Makes the products of the parsed arguments (see parser) in args.outdir. The
+    current directory is restored when the products are made.
+
+    Returns:
+        The exit status.
+    """
+    os.makedirs(args.outdir, exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(args.outdir)   # the products are saved in the current directory
+    try:
+        return _products(args)
+    finally:
+        os.chdir(cwd)
+
+
+def _products(args):
+    """
+    Makes the products in the current directory. Returns the exit status.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+
+    from .__main__ import read_diag, plot_diag, setcolor
+    from .cube import diagCube
+    from .loader import diagCollection
+
+    cycles = diagCollection(args.template, args.dateIni, args.dateFin, args.nHour, templateAnl=args.templateAnl,
+                            maxMemory=args.maxMemory)
+    cube   = diagCube(args.cache) if args.cache is not None else None
+    radi   = isinstance(args.varType, str)
+
+    # the cycles are read at once by a pool of processes, except those already in the cube
+    # when only the time series and the tables are made
+    if cube is not None and set(args.products) <= {'timeseries', 'csv'}:
+        reduced = set(cube.dates(args.varName, args.mask, args.region))
+        cycles.prefetch([date for date in cycles.dates if date not in reduced], args.readWorkers)
+    elif 'maps' not in args.products or len(args.products) > 1:
+        cycles.prefetch(None, args.readWorkers)
+
+    period = dict(dateIni=args.dateIni, dateFin=args.dateFin, nHour=args.nHour)
+    status = EXIT_OK
+    for product in args.products:
+        print(setcolor.OKBLUE + ' gsidiag: making ' + product + setcolor.ENDC)
+        try:
+            if product == 'timeseries':
+                if radi:
+                    nFigures = plot_diag.time_series_radi(cycles, varName=args.varName, varType=args.varType, mask=args.mask,
+                                                          channel=args.channel, cube=cube, region=args.region,
+                                                          nWorkers=args.nWorkers, **period)
+                else:
+                    nFigures = plot_diag.time_series(cycles, varName=args.varName, varType=args.varType, mask=args.mask,
+                                                     Level=args.Level, Lay=args.Lay, SingleL=args.SingleL, cube=cube,
+                                                     region=args.region, nWorkers=args.nWorkers, **period)
+                done = nFigures > 0
+            elif product == 'statcount':
+                nFigures = plot_diag.statcount(cycles, varName=args.varName, varType=args.varType, channel=args.channel,
+                                               figTS=True, figMap=args.figMap, region=args.region, nWorkers=args.nWorkers,
+                                               **period)
+                done = nFigures > 0
+            elif product == 'csv':
+                files = read_diag.tocsv(cycles, varName=args.varName, varType=args.varType, Level=args.Level, Lay=args.Lay,
+                                        SingleL=args.SingleL, cube=cube, region=args.region, mask=args.mask, **period)
+                done = all(os.path.isfile(f) for f in files)
+            else:
+                done = _maps(cycles, vars(args), args.readWorkers, args.nWorkers)
+        except Exception as e:
+            print(setcolor.FAIL + '    >>> ' + product + ' failed: ' + str(e) + ' <<< ' + setcolor.ENDC)
+            done = False
+
+        if not done:
+            print(setcolor.FAIL + '    >>> ' + product + ': no output <<< ' + setcolor.ENDC)
+            status = EXIT_FAILED
+
+    if len(cycles.gaps) > 0:
+        print(setcolor.WARNING + ' gsidiag: ' + str(len(cycles.gaps)) + ' of ' + str(len(cycles.dates)) + ' cycles missing' + setcolor.ENDC)
+        if len(cycles.gaps) == len(cycles.dates):
+            return EXIT_NO_DATA
+
+    return status
+
+
+def main(argv=None):
+    """
+    Entry point of 'python -m gsidiag'. Returns the exit status.
+    """
+    args = parser().parse_args(argv)
+    args.outdir = os.path.abspath(args.outdir)
+    args.template = os.path.abspath(args.template)
+    if args.templateAnl is not None:
+        args.templateAnl = os.path.abspath(args.templateAnl)
+    if args.cache is not None:
+        args.cache = os.path.abspath(args.cache)
+
+    try:
+        return run(args)
+    except KeyboardInterrupt:
+        return EXIT_FAILED
@@ -0,0 +1,267 @@
+"""
+This module defines the estimation of the horizontal correlation of innovations
+(OmF) as a function of the separation distance, following Hollingsworth and
+Lonnberg (1986).
+
+The pairs of observations closer than maxDist are enumerated with a regular grid of
+cells over the unit vectors of the observations (cells of the size of the chord of
+maxDist), so that only the observations of neighbouring cells are compared and the
+cost grows with the number of close pairs instead of the square of the number of
+observations. The pairs are processed in chunks of bounded size, and the sums of each
+distance bin are accumulated over cycles, so that estimates of different cycles or
+processes are merged by adding them.
+"""
+import numpy as np
+import pandas as pd
+
+from .moments import moments
+from .masks import selectTable
+
+
+EARTH_RADIUS = 6371.0   # km
+
+PAIR_SUMS = ['n', 'x', 'y', 'xy', 'xx', 'yy']
+
+
+def _unitVectors(lat, lon):
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=1)
+
+
+# offsets of the neighbouring cells visited from each cell: (0,0,0) and half of the
+# 26 others, so that each pair of cells is visited once
+_OFFSETS = [(i, j, k) for i in (-1, 0, 1) for j in (-1, 0, 1) for k in (-1, 0, 1) if (i, j, k) > (0, 0, 0)]
+
+
+def closePairs(lat, lon, maxDist, chunk=2000000, radius=EARTH_RADIUS):
+    """
+    Enumerates the pairs of points closer than maxDist (great circle distance), by
+    chunks.
+
+    Args:
+        lat, lon (array): The coordinates of the points (degrees).
+        maxDist (float): The maximum separation (km).
+        chunk (int): The approximate number of candidate pairs of each chunk.
+        radius (float): The radius of the Earth (km).
+
+    Yields:
+        (i, j, dist) arrays: the indexes of the points of each pair (i < j within a
+        cell) and their distance (km).
+    """
+    xyz = _unitVectors(lat, lon)
+    if xyz.shape[0] < 2:
+        return
+
+    h    = 2.0 * np.sin(min(maxDist / radius, np.pi) / 2.0)   # chord of maxDist
+    m    = int(np.floor(2.0 / h)) + 3
+    cell = np.floor((xyz + 1.0) / h).astype(np.int64) + 1
+    key  = (cell[:, 0] * m + cell[:, 1]) * m + cell[:, 2]
+
+    order = np.argsort(key, kind='stable')
+    key   = key[order]
+    uniq, start, count = np.unique(key, return_index=True, return_counts=True)
+
+    pairsA, pairsB = [], []
+    for oi, oj, ok in [(0, 0, 0)] + _OFFSETS:
+        nb  = uniq + (oi * m + oj) * m + ok
+        pos = np.minimum(np.searchsorted(uniq, nb), len(uniq) - 1)
+        hit = uniq[pos] == nb
+        pairsA.append(np.flatnonzero(hit))
+        pairsB.append(pos[hit])
+    cellA = np.concatenate(pairsA)
+    cellB = np.concatenate(pairsB)
+
+    size  = count[cellA] * count[cellB]
+    bound = np.cumsum(size)
+    first = 0
+    while first < len(cellA):
+        last = max(int(np.searchsorted(bound, bound[first] - size[first] + chunk, side='right')), first + 1)
+
+        a, b, k = cellA[first:last], cellB[first:last], size[first:last]
+        pid   = np.repeat(np.arange(len(k)), k)
+        local = np.arange(k.sum()) - np.repeat(np.cumsum(k) - k, k)
+        i = start[a][pid] + local // count[b][pid]
+        j = start[b][pid] + local % count[b][pid]
+
+        keep = (a[pid] != b[pid]) | (i < j)
+        i, j = i[keep], j[keep]
+
+        chord = np.linalg.norm(xyz[order[i]] - xyz[order[j]], axis=1)
+        dist  = 2.0 * radius * np.arcsin(np.minimum(chord / 2.0, 1.0))
+        near  = dist <= maxDist
+
+        yield order[i[near]], order[j[near]], dist[near]
+        first = last
+
+
+class innovationCorrelation(object):
+    """
+    Accumulates, over cycles, the covariance of pairs of innovations binned by
+    separation distance (Hollingsworth-Lonnberg method).
+
+    The estimator is meant to be fed with the observations of one level or channel
+    (see mask), since the pairs are made regardless of the vertical coordinate.
+
+    Attributes:
+        maxDist (float): The maximum separation (km).
+        binWidth (float): The width of the distance bins (km).
+        edges (ndarray): The edges of the distance bins.
+        sample (int): If given, at most sample observations (chosen at random) are used
+                      in each cycle, bounding the cost for dense data.
+
+    Example:
+        hl = gd.innovationCorrelation(maxDist=800, binWidth=25)
+        hl.update(gdf_list, 'amsua', 'n19', mask='nchan == 5 & iuse == 1 & idqc == 0')
+        tab = hl.table()
+        sigma_o, sigma_b = hl.errors()
+    """
+    def __init__(self, maxDist=1000.0, binWidth=25.0, sample=None, seed=0):
+        self.maxDist  = float(maxDist)
+        self.binWidth = float(binWidth)
+        self.edges    = np.arange(0.0, self.maxDist + self.binWidth, self.binWidth)
+        self.sample   = sample
+        self._rng     = np.random.default_rng(seed)
+        self._sums    = {s: np.zeros(len(self.edges) - 1) for s in PAIR_SUMS}
+        self._var     = moments.empty()
+        self._dates   = set()
+
+    def addValues(self, lat, lon, value):
+        """
+        Adds the pairs of one set of simultaneous observations (one cycle).
+
+        Args:
+            lat, lon (array): The coordinates of the observations (degrees).
+            value (array): The innovations (NaN values are skipped).
+        """
+        lat, lon, value = [np.asarray(a, dtype=np.float64).reshape(-1) for a in (lat, lon, value)]
+        valid = np.isfinite(lat) & np.isfinite(lon) & np.isfinite(value)
+        lat, lon, value = lat[valid], lon[valid], value[valid]
+
+        if self.sample is not None and len(value) > self.sample:
+            pick = self._rng.choice(len(value), self.sample, replace=False)
+            lat, lon, value = lat[pick], lon[pick], value[pick]
+
+        self._var = self._var.merge(moments.fromValues(value))
+
+        nbins = len(self.edges) - 1
+        for i, j, dist in closePairs(lat, lon, self.maxDist):
+            b = np.minimum((dist / self.binWidth).astype(np.int64), nbins - 1)
+            x, y = value[i], value[j]
+            self._sums['n']  += np.bincount(b, minlength=nbins)
+            self._sums['x']  += np.bincount(b, weights=x, minlength=nbins)
+            self._sums['y']  += np.bincount(b, weights=y, minlength=nbins)
+            self._sums['xy'] += np.bincount(b, weights=x*y, minlength=nbins)
+            self._sums['xx'] += np.bincount(b, weights=x*x, minlength=nbins)
+            self._sums['yy'] += np.bincount(b, weights=y*y, minlength=nbins)
+
+    def addTable(self, table, q='omf'):
+        """
+        Adds the observations of an obsInfo table (one cycle).
+        """
+        self.addValues(table['lat'].to_numpy(), table['lon'].to_numpy(), table[q].to_numpy())
+
+    def add(self, date, diag, varName, varType=None, mask=None, q='omf'):
+        """
+        Adds one cycle. Cycles already added are skipped.
+
+        Args:
+            date (datetime): The analysis date of the cycle.
+            diag (read_diag): The cycle.
+            varName (str): The variable.
+            varType (int or str): The kx (or SatId). Defaults to all.
+            mask (str): A DataFrame.query expression selecting the observations
+                        (e.g. a level or a channel).
+            q (str): The innovation column ('omf' or 'oma').
+
+        Returns:
+            True if the cycle was added.
+        """
+        date = pd.Timestamp(date).to_pydatetime()
+        if date in self._dates or varName not in diag.obsInfo:
+            return False
+
+        table = selectTable(diag, varName, mask)
+        if varType is not None:
+            if varType not in table.index.get_level_values(0):
+                return False
+            table = table.loc[varType]
+
+        self.addTable(table, q)
+        self._dates.add(date)
+        return True
+
+    def update(self, cycles, varName, varType=None, mask=None, q='omf'):
+        """
+        Adds the cycles of a list of (date, read_diag) pairs, a cycleList or a
+        diagCollection that were not added yet.
+
+        Returns:
+            The number of cycles added.
+        """
+        from .loader import cycleItems
+
+        added = 0
+        for date, diag in cycleItems(cycles, lambda date: pd.Timestamp(date).to_pydatetime() in self._dates):
+            if self.add(date, diag, varName, varType, mask, q):
+                added = added + 1
+        return added
+
+    def merge(self, other):
+        """
+        Adds the sums of other (an innovationCorrelation with the same bins) to self.
+        """
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError('innovationCorrelation: estimators with different bins')
+        for s in PAIR_SUMS:
+            self._sums[s] = self._sums[s] + other._sums[s]
+        self._var   = self._var.merge(other._var)
+        self._dates = self._dates | other._dates
+        return self
+
+    def table(self):
+        """
+        Returns the covariance and correlation of the innovations by distance bin.
+
+        Returns:
+            A DataFrame indexed by the center of the bins (km), with the number of
+            pairs (npairs), the covariance (cov) and the correlation (corr) of the pairs,
+            and the covariance normalized by the variance of all innovations (hl).
+        """
+        s = self._sums
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # each pair is taken in both orders, so that the estimates do not depend on
+            # which observation of the pair comes first
+            n    = s['n']
+            mean = (s['x'] + s['y']) / (2.0 * n)
+            cov  = s['xy'] / n - mean * mean
+            var  = (s['xx'] + s['yy']) / (2.0 * n) - mean * mean
+            corr = cov / var
+            hl   = cov / self._var.var
+
+        center = (self.edges[:-1] + self.edges[1:]) / 2.0
+        return pd.DataFrame({'npairs': n.astype(np.int64), 'cov': cov, 'corr': corr, 'hl': hl},
+                            index=pd.Index(center, name='dist'))
+
+    def errors(self, nfit=8, deg=2):
+        """
+        Splits the variance of the innovations into observation and background
+        errors: the covariance of the first nfit bins with pairs is fitted by a
+        polynomial of degree deg in the distance, extrapolated to zero separation
+        (background error variance); the remaining variance is the observation error
+        variance (assumed spatially uncorrelated).
+
+        Returns:
+            The estimated sigma_o and sigma_b (NaN if they cannot be estimated).
+        """
+        tab = self.table()
+        tab = tab[tab['npairs'] > 0].iloc[:nfit]
+        if tab.shape[0] <= deg or self._var.count == 0:
+            return np.nan, np.nan
+
+        varb = np.polyval(np.polyfit(tab.index.to_numpy(), tab['cov'].to_numpy(), deg, w=np.sqrt(tab['npairs'].to_numpy())), 0.0)
+        varo = float(self._var.var) - varb
+
+        sigma_b = np.sqrt(varb) if varb >= 0 else np.nan
+        sigma_o = np.sqrt(varo) if varo >= 0 else np.nan
+        return sigma_o, sigma_b
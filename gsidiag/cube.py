@@ -0,0 +1,716 @@
+"""
+This module defines the diagnostic cube: a persistent table of per-cycle aggregates
+of gsi diagnostic files (time x level/channel x kx/SatId x statistic).
+
+Each cycle is reduced once to mergeable (count, mean, M2) accumulators and sums per
+(variable, kx, mask, level) (see gsidiag.moments), and new cycles are appended to the cube without recomputing the previous ones. The
+time series plots and tocsv are rendered from these aggregates, so adding the newest
+cycle to a long period costs only the reduction of that cycle.
+"""
+import os
+import numpy as np
+import pandas as pd
+
+from .moments import moments
+from .regions import regionKey
+from .masks import maskTable, selectRows
+
+# statistics stored for each (date, varName, varType, mask, lev)
+STATS = ['nobs',
+         'omf_n', 'omf_mean', 'omf_m2',
+         'oma_n', 'oma_mean', 'oma_m2',
+         'imp_n', 'imp_sum', 'imp_neg',
+         'dfs_n', 'dfs_sum',
+         'des_n', 'des_b', 'des_a', 'des_ab', 'des_bb', 'des_oer2']
+
+# des_*: sums for the Desroziers diagnostics over the observations with finite OmF (b),
+# OmA (a) and assigned error (oer): count, sum(b), sum(a), sum(a*b), sum(b*b), sum(oer**2)
+
+STATS_KEYS = ['date', 'varName', 'varType', 'mask', 'lev']
+QC_KEYS    = ['date', 'varName', 'varType', 'lev', 'iuse', 'idqc']
+
+# columns of the cubes saved before the OmF/OmA accumulators were (count, mean, M2)
+OLD_STATS = ['omf_sum', 'omf_sumsq', 'oma_sum', 'oma_sumsq']
+
+# version of the files of a persisted cube (kept in the file 'version'):
+#   1: OmF/OmA sums and sums of squares, 2: (count, mean, M2) accumulators, 3: des_* sums
+CUBE_VERSION = 3
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _maskKey(mask, region=None):
+    """
+    Returns the key of a mask (and region) in the cube: the query expression, followed
+    by '@' and the region (see gsidiag.regions) if the observations are restricted to it.
+    """
+    key = '' if mask is None else str(mask)
+    if region is not None:
+        key = key + '@' + regionKey(region)
+    return key
+
+
+def _levColumn(table):
+    """
+    Returns the column used as vertical coordinate: the channel for radiance
+    tables and the pressure for conventional ones.
+    """
+    if 'nchan' in table.columns:
+        return 'nchan'
+    return 'prs'
+
+
+def _levKeys(table, levCol):
+    """
+    Returns the rows with a valid level, and their kx/SatId (as str) and integer level.
+    """
+    lev  = table[levCol].to_numpy(dtype=np.float64)
+    keep = np.isfinite(lev)
+    return keep, table.index.get_level_values(0).astype(str)[keep], np.trunc(lev[keep]).astype(np.int64)
+
+
+def layerBounds(zlevs):
+    """
+    Returns the sorted levels of zlevs and the (lower, upper) bounds of their layers,
+    which fill the column: each layer extends half way to the neighbouring levels
+    (the layers of time_series with Level='Zlevs').
+    """
+    levs   = sorted(set(zlevs))
+    bounds = []
+    for ll, lv in enumerate(levs):
+        lower = 0 if ll == 0 else (levs[ll] - levs[ll-1]) / 2.0
+        upper = lower if ll == len(levs)-1 else (levs[ll+1] - levs[ll]) / 2.0
+        bounds.append((lv - lower, lv + upper))
+    return levs, bounds
+
+
+def layerLevels(lev, zlevs):
+    """
+    Returns the level of zlevs whose layer (see layerBounds) holds each value of lev,
+    or NaN for the values outside all layers.
+    """
+    lev    = np.asarray(lev, dtype=np.float64)
+    layer  = np.full(lev.shape, np.nan)
+    levs, bounds = layerBounds(zlevs)
+    for lv, (lower, upper) in zip(levs, bounds):
+        layer[np.isnan(layer) & (lev >= lower) & (lev < upper)] = lv
+    return layer
+
+
+def desroziersSums(omf, oma, oer, position, size):
+    """
+    Returns the des_* sums (see STATS) of each cell, for the values of omf, oma and
+    oer at cells position (integers from 0 to size-1).
+    """
+    omf = np.asarray(omf, dtype=np.float64)
+    oma = np.asarray(oma, dtype=np.float64)
+    oer = np.asarray(oer, dtype=np.float64)
+
+    valid    = np.isfinite(omf) & np.isfinite(oma) & np.isfinite(oer)
+    position = np.asarray(position)[valid]
+    b, a, e  = omf[valid], oma[valid], oer[valid]
+
+    return {'des_n'   : np.bincount(position, minlength=size),
+            'des_b'   : np.bincount(position, weights=b, minlength=size),
+            'des_a'   : np.bincount(position, weights=a, minlength=size),
+            'des_ab'  : np.bincount(position, weights=a*b, minlength=size),
+            'des_bb'  : np.bincount(position, weights=b*b, minlength=size),
+            'des_oer2': np.bincount(position, weights=e*e, minlength=size)}
+
+
+def _readStats(fileName):
+    """
+    Reads the stats.csv file of a cube, converting the statistics of cubes saved by
+    older versions to the STATS columns: the sums and sums of squares of OmF/OmA
+    become (mean, M2) accumulators, and the statistics added later have zero counts.
+    """
+    stats = pd.read_csv(fileName, float_precision='round_trip',
+                        dtype={'varName': str, 'varType': str, 'mask': str}, keep_default_na=False,
+                        na_values={c: [''] for c in STATS + OLD_STATS})
+    # files appended by older versions mix dates with and without the time
+    stats['date'] = pd.DatetimeIndex(stats['date'])
+
+    for q in ['omf', 'oma']:
+        if q+'_sum' in stats.columns and q+'_mean' not in stats.columns:
+            n  = stats[q+'_n'].to_numpy(dtype=np.float64)
+            s  = stats[q+'_sum'].to_numpy(dtype=np.float64)
+            ss = stats[q+'_sumsq'].to_numpy(dtype=np.float64)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = np.where(n > 0, s / n, np.nan)
+                m2   = np.where(n > 0, np.maximum(ss - s * mean, 0.0), np.nan)
+            stats[q+'_mean'] = mean
+            stats[q+'_m2']   = m2
+
+    return stats.reindex(columns=STATS_KEYS+STATS, fill_value=0)
+
+
+def _fileHeader(fileName):
+    with open(fileName) as f:
+        return f.readline().strip().split(',')
+
+
+def cubeVersion(path):
+    """
+    Returns the version of the files of the cube persisted in path (see CUBE_VERSION),
+    from its 'version' file or, for cubes saved before it existed, from the columns
+    of stats.csv.
+    """
+    fversion = os.path.join(path, 'version')
+    if os.path.exists(fversion):
+        with open(fversion) as f:
+            return int(f.read().strip())
+    header = _fileHeader(os.path.join(path, 'stats.csv'))
+    if 'omf_sum' in header:
+        return 1
+    if 'des_n' not in header:
+        return 2
+    return CUBE_VERSION
+
+
+def statsFrame(index, values):
+    """
+    Builds the STATS table of a cycle from the accumulators of each (varType, lev).
+
+    Args:
+        index (MultiIndex): The (varType, lev) pairs.
+        values (dict): {'omf': moments, 'oma': moments, 'imp': moments, 'dfs': moments,
+                        'nobs': counts, 'imp_neg': counts, 'des': desroziersSums}.
+    """
+    stats = {'nobs': values['nobs']}
+    for q in ['omf', 'oma']:
+        stats[q+'_n']    = values[q].count
+        stats[q+'_mean'] = values[q].mean
+        stats[q+'_m2']   = values[q].m2
+    for q in ['imp', 'dfs']:
+        stats[q+'_n']   = values[q].count
+        stats[q+'_sum'] = np.where(values[q].count > 0, values[q].count * values[q].mean, 0.0)
+    stats['imp_neg'] = values['imp_neg']
+    stats.update(values['des'])
+
+    return pd.DataFrame(stats, index=index)[STATS]
+
+
+def reduceCycle(table, mask=None, rows=None):
+    """
+    Reduces the observations of one variable in one cycle to (count, mean, M2)
+    accumulators and sums per (kx/SatId, level). Levels are the integer part of the
+    pressure (hPa) for conventional data and the channel number for radiance data.
+
+    Args:
+        table (DataFrame): The obsInfo table of a variable.
+        mask (str): A DataFrame.query expression selecting the observations (see
+                    gsidiag.masks).
+        rows (array): The positions of the rows to be reduced (e.g. the observations of
+                      a region, see read_diag.regionRows). Defaults to all rows.
+
+    Returns:
+        Two DataFrames: the statistics (STATS columns) indexed by (varType, lev),
+        and the number of observations indexed by (varType, lev, iuse, idqc).
+    """
+    levCol = _levColumn(table)
+
+    subset = mask is not None or rows is not None
+    if subset:
+        keep, types, levs = _levKeys(table, levCol)
+        allLevs = pd.MultiIndex.from_arrays([types, levs], names=['varType', 'lev']).unique().sort_values()
+        if rows is not None:
+            table = table.iloc[rows]
+        table = maskTable(table, mask)
+
+    keep, types, levs = _levKeys(table, levCol)
+    keys     = pd.MultiIndex.from_arrays([types, levs], names=['varType', 'lev'])
+    index    = keys.unique().sort_values()
+    position = index.get_indexer(keys)
+
+    def _column(col):
+        if col in table.columns:
+            return table[col].to_numpy(dtype=np.float64)[keep]
+        return np.full(len(position), np.nan)
+
+    values = {'nobs': np.bincount(position, minlength=len(index))}
+    for col in ['omf', 'oma', 'imp', 'dfs']:
+        value = _column(col)
+        values[col] = moments.fromValues(value, position, len(index))
+        if col == 'imp':
+            values['imp_neg'] = np.bincount(position, weights=value < 0, minlength=len(index)).astype(np.int64)
+
+    values['des'] = desroziersSums(_column('omf'), _column('oma'), _column('oer'), position, len(index))
+
+    stats = statsFrame(index, values)
+    if subset:
+        # keep the levels (channels) without selected observations, with zero counts
+        stats = stats.reindex(allLevs, fill_value=0)
+        for q in ['omf', 'oma']:
+            empty = stats[q+'_n'] == 0
+            stats.loc[empty, [q+'_mean', q+'_m2']] = np.nan
+
+    qc = pd.DataFrame({'varType': types,
+                       'lev'    : levs,
+                       'iuse'   : np.nan_to_num(table['iuse'].to_numpy(dtype=np.float64)[keep], nan=-999).astype(np.int64),
+                       'idqc'   : np.nan_to_num(table['idqc'].to_numpy(dtype=np.float64)[keep], nan=-999).astype(np.int64)})
+    qc = qc.groupby(['varType', 'lev', 'iuse', 'idqc'], sort=True).size().rename('count')
+
+    return stats, qc
+
+
+def reduceDiag(diag, varName, mask=None, region=None):
+    """
+    Reduces one variable of a read_diag object (see reduceCycle). Radiance data read
+    in channel-major layout are reduced from their 2-D arrays, without building the
+    flat table. With a mask or a region (see gsidiag.regions) only the selected
+    observations are reduced, taken from the cached rows of the read_diag object
+    (see read_diag.maskRows).
+
+    Returns:
+        The statistics and QC counts of reduceCycle, or (None, None) if the file has
+        no observations of varName.
+    """
+    radInfo = getattr(diag, 'radInfo', {})
+    if mask is None and region is None and varName in radInfo:
+        reduced = [radInfo[varName][satId].reduce(satId) for satId in radInfo[varName]]
+        return pd.concat([r[0] for r in reduced]).sort_index(), pd.concat([r[1] for r in reduced]).sort_index()
+
+    if varName in diag.obsInfo:
+        return reduceCycle(diag.obsInfo[varName], rows=selectRows(diag, varName, mask, region))
+
+    return None, None
+
+
+def impactSummary(stats, by='varType'):
+    """
+    Summarizes the observation impact (imp) and the DFS of a STATS table, adding the
+    sums and counts over all the index levels not in by (e.g. cycles and levels).
+
+    Args:
+        stats (DataFrame): STATS columns, indexed by some of STATS_KEYS.
+        by (str or list): The index levels kept, e.g. 'varType', 'lev' or ['varType', 'lev'].
+
+    Returns:
+        A DataFrame indexed by the levels in by, with the columns:
+            nobs      : number of observations
+            imp_n     : number of observations with impact
+            imp_total : total impact
+            imp_mean  : mean impact
+            ibf       : beneficial fraction (%), observations with imp < 0 over nobs
+            dfs_n     : number of observations with DFS
+            dfs_total : total DFS
+            dfs_mean  : mean DFS
+    """
+    if isinstance(by, str):
+        by = [by]
+
+    total = stats[['nobs', 'imp_n', 'imp_sum', 'imp_neg', 'dfs_n', 'dfs_sum']].groupby(level=by, sort=True).sum()
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        summary = pd.DataFrame({'nobs'     : total['nobs'],
+                                'imp_n'    : total['imp_n'],
+                                'imp_total': total['imp_sum'],
+                                'imp_mean' : np.where(total['imp_n'] > 0, total['imp_sum'] / total['imp_n'], np.nan),
+                                'ibf'      : np.where(total['nobs'] > 0, 100.0 * total['imp_neg'] / total['nobs'], np.nan),
+                                'dfs_n'    : total['dfs_n'],
+                                'dfs_total': total['dfs_sum'],
+                                'dfs_mean' : np.where(total['dfs_n'] > 0, total['dfs_sum'] / total['dfs_n'], np.nan)},
+                               index=total.index)
+
+    return summary
+
+
+class diagCube(object):
+    """
+    A cube of per-cycle aggregates (time x level/channel x kx x statistic), optionally
+    persisted in a directory (files stats.csv and qc.csv). New cycles are appended to
+    the files by save(), so the cost of updating the cube is proportional to the new
+    cycles only.
+
+    Attributes:
+        path (str): The directory where the cube is persisted (None: memory only).
+        zlevs (list): The default levels of the time series, taken from the first
+                      cycle added to the cube.
+
+    Example:
+        cube = gd.diagCube('/dataout/cube')
+        gd.plot_diag.time_series(gdf_list, varName='uv', varType=220, dateIni=2019121000, dateFin=2019121118, cube=cube)
+        # and later, from the cube only:
+        gd.plot_diag.time_series(cube, varName='uv', varType=220, dateIni=2019121000, dateFin=2019121118)
+    """
+    def __init__(self, path=None):
+        self.path    = path
+        self.zlevs   = [1000.0,900.0,800.0,700.0,600.0,500.0,400.0,300.0,250.0,200.0,150.0,100.0,50.0,0.0]
+        self._stats  = []
+        self._qc     = []
+        self._new    = 0   # number of frames not yet saved
+        self._keys   = set()
+        self._cache  = None
+
+        if path is not None and os.path.exists(os.path.join(path, 'stats.csv')):
+            self._load()
+
+    def _load(self):
+        version = cubeVersion(self.path)
+        if version > CUBE_VERSION:
+            raise ValueError('diagCube: the cube in ' + self.path + ' was saved by a newer version of gsidiag '
+                             '(cube version ' + str(version) + ', supported up to ' + str(CUBE_VERSION) + ')')
+
+        stats = _readStats(os.path.join(self.path, 'stats.csv'))
+        qc    = pd.read_csv(os.path.join(self.path, 'qc.csv'), dtype={'varName': str, 'varType': str}, keep_default_na=False)
+        qc['date'] = pd.DatetimeIndex(qc['date'])
+        keys  = pd.read_csv(os.path.join(self.path, 'cycles.csv'), parse_dates=['date'],
+                            dtype={'varName': str, 'mask': str}, keep_default_na=False)
+
+        self._stats = [stats.set_index(STATS_KEYS)]
+        self._qc    = [qc.set_index(QC_KEYS)['count']]
+        self._keys  = set(zip(pd.DatetimeIndex(keys['date']).to_pydatetime(), keys['varName'], keys['mask']))
+        self._new   = 0
+
+    def has(self, date, varName, mask=None, region=None):
+        """
+        Returns True if the cycle at date was already reduced for varName, mask and region.
+        """
+        return (pd.Timestamp(date).to_pydatetime(), varName, _maskKey(mask, region)) in self._keys
+
+    def add(self, date, diag, varName, mask=None, region=None):
+        """
+        Reduces one cycle and appends it to the cube. Cycles already in the cube are
+        skipped.
+
+        Args:
+            date (datetime): The analysis date of the cycle.
+            diag (read_diag): The cycle.
+            varName (str): The variable to be reduced (all its kx/SatId are reduced).
+            mask (str): A DataFrame.query expression selecting the observations.
+            region (str or list): A region name (see gsidiag.regions.REGIONS) or its
+                                  limits [Loni, Lati, Lonf, Latf].
+
+        Returns:
+            True if the cycle was added.
+        """
+        date = pd.Timestamp(date).to_pydatetime()
+        key  = (date, varName, _maskKey(mask, region))
+        if key in self._keys:
+            return False
+
+        stats, qc = reduceDiag(diag, varName, mask, region)
+        if stats is not None:
+            stats = pd.concat({(date, varName): stats}, names=['date', 'varName'])
+            stats = pd.concat({_maskKey(mask, region): stats}, names=['mask'])
+            stats = stats.reorder_levels(STATS_KEYS)
+            self._stats.append(stats)
+
+            if mask is None and region is None:
+                qc = pd.concat({(date, varName): qc}, names=['date', 'varName'])
+                self._qc.append(qc)
+
+        self._keys.add(key)
+        self._new   = self._new + 1
+        self._cache = None
+
+        return True
+
+    def update(self, cycles, varName, mask=None, region=None):
+        """
+        Adds to the cube the cycles of a list of (date, read_diag) pairs, a cycleList or
+        a diagCollection that are not in the cube yet. Missing cycles (None) are skipped.
+
+        Args:
+            cycles (iterable): (date, read_diag) pairs. The read_diag object may also be
+                               a function returning it, so that only the cycles not yet
+                               in the cube are read (see gsidiag.loader.cycleItems).
+            varName (str): The variable to be reduced.
+            mask (str): A DataFrame.query expression selecting the observations.
+            region (str or list): The region of the observations (see add).
+
+        Returns:
+            The number of cycles added.
+        """
+        from .loader import cycleItems
+
+        added = 0
+        for date, diag in cycleItems(cycles, lambda date: self.has(date, varName, mask, region)):
+            if len(self._keys) == 0 and getattr(diag, 'zlevs', None) is not None:
+                self.zlevs = list(diag.zlevs)
+            if self.add(date, diag, varName, mask, region):
+                added = added + 1
+        return added
+
+    def stats(self):
+        """
+        Returns all statistics of the cube as a DataFrame indexed by STATS_KEYS.
+        """
+        if self._cache is None:
+            if len(self._stats) == 0:
+                index = pd.MultiIndex.from_arrays([[] for k in STATS_KEYS], names=STATS_KEYS)
+                self._cache = pd.DataFrame(columns=STATS, index=index)
+            else:
+                self._cache = pd.concat(self._stats).sort_index()
+            self._stats = [self._cache]
+        return self._cache
+
+    def qcCounts(self, varName, varType, dates=None):
+        """
+        Returns the number of observations of varName/varType for each (date, lev, iuse, idqc).
+        """
+        if len(self._qc) == 0:
+            return pd.Series(dtype=np.int64)
+        qc = pd.concat(self._qc)
+        self._qc = [qc]
+        qc = qc.xs((varName, str(varType)), level=('varName', 'varType'))
+        if dates is not None:
+            qc = qc[qc.index.get_level_values('date').isin(dates)]
+        return qc
+
+    def _select(self, varName, varType, mask, region=None):
+        stats = self.stats()
+        try:
+            return stats.xs((varName, str(varType), _maskKey(mask, region)), level=('varName', 'varType', 'mask'))
+        except KeyError:
+            return stats.iloc[0:0].droplevel(['varName', 'varType', 'mask'])
+
+    def dates(self, varName, mask=None, region=None):
+        """
+        Returns the sorted dates of the cycles reduced for varName, mask and region.
+        """
+        return sorted(date for date, var, m in self._keys if var == varName and m == _maskKey(mask, region))
+
+    def levels(self, varName, varType, mask=None, dates=None, observed=True, region=None):
+        """
+        Returns the sorted levels (or channels) of varName/varType.
+
+        Args:
+            observed (bool): Only the levels with observations selected by the mask.
+                             If False, all levels (or channels) found in the files.
+        """
+        sub = self._select(varName, varType, mask, region)
+        if dates is not None:
+            sub = sub[sub.index.get_level_values('date').isin(dates)]
+        if observed:
+            sub = sub[sub['nobs'] > 0]
+        return sorted(set(sub.index.get_level_values('lev').tolist()))
+
+    def _pivot(self, sub, column, dates, levs, fill=0.0):
+        """
+        Returns a (dates x levs) array of one statistic, with fill where it is missing.
+        """
+        if sub.shape[0] == 0:
+            return np.full((len(dates), len(levs)), fill)
+        a = sub[column].astype(np.float64).unstack('lev').reindex(index=pd.DatetimeIndex(dates), columns=levs)
+        return a.fillna(fill).to_numpy()
+
+    def accumulators(self, varName, varType, dates, levs, q, mask=None, region=None):
+        """
+        Returns the (dates x levs) accumulators of OmF or OmA (q = 'omf' or 'oma').
+        """
+        sub = self._select(varName, varType, mask, region)
+        return moments(self._pivot(sub, q+'_n', dates, levs).astype(np.int64),
+                       self._pivot(sub, q+'_mean', dates, levs, np.nan),
+                       self._pivot(sub, q+'_m2', dates, levs, np.nan))
+
+    def layers(self, varName, varType, dates, bounds, mask=None, stats=('omf', 'oma'), region=None):
+        """
+        Merges the per-level accumulators into layers for each date.
+
+        Args:
+            varName (str): The variable.
+            varType (int or str): The kx (or SatId).
+            dates (list): The dates of the time series.
+            bounds (list): The layers, as (lower, upper) level limits: a layer
+                           includes the levels lev with lower <= lev < upper.
+            mask (str): The mask used when reducing the cycles.
+            stats (tuple): The quantities to be returned.
+            region (str or list): The region used when reducing the cycles.
+
+        Returns:
+            A dict {quantity: moments} with (dates x layers) accumulators.
+            Cells without observations have count 0 and NaN mean.
+        """
+        sub  = self._select(varName, varType, mask, region)
+        levs = np.array(sorted(set(sub.index.get_level_values('lev').tolist())), dtype=np.float64)
+
+        result = {}
+        for q in stats:
+            acc    = self.accumulators(varName, varType, dates, levs, q, mask, region)
+            merged = [acc.sum(axis=1, where=(levs >= lower) & (levs < upper)) for lower, upper in bounds]
+            result[q] = moments(np.stack([m.count for m in merged], axis=1).reshape(len(dates), len(bounds)),
+                                np.stack([m.mean for m in merged], axis=1).reshape(len(dates), len(bounds)),
+                                np.stack([m.m2 for m in merged], axis=1).reshape(len(dates), len(bounds)))
+
+        return result
+
+    def channelSeries(self, varName, varType, dates, mask=None, channels=None, stats=('omf', 'oma'), region=None):
+        """
+        Returns the accumulators of every channel of a sensor/platform for each date,
+        as (dates x channels) arrays built at once from the per-channel aggregates
+        (used for the Hovmoller plots).
+
+        Args:
+            varName (str): The sensor (e.g. 'amsua', 'atms', 'iasi').
+            varType (str): The platform (SatId).
+            dates (list): The dates of the time series.
+            mask (str): The mask used when reducing the cycles.
+            channels (list): The channels. Defaults to all channels found in the files.
+            stats (tuple): The quantities to be returned.
+            region (str or list): The region used when reducing the cycles.
+
+        Returns:
+            The list of channels and a dict {quantity: moments}.
+            Cells without observations have count 0 and NaN mean.
+        """
+        if channels is None:
+            channels = self.levels(varName, varType, mask, dates, observed=False, region=region)
+
+        result = {}
+        for q in stats:
+            result[q] = self.accumulators(varName, varType, dates, channels, q, mask, region)
+
+        return list(channels), result
+
+    def impact(self, varName, dates=None, mask=None, by='varType', region=None):
+        """
+        Returns the impact and DFS summary of varName (see impactSummary), accumulated
+        over the cycles of the cube.
+
+        Args:
+            varName (str): The variable.
+            dates (list): The cycles to be summarized. Defaults to all cycles of the cube.
+            mask (str): The mask used when reducing the cycles.
+            by (str or list): 'varType' (kx/SatId), 'lev' (level/channel) or both.
+            region (str or list): The region used when reducing the cycles.
+
+        Example:
+            cube.impact('amsua', by=['varType', 'lev'])
+        """
+        return impactSummary(self._subset(varName, dates, mask, region), by)
+
+    def desroziers(self, varName, varType=None, dates=None, mask=None, by=['varType', 'lev'], region=None, zlevs=None, layers=True, area=None):
+        """
+        Returns the Desroziers et al. (2005) diagnostics of the observation and
+        background errors of varName, accumulated over the cycles of the cube (the
+        cycles must have been read with the analysis file, for OmA):
+
+            sigma_o**2 = cov(OmA, OmF)
+            sigma_b**2 = cov(OmF - OmA, OmF)   (HBH^T, background error in observation space)
+
+        Args:
+            varName (str): The variable.
+            varType (int or str): The kx (or SatId). Defaults to all.
+            dates (list): The cycles to be used. Defaults to all cycles of the cube.
+            mask (str): The mask used when reducing the cycles (e.g. 'iuse == 1').
+            by (str or list): 'varType' (kx/SatId), 'lev' (level/channel) or both.
+            region (str or list): The region used when reducing the cycles.
+            zlevs (list): The levels of the layers of conventional data (default: the
+                          zlevs of the cube).
+            layers (bool): By 'lev', the pressures of conventional data are binned in
+                           the layers of zlevs (see layerBounds); if False, one row is
+                           returned for each hPa. Radiance channels are not binned.
+            area (str or list): The same as region (the name used by the maps).
+
+        Returns:
+            A DataFrame indexed by the levels in by, with the columns:
+                nobs    : number of observations with OmF, OmA and assigned error
+                oer     : root mean square of the assigned errors
+                sigma_o : estimated observation error
+                sigma_b : estimated background error
+                ratio   : sigma_o / oer, the factor to tune the assigned errors
+            The estimates are NaN where the covariances are negative or where there are
+            less than 2 observations.
+
+        Example:
+            cube.desroziers('amsua', 'n19', mask='iuse == 1', by='lev')
+        """
+        if region is None:
+            region = area
+        stats = self._subset(varName, dates, mask, region)
+        if varType is not None and stats.shape[0] > 0:
+            stats = stats[stats.index.get_level_values('varType') == str(varType)]
+        if isinstance(by, str):
+            by = [by]
+
+        if 'lev' in by and layers and stats.shape[0] > 0:
+            # the pressures of kx (not the channels of SatId) are binned in layers
+            types = stats.index.get_level_values('varType')
+            if all(str(t).lstrip('-').isdigit() for t in types):
+                layer = layerLevels(stats.index.get_level_values('lev'), self.zlevs if zlevs is None else zlevs)
+                keep  = np.isfinite(layer)
+                stats = stats[keep].reset_index('lev', drop=True)
+                stats = stats.set_index(pd.Index(layer[keep].astype(np.int64), name='lev'), append=True)
+
+        total = stats[['des_n', 'des_b', 'des_a', 'des_ab', 'des_bb', 'des_oer2']].groupby(level=by, sort=True).sum()
+        n     = total['des_n'].to_numpy(dtype=np.float64)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            b, a   = total['des_b'] / n, total['des_a'] / n
+            cov_o  = (total['des_ab'] / n - a * b).to_numpy()
+            cov_b  = (total['des_bb'] / n - total['des_ab'] / n - b * b + a * b).to_numpy()
+            oer    = np.sqrt(total['des_oer2'].to_numpy() / n)
+            enough  = n >= 2
+            sigma_o = np.sqrt(np.where(enough & (cov_o >= 0), cov_o, np.nan))
+            sigma_b = np.sqrt(np.where(enough & (cov_b >= 0), cov_b, np.nan))
+
+            return pd.DataFrame({'nobs'   : total['des_n'].to_numpy(),
+                                 'oer'    : oer,
+                                 'sigma_o': sigma_o,
+                                 'sigma_b': sigma_b,
+                                 'ratio'  : sigma_o / oer},
+                                index=total.index)
+
+    def _subset(self, varName, dates, mask, region=None):
+        stats = self.stats()
+        if stats.shape[0] > 0:
+            stats = stats[(stats.index.get_level_values('varName') == varName) &
+                          (stats.index.get_level_values('mask') == _maskKey(mask, region))]
+        if dates is not None and stats.shape[0] > 0:
+            stats = stats[stats.index.get_level_values('date').isin(dates)]
+        return stats
+
+    def save(self):
+        """
+        Appends the cycles added since the last save to the files of the cube. The
+        stats.csv file of a cube saved by an older version is first rewritten with the
+        current columns (see CUBE_VERSION).
+        """
+        if self.path is None:
+            raise ValueError('diagCube: no path to save the cube')
+        if self._new == 0:
+            return
+
+        os.makedirs(self.path, exist_ok=True)
+        fstats = os.path.join(self.path, 'stats.csv')
+        fqc    = os.path.join(self.path, 'qc.csv')
+        fkeys  = os.path.join(self.path, 'cycles.csv')
+
+        if os.path.exists(fstats) and (cubeVersion(self.path) != CUBE_VERSION or _fileHeader(fstats) != STATS_KEYS+STATS):
+            if cubeVersion(self.path) > CUBE_VERSION:
+                raise ValueError('diagCube: the cube in ' + self.path + ' was saved by a newer version of gsidiag')
+            _readStats(fstats).to_csv(fstats + '.tmp', index=False, date_format=DATE_FORMAT)
+            os.replace(fstats + '.tmp', fstats)
+
+        saved = set()
+        if os.path.exists(fkeys):
+            keys  = pd.read_csv(fkeys, parse_dates=['date'], dtype={'varName': str, 'mask': str}, keep_default_na=False)
+            saved = set(zip(pd.DatetimeIndex(keys['date']).to_pydatetime(), keys['varName'], keys['mask']))
+        new = self._keys - saved
+
+        def _isNew(index):
+            keys = zip(index.get_level_values('date').to_pydatetime(),
+                       index.get_level_values('varName'),
+                       index.get_level_values('mask') if 'mask' in index.names else [''] * len(index))
+            return np.array([k in new for k in keys], dtype=bool)
+
+        stats = self.stats()
+        stats = stats[_isNew(stats.index)]
+        stats.reset_index().to_csv(fstats, mode='a', header=not os.path.exists(fstats), index=False, date_format=DATE_FORMAT)
+
+        if len(self._qc) > 0:
+            qc = pd.concat(self._qc)
+            self._qc = [qc]
+            qc = qc[_isNew(qc.index)]
+            qc.reset_index().to_csv(fqc, mode='a', header=not os.path.exists(fqc), index=False, date_format=DATE_FORMAT)
+        elif not os.path.exists(fqc):
+            pd.DataFrame(columns=QC_KEYS+['count']).to_csv(fqc, index=False)
+
+        keys = pd.DataFrame(sorted(new), columns=['date', 'varName', 'mask'])
+        keys.to_csv(fkeys, mode='a', header=not os.path.exists(fkeys), index=False, date_format=DATE_FORMAT)
+
+        with open(os.path.join(self.path, 'version'), 'w') as f:
+            f.write(str(CUBE_VERSION) + '\n')
+
+        self._new = 0
@@ -7,6 +7,7 @@ class dataSourcesInfo:
 
     Attributes:
         tab (dict): A dictionary to store the parsed observations data.
+        index (dict): The details of each observation source, indexed by (kx, var).
     """
     def __init__(self):
         """
@@ -14,16 +15,33 @@ class dataSourcesInfo:
         """
         yaml_file = path.join(path.dirname(__file__), 'table.yml')
 
+        # the C loader (when PyYAML is built with libyaml) is several times faster
+        loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
         with open(yaml_file, 'r') as file:
-            self.data = yaml.safe_load(file)
+            self.data = yaml.load(file, Loader=loader)
 
-        self.tab = {}
+        self.tab   = {}
+        self.index = {}
         for observation in self.data['observations']:
             kx = observation['kx']
             self.tab[kx] = {}
             for detail in observation['details']:
                 var = detail['var']
                 self.tab[kx][var] = detail
+                self.index[(kx, var)] = detail
+
+
+_REGISTRY = None
+
+def registry(reload=False):
+    """
+    Returns the dataSourcesInfo of the process. The YAML file is parsed on the first
+    call only (or again if reload is True).
+    """
+    global _REGISTRY
+    if _REGISTRY is None or reload:
+        _REGISTRY = dataSourcesInfo()
+    return _REGISTRY
 
 
 def getVarInfo(kx, var, feature):
@@ -38,18 +56,19 @@ def getVarInfo(kx, var, feature):
     Returns:
         The value of the requested feature if found, otherwise None.
     """
-    dataInfo = dataSourcesInfo()
+    dataInfo = registry()
+
+    detail = dataInfo.index.get((kx, var))
+    if detail is not None and feature in detail:
+        return detail[feature]
 
     # verify if request exists
     if kx in dataInfo.tab:
         if var in dataInfo.tab[kx]:
-            if feature in dataInfo.tab[kx][var]:
-                return dataInfo.tab[kx][var][feature]
-            else:
-                print('Invalid Feature request:', feature)
-                print('Try using one of:')
-                for item in dataInfo.tab[kx][var]:
-                    print('\t*', item)
+            print('Invalid Feature request:', feature)
+            print('Try using one of:')
+            for item in dataInfo.tab[kx][var]:
+                print('\t*', item)
         else:
             print('Variable', var, 'doesn\'t exist in kx', kx)
             print('Try using one of:')
@@ -61,3 +80,20 @@ def getVarInfo(kx, var, feature):
         for item in dataInfo.tab:
             print('\t*', item)
 
+
+def getVarInfos(kxs, var, feature, default=None):
+    """
+    Retrieves a feature for a list of kx values of one variable (e.g. the labels of
+    the kx of a map), without messages for the kx that are not in the table.
+
+    Args:
+        kxs (list): The kx values to look up.
+        var (str): The variable to look up.
+        feature (str): The specific feature to retrieve information about.
+        default: The value returned for the kx without the feature.
+
+    Returns:
+        A list with the value of the feature for each kx.
+    """
+    index = registry().index
+    return [index.get((kx, var), {}).get(feature, default) for kx in kxs]
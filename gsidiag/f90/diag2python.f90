@@ -140,6 +140,19 @@ module Diag2Python
       else
       
          FNumber = iret
+
+         !
+         ! The file was not opened: remove it from the list, so that
+         ! it is not taken as an open file afterwards
+         !
+
+         if(associated(d,diagFile%root))then
+            nullify(diagFile%root)
+            nullify(diagFile%tail)
+         else
+            nullify(tmp%next)
+         endif
+         deallocate(d)
          
       endif
 
@@ -278,6 +291,8 @@ module Diag2Python
 
       iret = 0
 
+      if(.not.associated(diagFile%root)) return
+
       prev => diagFile%root
       curr => diagFile%root%next
 
@@ -301,7 +316,7 @@ module Diag2Python
             
             prev%next => curr%next
 
-            select type (ptr => prev%data)
+            select type (ptr => curr%data)
                type is (conv)
                   iret = ptr%close()
                type is (rad)
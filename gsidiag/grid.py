@@ -0,0 +1,196 @@
+"""
+This module defines the aggregation of observations on a regular lat/lon grid.
+
+Every column of the obsInfo tables (omf, oma, imp, obs, ...) can be binned on the
+grid, keeping in each cell the mergeable (count, mean, M2) accumulators of
+gsidiag.moments. Grids of different cycles are merged by adding their accumulators,
+so monthly maps cost the size of the grid alone, and the grid is drawn as a single
+image layer instead of one marker per observation.
+"""
+import numpy as np
+import pandas as pd
+
+from .moments import moments
+from .masks import maskTable, selectTable
+from .regions import getRegion
+
+
+class latlonGrid(object):
+    """
+    Mean, standard deviation and number of observations of some columns of the
+    obsInfo tables in the cells of a regular lat/lon grid.
+
+    Attributes:
+        res (float): The resolution of the grid (degrees).
+        area (list): The limits of the grid, [Loni, Lati, Lonf, Latf] (default: the globe),
+                     or a region name (see gsidiag.regions.REGIONS). Areas with
+                     Lonf < Loni cross the dateline (e.g. 'Pacific').
+        lons, lats (ndarray): The edges of the cells. The longitudes increase from Loni,
+                              past 180 for areas crossing the dateline.
+
+    Example:
+        grid = gd.latlonGrid(res=2.0)
+        grid.update(gdf_list, 'amsua', 'n19', params=['omf', 'oma'], mask='nchan == 5 & iuse == 1')
+        grid.plot('omf', 'mean', cmap='seismic')
+    """
+    def __init__(self, res=1.0, area=None):
+        if area is None:
+            area = [-180.0, -90.0, 180.0, 90.0]
+        self.res   = float(res)
+        self.area  = getRegion(area)
+        loni, lati, lonf, latf = self.area
+        if lonf <= loni:
+            lonf = lonf + 360.0   # crosses the dateline
+        self.lons  = loni + self.res * np.arange(int(np.ceil((lonf - loni) / self.res)) + 1)
+        self.lats  = lati + self.res * np.arange(int(np.ceil((latf - lati) / self.res)) + 1)
+        self._acc   = {}
+        self._dates = set()
+
+    @property
+    def shape(self):
+        """
+        The number of cells, (nlat, nlon).
+        """
+        return (len(self.lats) - 1, len(self.lons) - 1)
+
+    @property
+    def extent(self):
+        """
+        The limits of the grid as used by imshow, [Loni, Lonf, Lati, Latf].
+        """
+        return [self.lons[0], self.lons[-1], self.lats[0], self.lats[-1]]
+
+    def cells(self, lat, lon):
+        """
+        Returns the flat index of the cell of each point (-1 outside the grid).
+        Longitudes (in [-180, 180) or [0, 360)) are taken modulo 360 from the western
+        edge of the grid.
+        """
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = (np.asarray(lon, dtype=np.float64) - self.lons[0]) % 360.0 + self.lons[0]
+
+        nlat, nlon = self.shape
+        i = np.floor((lat - self.lats[0]) / self.res)
+        j = np.floor((lon - self.lons[0]) / self.res)
+        i = np.where(lat == self.lats[-1], nlat - 1, i)   # the northern edge belongs to the last row
+        inside = (i >= 0) & (i < nlat) & (j >= 0) & (j < nlon)
+
+        return np.where(inside, np.nan_to_num(i) * nlon + np.nan_to_num(j), -1).astype(np.int64)
+
+    def addValues(self, lat, lon, value, param):
+        """
+        Adds a set of values of param at the points (lat, lon).
+        """
+        cell  = self.cells(lat, lon)
+        value = np.asarray(value, dtype=np.float64)
+        keep  = cell >= 0
+
+        acc = moments.fromValues(value[keep], cell[keep], self.shape[0] * self.shape[1])
+        acc = moments(acc.count.reshape(self.shape), acc.mean.reshape(self.shape), acc.m2.reshape(self.shape))
+
+        if param in self._acc:
+            self._acc[param] = self._acc[param].merge(acc)
+        else:
+            self._acc[param] = acc
+
+    def addTable(self, table, params=('omf',), mask=None):
+        """
+        Adds the observations of an obsInfo table.
+
+        Args:
+            table (DataFrame): The observations (e.g. gdf.obsInfo['amsua'].loc['n19']).
+            params (list): The columns to be gridded.
+            mask (str): A DataFrame.query expression selecting the observations.
+        """
+        table = maskTable(table, mask)
+
+        lat = table['lat'].to_numpy()
+        lon = table['lon'].to_numpy()
+        for param in params:
+            self.addValues(lat, lon, table[param].to_numpy(), param)
+
+    def add(self, date, diag, varName, varType=None, params=('omf',), mask=None):
+        """
+        Adds one cycle. Cycles already added are skipped.
+
+        Returns:
+            True if the cycle was added.
+        """
+        date = pd.Timestamp(date).to_pydatetime()
+        if date in self._dates or varName not in diag.obsInfo:
+            return False
+
+        table = selectTable(diag, varName, mask)
+        if varType is not None:
+            if varType not in table.index.get_level_values(0):
+                return False
+            table = table.loc[varType]
+
+        self.addTable(table, params)
+        self._dates.add(date)
+        return True
+
+    def update(self, cycles, varName, varType=None, params=('omf',), mask=None):
+        """
+        Adds the cycles of a list of (date, read_diag) pairs, a cycleList or a
+        diagCollection that were not added yet.
+
+        Returns:
+            The number of cycles added.
+        """
+        from .loader import cycleItems
+
+        added = 0
+        for date, diag in cycleItems(cycles, lambda date: pd.Timestamp(date).to_pydatetime() in self._dates):
+            if self.add(date, diag, varName, varType, params, mask):
+                added = added + 1
+        return added
+
+    def merge(self, other):
+        """
+        Adds the accumulators of other (a latlonGrid with the same cells) to self.
+        """
+        if not (np.array_equal(self.lons, other.lons) and np.array_equal(self.lats, other.lats)):
+            raise ValueError('latlonGrid: grids with different cells')
+        for param, acc in other._acc.items():
+            self._acc[param] = self._acc[param].merge(acc) if param in self._acc else acc
+        self._dates = self._dates | other._dates
+        return self
+
+    def stat(self, param, stat='mean'):
+        """
+        Returns a (nlat x nlon) masked array of one statistic of param, masked where
+        there are no observations.
+
+        Args:
+            param (str): The gridded column.
+            stat (str): 'mean', 'std' or 'count'.
+        """
+        if param not in self._acc:
+            raise KeyError(param)
+        mean, std, count = self._acc[param].masked()
+        return {'mean': mean, 'std': std, 'count': count}[stat]
+
+    def plot(self, param, stat='mean', ax=None, minVal=None, maxVal=None, **kwargs):
+        """
+        Draws one statistic of the grid as an image layer on ax (e.g. the axes
+        returned by geoMap, plot or ptmap). Grids crossing the dateline are also drawn
+        shifted by -360 degrees, so that both sides appear on maps of [-180, 180].
+
+        Returns:
+            The image (AxesImage), to be used e.g. with plt.colorbar.
+        """
+        import matplotlib.pyplot as plt
+
+        if ax is None:
+            ax = plt.gca()
+        if 'cmap' not in kwargs:
+            kwargs['cmap'] = 'jet'
+
+        image = ax.imshow(self.stat(param, stat), origin='lower', extent=self.extent, vmin=minVal, vmax=maxVal,
+                          aspect='auto', interpolation='none', **kwargs)
+        if self.lons[-1] > 180.0:
+            extent = [self.lons[0] - 360.0, self.lons[-1] - 360.0, self.lats[0], self.lats[-1]]
+            ax.imshow(self.stat(param, stat), origin='lower', extent=extent, vmin=minVal, vmax=maxVal,
+                      aspect='auto', interpolation='none', **kwargs)
+        return image
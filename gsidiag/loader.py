@@ -0,0 +1,417 @@
+"""
+This module defines the functions used to load sequences of gsi diagnostic
+files (one file, or one ges/anl pair, per analysis cycle).
+"""
+import os
+import re
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .__main__ import read_diag, setcolor
+
+
+def cycleDates(dateIni, dateFin, nHour="06"):
+    """
+    Builds the list of analysis dates between dateIni and dateFin.
+
+    Args:
+        dateIni (str or int): Initial date (YYYYMMDDHH).
+        dateFin (str or int): Final date (YYYYMMDDHH).
+        nHour (str or int): Time interval between cycles, in hours.
+
+    Returns:
+        A list of datetime objects, in date order.
+    """
+    datei = datetime.strptime(str(dateIni), "%Y%m%d%H")
+    datef = datetime.strptime(str(dateFin), "%Y%m%d%H")
+
+    dates = []
+    date  = datei
+    while (date <= datef):
+        dates.append(date)
+        date = date + timedelta(hours=int(nHour))
+
+    return dates
+
+
+class cycleList(list):
+    """
+    A list of read_diag objects, one entry per analysis cycle and in date order.
+    Cycles that could not be read are kept as None, so that the position of
+    each cycle in the list always matches its date.
+
+    Attributes:
+        dates (list): The analysis date of each entry.
+        gaps (dict): The missing cycles, as {date: reason}.
+    """
+    def __init__(self, dates, diags, gaps):
+        super().__init__(diags)
+        self.dates = dates
+        self.gaps  = gaps
+
+
+def cycleItems(cycles, skip=None):
+    """
+    Yields the (date, read_diag) pairs of a set of cycles, reading each cycle only
+    when it is reached. This is the loop of the update methods of the accumulators
+    (diagCube, latlonGrid, diagSketch, innovationCorrelation).
+
+    Args:
+        cycles (iterable): (date, read_diag) pairs, a cycleList or a diagCollection.
+                           The read_diag object may also be a function returning it.
+        skip (function): Called with the date of each cycle; the cycles for which it
+                         returns True (e.g. already added) are not read.
+
+    Missing cycles (None) are skipped.
+    """
+    if hasattr(cycles, 'dates') and not callable(cycles.dates):
+        cycles = [(date, lambda f=f, source=cycles: source[f]) for f, date in enumerate(cycles.dates)]
+
+    for date, diag in cycles:
+        if skip is not None and skip(date):
+            continue
+        if callable(diag):
+            diag = diag()
+        if diag is None:
+            continue
+        print(date.strftime(' Preparing data for: ' + "%Y-%m-%d:%H"))
+        yield date, diag
+
+
+def _readCycle(diagFile, diagFileAnl, kwargs):
+    """
+    Reads one cycle. Runs inside the worker processes of loadCycles.
+
+    The object is detached before returning, since its Fortran handle is only
+    valid inside the process that opened the file. Files that cannot be read are
+    returned as (None, reason).
+    """
+    if not os.path.exists(diagFile):
+        return None, 'File not found: ' + diagFile
+    if diagFileAnl is not None and not os.path.exists(diagFileAnl):
+        return None, 'File not found: ' + diagFileAnl
+
+    try:
+        diag = read_diag(diagFile, diagFileAnl, **kwargs)
+        if diag._FNumber is None or not hasattr(diag, 'obsInfo'):
+            return None, 'Error reading: ' + diagFile
+        return diag.detach(), None
+    except Exception as e:
+        return None, 'Error reading: ' + diagFile + ' (' + str(e) + ')'
+
+
+def _readIsolated(diagFile, diagFileAnl, kwargs):
+    """
+    Reads one cycle in a process of its own, so that a crash of the Fortran module
+    (e.g. on a truncated file) only loses that cycle.
+    """
+    try:
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            return executor.submit(_readCycle, diagFile, diagFileAnl, kwargs).result()
+    except BrokenProcessPool:
+        return None, 'Error reading: ' + diagFile + ' (the reading process crashed)'
+
+
+def _readCycles(files, nWorkers, kwargs):
+    """
+    Reads a list of (ges, anl) files with a pool of nWorkers processes.
+    Returns the (read_diag or None, reason) pairs in the order of files.
+    """
+    if nWorkers is None:
+        nWorkers = os.cpu_count()
+    nWorkers = max(1, min(int(nWorkers), len(files)))
+
+    if nWorkers == 1:
+        return [_readCycle(fges, fanl, kwargs) for fges, fanl in files]
+
+    results = [None] * len(files)
+    crashed = []
+    with ProcessPoolExecutor(max_workers=nWorkers) as executor:
+        futures = [executor.submit(_readCycle, fges, fanl, kwargs) for fges, fanl in files]
+        for i, future in enumerate(futures):
+            try:
+                results[i] = future.result()
+            except BrokenProcessPool:
+                crashed.append(i)
+            except Exception as e:
+                results[i] = (None, 'Error reading: ' + str(e))
+
+    # a worker died and broke the pool: the cycles not read are read again, each in a
+    # process of its own, so that only the cycle that crashed is lost
+    for i in crashed:
+        results[i] = _readIsolated(files[i][0], files[i][1], kwargs)
+
+    return results
+
+
+def loadCycles(template, dateIni, dateFin, nHour="06", templateAnl=None, nWorkers=None, **kwargs):
+    """
+    Reads the diagnostic files of all analysis cycles from dateIni to dateFin,
+    using a pool of worker processes. Each cycle is read by a single worker,
+    so the reading of a long period is limited by the disk and not by one core.
+
+    The file names are built from templates with strftime directives, e.g.:
+
+        template    = '/dataout/%Y%m%d%H/diag_conv_01.%Y%m%d%H'
+        templateAnl = '/dataout/%Y%m%d%H/diag_conv_03.%Y%m%d%H'
+
+    Args:
+        template (str): Path template of the first guess (ges) diagnostic files.
+        dateIni (str or int): Initial date (YYYYMMDDHH).
+        dateFin (str or int): Final date (YYYYMMDDHH).
+        nHour (str or int): Time interval between cycles, in hours.
+        templateAnl (str): Path template of the analysis (anl) diagnostic files, if any.
+        nWorkers (int): Number of worker processes. Defaults to the number of cores;
+                        use 1 to read the cycles in the calling process.
+        **kwargs: Extra arguments passed to read_diag (isisList, zlevs, ...).
+
+    Returns:
+        A cycleList with one read_diag object per cycle. Missing cycles are
+        None and are listed, with the reason, in the gaps attribute.
+
+    Example:
+        gdf_list = gd.loadCycles(template, 2019121000, 2019121118, nWorkers=8)
+        gd.plot_diag.statcount(gdf_list, varName='uv', varType=220, dateIni=2019121000, dateFin=2019121118)
+    """
+    dates = cycleDates(dateIni, dateFin, nHour)
+    files = [date.strftime(template) for date in dates]
+    if templateAnl is None:
+        filesAnl = [None for date in dates]
+    else:
+        filesAnl = [date.strftime(templateAnl) for date in dates]
+
+    results = _readCycles(list(zip(files, filesAnl)), nWorkers, kwargs)
+
+    diags, gaps = [], {}
+    for date, (diag, reason) in zip(dates, results):
+        diags.append(diag)
+        if diag is None:
+            gaps[date] = reason
+            print(setcolor.WARNING + "    >>> No information on this date (" + str(date.strftime("%Y-%m-%d:%H")) + ") <<< " + reason + setcolor.ENDC)
+
+    return cycleList(dates, diags, gaps)
+
+
+# memory of one shapely Point (Python object and GEOS geometry), besides its reference
+# in the geometry column, which memory_usage counts
+GEOMETRY_BYTES = 200
+
+
+def _tableMemory(table):
+    """
+    Returns the size in bytes of the columns and index of a table, with the point
+    geometries of a GeoDataFrame.
+    """
+    total = table.memory_usage(index=True, deep=False).sum()
+    for col in table.columns:
+        if str(table[col].dtype) == 'geometry':
+            total += GEOMETRY_BYTES * table.shape[0]
+    return total
+
+
+def diagMemory(diag):
+    """
+    Estimates the memory held by the tables of a read_diag object.
+
+    Args:
+        diag (read_diag): A read_diag object.
+
+    Returns:
+        The size in bytes of the columns and indexes of its tables, with the point
+        geometries (estimated as GEOMETRY_BYTES each).
+    """
+    if diag is None or getattr(diag, 'obsInfo', None) is None:
+        return 0
+
+    # flat tables of channel-major radiance data are counted only once built
+    obsInfo = diag.obsInfo
+    if hasattr(obsInfo, 'built'):
+        obsInfo = obsInfo.built()
+
+    total = 0
+    for table in obsInfo.values():
+        total += _tableMemory(table)
+    for tables in getattr(diag, 'radInfo', {}).values():
+        for table in tables.values():
+            total += table.memoryUsage()
+    if diag.__dict__.get('_obs') is not None:
+        # the obs table shares the geometries of the tables of obsInfo
+        total += diag._obs.memory_usage(index=True, deep=False).sum()
+
+    return int(total)
+
+
+def _parseMemory(size):
+    """
+    Converts a memory size given as bytes or as a string like '512MB', '4GB' (or '512M',
+    '4G') to bytes.
+    """
+    if size is None or isinstance(size, (int, float)):
+        return size
+
+    units = {'': 1, 'B': 1, 'K': 1024, 'KB': 1024, 'M': 1024**2, 'MB': 1024**2,
+             'G': 1024**3, 'GB': 1024**3, 'T': 1024**4, 'TB': 1024**4}
+    match = re.fullmatch(r'\s*([0-9.]+)\s*([KMGT]?B?)\s*', str(size).upper())
+    if match is None:
+        raise ValueError('Invalid memory size: ' + str(size))
+
+    return int(float(match.group(1)) * units[match.group(2)])
+
+
+class diagCollection(object):
+    """
+    A collection of analysis cycles keyed by date. Each read_diag object is read
+    from the path templates only when the cycle is first used, and the most
+    recently used cycles are kept while their memory stays under maxMemory;
+    the least recently used ones are released and read again when needed.
+
+    The collection can be used wherever the plot_diag functions take a list of
+    read_diag objects. Cycles can be accessed by date (datetime, 'YYYYMMDDHH')
+    or by their position in the period.
+
+    Attributes:
+        dates (list): The analysis dates of the period, in date order.
+        gaps (dict): The missing cycles found so far, as {date: reason}.
+
+    Example:
+        gdf_list = gd.diagCollection(template, 2019120100, 2020022918, templateAnl=templateAnl, maxMemory='8GB')
+        gdf = gdf_list['2019121000']
+        gd.plot_diag.time_series(gdf_list, varName='uv', varType=220, dateIni=2019121000, dateFin=2019121118)
+    """
+    def __init__(self, template, dateIni, dateFin, nHour="06", templateAnl=None, maxMemory=None, **kwargs):
+        self.dates       = cycleDates(dateIni, dateFin, nHour)
+        self.gaps        = {}
+        self.template    = template
+        self.templateAnl = templateAnl
+        self.maxMemory   = _parseMemory(maxMemory)
+        self._kwargs     = kwargs
+        self._cache      = OrderedDict()
+        self._size       = {}
+
+    def _date(self, key):
+        if isinstance(key, datetime):
+            date = key
+        elif isinstance(key, int) and not isinstance(key, bool) and -len(self.dates) <= key < len(self.dates):
+            date = self.dates[key]
+        else:
+            date = datetime.strptime(str(key), "%Y%m%d%H")
+
+        if date not in self.dates:
+            raise KeyError(key)
+
+        return date
+
+    def _files(self, date):
+        fges = date.strftime(self.template)
+        if self.templateAnl is None:
+            return fges, None
+        return fges, date.strftime(self.templateAnl)
+
+    def _store(self, date, diag, reason):
+        if diag is None:
+            self.gaps[date] = reason
+            print(setcolor.WARNING + "    >>> No information on this date (" + str(date.strftime("%Y-%m-%d:%H")) + ") <<< " + reason + setcolor.ENDC)
+            return
+
+        self._cache[date] = diag
+        self._size[date]  = diagMemory(diag)
+        self._evict(keep=date)
+
+    def _evict(self, keep=None):
+        if self.maxMemory is None:
+            return
+
+        while sum(self._size.values()) > self.maxMemory and len(self._cache) > 1:
+            date = next(iter(self._cache))
+            if date == keep:
+                self._cache.move_to_end(date)
+                date = next(iter(self._cache))
+            del self._cache[date]
+            del self._size[date]
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __contains__(self, key):
+        try:
+            self._date(key)
+        except (KeyError, ValueError):
+            return False
+        return True
+
+    def __iter__(self):
+        for date in self.dates:
+            yield self[date]
+
+    def __getitem__(self, key):
+        date = self._date(key)
+
+        if date in self._cache:
+            self._cache.move_to_end(date)
+            return self._cache[date]
+
+        if date in self.gaps:
+            return None
+
+        fges, fanl = self._files(date)
+        diag, reason = _readCycle(fges, fanl, self._kwargs)
+        self._store(date, diag, reason)
+
+        return diag
+
+    def keys(self):
+        """
+        Returns the analysis dates of the collection.
+        """
+        return list(self.dates)
+
+    def items(self):
+        """
+        Iterates over (date, read_diag) pairs, reading the cycles as needed.
+        Missing cycles are returned as None.
+        """
+        for date in self.dates:
+            yield date, self[date]
+
+    def loaded(self):
+        """
+        Returns the dates of the cycles currently held in memory, from the least
+        to the most recently used.
+        """
+        return list(self._cache.keys())
+
+    def memoryUsage(self):
+        """
+        Returns the estimated memory, in bytes, of the cycles held in memory.
+        """
+        return sum(self._size.values())
+
+    def prefetch(self, dates=None, nWorkers=None):
+        """
+        Reads several cycles at once using a pool of worker processes (see loadCycles).
+        Only the cycles not yet in memory are read, and the memory limit still applies.
+
+        Args:
+            dates (list): Dates to be read (default: all dates of the collection).
+            nWorkers (int): Number of worker processes (default: number of cores).
+        """
+        if dates is None:
+            dates = self.dates
+        dates = [self._date(date) for date in dates]
+        dates = [date for date in dates if date not in self._cache and date not in self.gaps]
+        if len(dates) == 0:
+            return
+
+        results = _readCycles([self._files(date) for date in dates], nWorkers, self._kwargs)
+
+        for date, (diag, reason) in zip(dates, results):
+            self._store(date, diag, reason)
+
+    def clear(self):
+        """
+        Releases all cycles held in memory.
+        """
+        self._cache.clear()
+        self._size.clear()
@@ -0,0 +1,188 @@
+"""
+This module defines the compilation of the masks of the obsInfo tables.
+
+A mask is a DataFrame.query expression (e.g. 'iuse == 1 & idqc == 0'). It is parsed
+once into a predicate evaluated on the arrays of the columns it uses (with numexpr,
+when it is installed), instead of being parsed again, and the whole table copied, by
+every DataFrame.query call. The compiled masks are cached by expression, and
+read_diag caches the rows selected by each (variable, mask, region) (see
+read_diag.maskRows), so that the plots, the time series and tocsv reuse them.
+
+Expressions using other features of DataFrame.query (e.g. backticks or methods of
+the columns) are evaluated by DataFrame.eval.
+"""
+import ast
+import io
+import tokenize
+from functools import lru_cache
+
+import numpy as np
+
+from .regions import tableRows
+
+try:
+    import numexpr
+except ImportError:
+    numexpr = None
+
+
+# nodes of the expressions compiled to predicates
+_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Name, ast.Constant, ast.Load,
+          ast.List, ast.Tuple, ast.Call, ast.operator, ast.unaryop, ast.cmpop)
+
+
+def _replaceBooleans(mask):
+    """
+    Replaces & and | by 'and' and 'or', which have the precedence of the operators of
+    DataFrame.query (lower than the comparisons).
+    """
+    tokens = []
+    for tok in tokenize.generate_tokens(io.StringIO(mask).readline):
+        if tok.type == tokenize.OP and tok.string in ('&', '|'):
+            tokens.append((tokenize.NAME, 'and' if tok.string == '&' else 'or'))
+        else:
+            tokens.append((tok.type, tok.string))
+    return tokenize.untokenize(tokens)
+
+
+class _vectorize(ast.NodeTransformer):
+    """
+    Rewrites a parsed mask as an expression of arrays: 'and', 'or' and 'not' become
+    &, | and ~, chained comparisons are split, and 'in' lists become calls to isin.
+    """
+    def visit_BoolOp(self, node):
+        op     = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        values = [self.visit(v) for v in node.values]
+        expr   = values[0]
+        for v in values[1:]:
+            expr = ast.BinOp(left=expr, op=op, right=v)
+        return expr
+
+    def visit_UnaryOp(self, node):
+        node.operand = self.visit(node.operand)
+        if isinstance(node.op, ast.Not):
+            node.op = ast.Invert()
+        return node
+
+    def visit_Compare(self, node):
+        left  = self.visit(node.left)
+        terms = []
+        for op, right in zip(node.ops, node.comparators):
+            right = self.visit(right)
+            if isinstance(op, (ast.In, ast.NotIn)):
+                term = ast.Call(func=ast.Name(id='isin', ctx=ast.Load()), args=[left, right], keywords=[])
+                if isinstance(op, ast.NotIn):
+                    term = ast.UnaryOp(op=ast.Invert(), operand=term)
+            else:
+                term = ast.Compare(left=left, ops=[op], comparators=[right])
+            terms.append(term)
+            left = right
+        return self.visit_BoolOp(ast.BoolOp(op=ast.And(), values=terms)) if len(terms) > 1 else terms[0]
+
+
+class compiledMask(object):
+    """
+    A mask (DataFrame.query expression) compiled to a predicate on the columns of a table.
+
+    Attributes:
+        mask (str): The expression.
+        names (list): The columns (or index levels) used by the expression.
+
+    Example:
+        select = compileMask('iuse == 1 & idqc == 0')
+        table[select(table)]
+    """
+    def __init__(self, mask):
+        self.mask   = mask
+        self.names  = []
+        self._code  = None
+        self._expr  = None
+        try:
+            tree = _vectorize().visit(ast.parse(_replaceBooleans(mask).strip(), mode='eval'))
+            tree = ast.fix_missing_locations(tree)
+        except (SyntaxError, tokenize.TokenError, ValueError):
+            return
+        if not all(isinstance(node, _NODES) for node in ast.walk(tree)):
+            return
+        if any(isinstance(node, ast.Call) and node.func.id != 'isin' for node in ast.walk(tree)):
+            return
+
+        self.names = sorted({node.id for node in ast.walk(tree) if isinstance(node, ast.Name)} - {'isin'})
+        self._code = compile(tree, '<mask>', 'eval')
+        if numexpr is not None and not any(isinstance(node, (ast.Call, ast.List, ast.Tuple)) for node in ast.walk(tree)):
+            self._expr = ast.unparse(tree)
+
+    def _columns(self, table):
+        columns = {}
+        for name in self.names:
+            if name in table.columns:
+                columns[name] = table[name].to_numpy()
+            elif name in table.index.names:
+                columns[name] = table.index.get_level_values(name).to_numpy()
+            else:
+                return None
+        return columns
+
+    def __call__(self, table):
+        """
+        Returns the boolean array of the rows of table selected by the mask.
+        """
+        columns = None if self._code is None else self._columns(table)
+        if columns is None:
+            # not compiled, or names that are not columns: left to pandas
+            return np.asarray(table.eval(self.mask), dtype=bool)
+
+        if self._expr is not None:
+            result = numexpr.evaluate(self._expr, local_dict=columns)
+        else:
+            result = eval(self._code, {'__builtins__': {}, 'isin': np.isin}, columns)
+        return np.broadcast_to(np.asarray(result, dtype=bool), (table.shape[0],))
+
+
+@lru_cache(maxsize=256)
+def compileMask(mask):
+    """
+    Returns the compiledMask of an expression (compiled once per expression).
+    """
+    return compiledMask(mask)
+
+
+def maskTable(table, mask=None):
+    """
+    Returns the rows of table selected by mask (as DataFrame.query), or table if mask
+    is None.
+    """
+    if mask is None:
+        return table
+    return table[compileMask(mask)(table)]
+
+
+def selectRows(diag, varName, mask=None, region=None):
+    """
+    Returns the positions of the rows of diag.obsInfo[varName] selected by mask and
+    inside region, using the cached rows of read_diag objects (see read_diag.maskRows),
+    or None if there is neither mask nor region.
+    """
+    if mask is None and region is None:
+        return None
+    if hasattr(diag, 'maskRows'):
+        return diag.maskRows(varName, mask, region)
+
+    rows = None if region is None else tableRows(diag, varName, region)
+    if mask is None:
+        return rows
+    table = diag.obsInfo[varName]
+    if rows is None:
+        return np.flatnonzero(compileMask(mask)(table))
+    return rows[compileMask(mask)(table.iloc[rows])]
+
+
+def selectTable(diag, varName, mask=None, region=None):
+    """
+    Returns the table diag.obsInfo[varName], restricted to the rows selected by mask
+    and inside region.
+    """
+    rows = selectRows(diag, varName, mask, region)
+    if rows is None:
+        return diag.obsInfo[varName]
+    return diag.obsInfo[varName].iloc[rows]
@@ -0,0 +1,164 @@
+"""
+This module defines mergeable accumulators of the number of values, the mean and the
+sum of squared deviations (M2) of a quantity, following Welford's algorithm and its
+pairwise form by Chan et al.
+
+The accumulators can be updated in chunks of values, merged across levels, cycles or
+worker processes, and give the exact mean and standard deviation of all the values
+without keeping them. Cells without values have count 0 and NaN mean and M2.
+"""
+import numpy as np
+
+
+class moments(object):
+    """
+    Arrays of (count, mean, M2) accumulators, one per cell.
+
+    Attributes:
+        count (ndarray): The number of values of each cell.
+        mean (ndarray): The mean of the values (NaN where count is 0).
+        m2 (ndarray): The sum of the squared deviations from the mean (NaN where count is 0).
+
+    Example:
+        acc = moments.empty(len(levs))
+        for chunk in chunks:
+            acc.update(chunk['omf'], position=chunk['ilev'])
+        mean, std, count = acc.masked()
+    """
+    def __init__(self, count, mean, m2):
+        self.count = np.asarray(count, dtype=np.int64)
+        self.mean  = np.asarray(mean, dtype=np.float64)
+        self.m2    = np.asarray(m2, dtype=np.float64)
+
+    @classmethod
+    def empty(cls, shape=()):
+        """
+        Returns accumulators without values.
+        """
+        return cls(np.zeros(shape, dtype=np.int64), np.full(shape, np.nan), np.full(shape, np.nan))
+
+    @classmethod
+    def fromValues(cls, values, position=None, size=None):
+        """
+        Builds the accumulators of a set of values (NaN values are skipped).
+
+        Args:
+            values (array): The values.
+            position (array): The cell of each value (integers from 0 to size-1).
+                              If None, all values go to a single cell.
+            size (int): The number of cells. Defaults to max(position)+1.
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(-1)
+        if position is None:
+            position = np.zeros(values.shape, dtype=np.int64)
+            size = 1
+        else:
+            position = np.asarray(position, dtype=np.int64).reshape(-1)
+            if size is None:
+                size = int(position.max()) + 1 if position.size > 0 else 0
+
+        valid    = np.isfinite(values)
+        values   = values[valid]
+        position = position[valid]
+
+        count = np.bincount(position, minlength=size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(count > 0, np.bincount(position, weights=values, minlength=size) / count, np.nan)
+        dev = values - mean[position]
+        m2  = np.where(count > 0, np.bincount(position, weights=dev*dev, minlength=size), np.nan)
+
+        return cls(count, mean, m2)
+
+    def merge(self, other):
+        """
+        Returns the accumulators of the union of the values of self and other
+        (cell by cell).
+        """
+        count = self.count + other.count
+        na, nb = self.count, other.count
+        ma = np.where(na > 0, self.mean, 0.0)
+        mb = np.where(nb > 0, other.mean, 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            delta = mb - ma
+            mean  = np.where(count > 0, ma + delta * nb / count, np.nan)
+            m2    = np.where(count > 0, np.where(na > 0, self.m2, 0.0) + np.where(nb > 0, other.m2, 0.0)
+                                        + delta * delta * na * nb / count, np.nan)
+
+        return moments(count, mean, m2)
+
+    __add__ = merge
+
+    def update(self, values, position=None):
+        """
+        Adds a chunk of values to the accumulators (in place).
+
+        Args:
+            values (array): The values.
+            position (array): The flat index of the cell of each value (see fromValues).
+                              It may be None for single-cell accumulators.
+        """
+        chunk = moments.fromValues(values, position, self.count.size)
+        chunk = moments(chunk.count.reshape(self.count.shape), chunk.mean.reshape(self.count.shape),
+                        chunk.m2.reshape(self.count.shape))
+        new = self.merge(chunk)
+        self.count, self.mean, self.m2 = new.count, new.mean, new.m2
+        return self
+
+    def sum(self, axis=None, where=None):
+        """
+        Merges the accumulators along an axis.
+
+        Args:
+            axis (int): The axis to be merged. If None, all cells are merged.
+            where (array): A boolean array selecting the cells to be merged along axis.
+        """
+        count = self.count
+        mean  = np.where(count > 0, self.mean, 0.0)
+        m2    = np.where(count > 0, self.m2, 0.0)
+        if where is not None:
+            if axis is not None:
+                shape = [1] * count.ndim
+                shape[axis] = -1
+                where = np.asarray(where).reshape(shape)
+            count = np.where(where, count, 0)
+
+        n = count.sum(axis=axis)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            total = (count * mean).sum(axis=axis)
+            avg   = np.where(n > 0, total / n, np.nan)
+            dev   = mean - (np.expand_dims(avg, axis) if axis is not None else avg)
+            m2    = np.where(n > 0, (np.where(count > 0, m2, 0.0) + count * dev * dev).sum(axis=axis), np.nan)
+
+        return moments(n, avg, m2)
+
+    def __getitem__(self, key):
+        return moments(self.count[key], self.mean[key], self.m2[key])
+
+    @property
+    def var(self):
+        """
+        The population variance (as np.var) of each cell (NaN where count is 0).
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 0, self.m2 / self.count, np.nan)
+
+    @property
+    def std(self):
+        """
+        The population standard deviation (as np.std) of each cell (NaN where count is 0).
+        """
+        return np.sqrt(np.maximum(self.var, 0.0))
+
+    def masked(self):
+        """
+        Returns the mean, standard deviation and count as masked arrays, masked
+        where there are no values.
+        """
+        missing = self.count == 0
+        return (np.ma.masked_array(self.mean, missing),
+                np.ma.masked_array(self.std, missing),
+                np.ma.masked_array(self.count, missing))
+
+
+# the name of the class in the package (gsidiag.moments is this module)
+runningMoments = moments
@@ -0,0 +1,195 @@
+"""
+This module defines the instrumentation of the read path of read_diag.
+
+When read_diag is created with profile=True (or with a function, or when a hook was
+added with addHook), the stages of the reading of the files are timed, for each
+variable and kx (or SatId):
+
+    open       d2p.open: the Fortran reading of the files and the building of the
+               linked lists of the observations (bytes: the size of the files)
+    fill       d2p.getobs: the table of one kx filled by the Fortran module
+               (bytes: the size of the table)
+    transfer   the copy of the Fortran table to a DataFrame (.copy().T)
+    replace    the conversion of the undefined values to NaN
+    geometry   the construction of the GeoDataFrame
+    concat     the concatenation of the tables of a variable
+
+Each stage records its wall time, the bytes read or transferred, the growth of the
+peak resident memory of the process and, with memory=True, the peak of the memory
+allocated by Python and numpy during the stage (tracemalloc; the memory allocated by
+the Fortran module is only seen by the resident memory).
+
+The report is kept in read_diag.profile (see readProfile), and the hooks are called
+with it when the files are read.
+
+Example:
+    gdf = gd.read_diag(file, fileAnl, profile=True)
+    print(gdf.profile)                  # time, bytes and memory of each stage
+    gdf.profile.table()                 # one row per stage, variable and kx
+
+    gd.addHook(lambda p: log.info(p.summary().to_dict()))   # all the reads of the process
+"""
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+_HOOKS = []
+
+
+def addHook(function):
+    """
+    Adds a function called with the readProfile of every read_diag object created
+    afterwards; while there are hooks, all the reads are profiled.
+    """
+    if function not in _HOOKS:
+        _HOOKS.append(function)
+
+
+def removeHook(function):
+    """
+    Removes a function added by addHook.
+    """
+    if function in _HOOKS:
+        _HOOKS.remove(function)
+
+
+def _maxRSS():
+    """
+    Returns the peak resident memory of the process, in bytes (0 if unknown).
+    """
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def fileBytes(*files):
+    """
+    Returns the total size of the files (None entries are skipped).
+    """
+    return sum(os.path.getsize(f) for f in files if f is not None and os.path.isfile(f))
+
+
+class readProfile(object):
+    """
+    The time, bytes and memory of the stages of the reading of a diagnostics file.
+
+    Attributes:
+        records (list): One dict per stage, variable and kx (or SatId), with the keys
+                        stage, var, type, seconds, bytes, rss (growth of the peak
+                        resident memory) and peak (peak of the traced memory, or None).
+        files (list): The files read.
+        total (float): The wall time of the whole read, in seconds.
+        enabled (bool): False for the profile of an unprofiled read (no records).
+    """
+    def __init__(self, files=(), enabled=True, memory=False, hooks=()):
+        self.files   = [f for f in files if f is not None]
+        self.records = []
+        self.total   = None
+        self.enabled = enabled
+        self._memory = enabled and memory
+        self._hooks  = list(hooks)
+        self._traced = False
+        self._start  = time.perf_counter()
+        if self._memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._traced = True
+
+    def stage(self, stage, var=None, vType=None, nbytes=None):
+        """
+        Returns a context manager timing one stage. It yields the record of the stage,
+        whose 'bytes' may be set inside the block.
+        """
+        if not self.enabled:
+            return nullcontext({})
+        return self._stage(stage, var, vType, nbytes)
+
+    @contextmanager
+    def _stage(self, stage, var, vType, nbytes):
+        record = dict(stage=stage, var=var, type=vType, seconds=0.0, bytes=nbytes, rss=0, peak=None)
+        rss = _maxRSS()
+        if self._memory:
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            record['rss']     = _maxRSS() - rss
+            if self._memory:
+                record['peak'] = max(tracemalloc.get_traced_memory()[1] - current, 0)
+            self.records.append(record)
+
+    def finish(self):
+        """
+        Ends the profile: stops the tracing of the memory, if it was started by the
+        profile, and calls the hooks.
+        """
+        if not self.enabled or self.total is not None:
+            return self
+        self.total = time.perf_counter() - self._start
+        if self._traced:
+            tracemalloc.stop()
+            self._traced = False
+        for hook in self._hooks:
+            hook(self)
+        return self
+
+    def table(self):
+        """
+        Returns the records in a DataFrame (one row per stage, variable and kx).
+        """
+        import pandas as pd
+        return pd.DataFrame(self.records, columns=['stage', 'var', 'type', 'seconds', 'bytes', 'rss', 'peak'])
+
+    def summary(self, by='stage'):
+        """
+        Returns the time, bytes and memory summed (peak: maximum) by stage, or by
+        ['var', 'stage'], ['var', 'type'], etc.
+        """
+        table = self.table()
+        summary = table.groupby(by, sort=False).agg(seconds=('seconds', 'sum'), bytes=('bytes', 'sum'),
+                                                    rss=('rss', 'sum'), peak=('peak', 'max'), calls=('seconds', 'size'))
+        if by == 'stage' and self.total is not None:
+            summary['fraction'] = summary['seconds'] / self.total
+        return summary
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_hooks'] = []
+        return state
+
+    def __repr__(self):
+        if not self.enabled:
+            return '<readProfile: disabled>'
+        lines = ['readProfile: {} ({:.3f} s)'.format(', '.join(os.path.basename(f) for f in self.files), self.total or 0.0)]
+        for stage, row in self.summary().iterrows():
+            line = '  {:<10s} {:9.4f} s'.format(stage, row['seconds'])
+            if row['bytes'] > 0:
+                line += ' {:10.1f} MB'.format(row['bytes'] / 2**20)
+            if row['rss'] > 0:
+                line += '   rss +{:.1f} MB'.format(row['rss'] / 2**20)
+            if row['peak'] == row['peak'] and row['peak'] is not None:
+                line += '   peak {:.1f} MB'.format(row['peak'] / 2**20)
+            lines.append(line)
+        return '\n'.join(lines)
+
+
+def profiler(files, profile=False, memory=False):
+    """
+    Returns the readProfile of a read: enabled if profile is True or a function (then
+    called with the profile as a hook), or if hooks were added with addHook.
+    """
+    hooks = list(_HOOKS)
+    if callable(profile):
+        hooks.append(profile)
+    enabled = bool(profile) or len(hooks) > 0
+    return readProfile(files, enabled=enabled, memory=memory, hooks=hooks)
@@ -0,0 +1,156 @@
+"""
+This module defines the classification of the observations of a gsi diagnostic
+file by their quality control status (assimilated, monitored, rejected).
+
+The category of every observation is computed in a single vectorized pass over
+the iuse and idqc columns, and the counts and map subsets used by statcount are
+taken from this array of category codes.
+"""
+import numpy as np
+
+
+# category codes
+UNCLASSIFIED     = -1
+ASSIMILATED      = 0
+MONITORED        = 1
+REJECTED         = 2
+MONITORED_ASSIM  = 3   # radiance: monitored, would be assimilated
+MONITORED_REJECT = 4   # radiance: monitored, would be rejected
+
+NCATEGORIES = 5
+
+CATEGORY_NAMES = {ASSIMILATED     : 'Assimilated',
+                  MONITORED       : 'Monitored',
+                  REJECTED        : 'Rejected',
+                  MONITORED_ASSIM : 'Monitored-Assimilated',
+                  MONITORED_REJECT: 'Monitored-Rejected'}
+
+
+def limQm(varName, noiqc=False):
+    """
+    Returns the lim_qm threshold of the prepbufr QC markers used by GSI.
+
+    Args:
+        varName (str): The variable (ps has its own threshold without OI QC).
+        noiqc (bool): The noiqc GSI namelist parameter.
+
+    Returns:
+        The lim_qm value: 4 with OI QC; 8 (7 for ps) without OI QC.
+    """
+    if noiqc:
+        if varName == 'ps':
+            return 7
+        return 8
+    return 4
+
+
+def classifyConv(iuse, idqc, lim_qm):
+    """
+    Classifies conventional observations by their use flag and prepbufr QC marker:
+
+        Assimilated: iuse == 1
+        Monitored  : iuse == -1 and lim_qm <= idqc <= 15
+        Rejected   : iuse == -1 and (idqc > 15 or idqc < lim_qm)
+
+    Args:
+        iuse (array): The iuse column.
+        idqc (array): The idqc column.
+        lim_qm (int): The lim_qm threshold (see limQm).
+
+    Returns:
+        An int8 array with the category code of each observation.
+    """
+    iuse = np.asarray(iuse)
+    idqc = np.asarray(idqc)
+
+    codes = np.full(iuse.shape, UNCLASSIFIED, dtype=np.int8)
+    notUsed = iuse == -1
+    monit = (idqc >= lim_qm) & (idqc <= 15)
+    rejei = (idqc > 15) | (idqc <= 0) | ((idqc > 0) & (idqc < lim_qm))
+
+    codes[iuse == 1] = ASSIMILATED
+    codes[notUsed & monit] = MONITORED
+    codes[notUsed & rejei] = REJECTED
+
+    return codes
+
+
+def classifyRad(iuse, idqc):
+    """
+    Classifies radiance observations by their channel use flag and QC flag:
+
+        Assimilated          : iuse >= 1 and idqc == 0
+        Monitored-Assimilated: -1 <= iuse < 1 and idqc == 0
+        Monitored-Rejected   : -1 <= iuse < 1 and idqc != 0
+        Rejected             : iuse >= 1 and idqc != 0
+
+    Args:
+        iuse (array): The iuse column.
+        idqc (array): The idqc column.
+
+    Returns:
+        An int8 array with the category code of each observation.
+    """
+    iuse = np.asarray(iuse)
+    idqc = np.asarray(idqc)
+
+    codes = np.full(iuse.shape, UNCLASSIFIED, dtype=np.int8)
+    used  = iuse >= 1
+    monit = (iuse >= -1) & (iuse < 1)
+    good  = idqc == 0
+
+    codes[used & good]   = ASSIMILATED
+    codes[used & ~good]  = REJECTED
+    codes[monit & good]  = MONITORED_ASSIM
+    codes[monit & ~good] = MONITORED_REJECT
+
+    return codes
+
+
+def classify(table, varName=None, noiqc=False):
+    """
+    Classifies the observations of a table of obsInfo. Radiance tables (with a
+    nchan column) follow the classifyRad rules, the others the classifyConv ones.
+
+    Args:
+        table (DataFrame): The observations (e.g. gdf.obsInfo['uv'].loc[220]).
+        varName (str): The variable, used to choose lim_qm for conventional data.
+        noiqc (bool): The noiqc GSI namelist parameter.
+
+    Returns:
+        An int8 array with the category code of each row of the table.
+    """
+    iuse = table['iuse'].to_numpy()
+    idqc = table['idqc'].to_numpy()
+
+    if 'nchan' in table.columns:
+        return classifyRad(iuse, idqc)
+
+    return classifyConv(iuse, idqc, limQm(varName, noiqc))
+
+
+def countCategories(codes, channels=None):
+    """
+    Counts the observations of each category.
+
+    Args:
+        codes (array): The category codes returned by classify.
+        channels (array): The channel of each observation. If given, the counts
+                          are split by channel.
+
+    Returns:
+        An array with NCATEGORIES counts, indexed by category code, or a dict
+        {channel: counts} if channels is given.
+    """
+    codes = np.asarray(codes)
+    valid = codes >= 0
+
+    if channels is None:
+        return np.bincount(codes[valid], minlength=NCATEGORIES)
+
+    channels = np.asarray(channels)[valid].astype(np.int64)
+    chans, position = np.unique(channels, return_inverse=True)
+    counts = np.bincount(position * NCATEGORIES + codes[valid],
+                         minlength=len(chans) * NCATEGORIES).reshape(len(chans), NCATEGORIES)
+
+    return {int(ch): counts[i] for i, ch in enumerate(chans)}
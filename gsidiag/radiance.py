@@ -0,0 +1,219 @@
+"""
+This module defines the channel-major layout of radiance diagnostics.
+
+In the flat tables of obsInfo each spot (field of view) of a sensor is repeated
+once per channel, together with its lat, lon, elev, time and point geometry. In
+the channel-major layout each spot is stored once, and the channel dependent
+quantities are (spots x channels) arrays; the flat table is derived on demand.
+"""
+from collections.abc import MutableMapping
+
+import numpy as np
+import pandas as pd
+
+from .moments import moments
+from .cube import statsFrame, desroziersSums
+
+# columns of the flat radiance tables (see read_diag)
+SPOT_COLUMNS    = ['lat', 'lon', 'elev', 'time']
+CHANNEL_COLUMNS = ['nchan', 'iuse']
+DATA_COLUMNS    = ['idqc', 'inverr', 'oer', 'obs', 'omf', 'omf_nobc', 'emiss',
+                   'oma', 'oma_nobc', 'imp', 'dfs']
+
+
+class radTable(object):
+    """
+    The observations of one sensor/platform in channel-major layout.
+
+    Attributes:
+        spots (DataFrame): The spot columns (lat, lon, elev, time), one row per spot.
+        channels (DataFrame): The channel columns (nchan, iuse), one row per channel.
+        data (dict): The channel dependent columns (obs, omf, omf_nobc, idqc, inverr,
+                     emiss, ...), as (spots x channels) arrays.
+        columns (list): The columns of the flat table, in the order of read_diag.
+    """
+    def __init__(self, spots, channels, data, columns):
+        self.spots    = spots
+        self.channels = channels
+        self.data     = data
+        self.columns  = columns
+
+    @classmethod
+    def fromArray(cls, array, columns, undef=None):
+        """
+        Builds a radTable from the (observations x columns) array returned by the
+        Fortran module, where the channels of each spot are consecutive rows.
+
+        Args:
+            array (ndarray): The flat array of observations.
+            columns (list): The names of the columns of array.
+            undef (float): The undefined value, converted to NaN.
+
+        Raises:
+            ValueError: if the rows are not the same sequence of channels repeated for
+                        every spot (the flat table must be used then).
+        """
+        array = np.asarray(array)
+        col   = {c: i for i, c in enumerate(columns)}
+
+        nchan = array[:, col['nchan']]
+        if array.shape[0] == 0:
+            nChanl = 0
+        else:
+            repeat = np.flatnonzero(nchan == nchan[0])
+            nChanl = int(repeat[1]) if len(repeat) > 1 else array.shape[0]
+        nSpots = array.shape[0] // nChanl if nChanl > 0 else 0
+
+        if nChanl * nSpots != array.shape[0] or not np.array_equal(nchan, np.tile(nchan[:nChanl], nSpots)):
+            raise ValueError('the observations are not in channel-major order')
+
+        cube = array.reshape(nSpots, nChanl, len(columns))
+
+        def _undef(a):
+            if undef is not None:
+                a = np.where(a == undef, np.nan, a).astype(array.dtype)
+            return np.ascontiguousarray(a)
+
+        spots    = pd.DataFrame({c: _undef(cube[:, 0, col[c]]) for c in SPOT_COLUMNS})
+        channels = pd.DataFrame({c: _undef(cube[0, :, col[c]]) for c in CHANNEL_COLUMNS})
+        data     = {c: _undef(cube[:, :, col[c]]) for c in DATA_COLUMNS if c in col}
+
+        return cls(spots, channels, data, list(columns))
+
+    @property
+    def nSpots(self):
+        return self.spots.shape[0]
+
+    @property
+    def nChanl(self):
+        return self.channels.shape[0]
+
+    def memoryUsage(self):
+        """
+        Returns the memory, in bytes, held by the arrays of the table.
+        """
+        total  = self.spots.memory_usage(index=False).sum()
+        total += self.channels.memory_usage(index=False).sum()
+        total += sum(a.nbytes for a in self.data.values())
+        return int(total)
+
+    def channel(self, nchan):
+        """
+        Returns the spots of one channel as a table with the spot columns and the
+        channel dependent columns of that channel.
+
+        Args:
+            nchan (int): The channel number (as in the nchan column).
+        """
+        k = np.flatnonzero(self.channels['nchan'].to_numpy() == nchan)
+        if len(k) == 0:
+            raise KeyError(nchan)
+        k = k[0]
+
+        d = self.spots.copy()
+        d['nchan'] = self.channels['nchan'].iat[k]
+        d['iuse']  = self.channels['iuse'].iat[k]
+        for c, a in self.data.items():
+            d[c] = a[:, k]
+
+        return d[[c for c in self.columns if c in d.columns]]
+
+    def flat(self):
+        """
+        Returns the flat table (one row per spot and channel), with the columns
+        in the order of the read_diag tables and without geometry.
+        """
+        d = {}
+        for c in self.columns:
+            if c in SPOT_COLUMNS:
+                d[c] = np.repeat(self.spots[c].to_numpy(), self.nChanl)
+            elif c in CHANNEL_COLUMNS:
+                d[c] = np.tile(self.channels[c].to_numpy(), self.nSpots)
+            else:
+                d[c] = self.data[c].reshape(-1)
+
+        return pd.DataFrame(d, columns=self.columns)
+
+    def reduce(self, satId):
+        """
+        Reduces the table to the per-channel accumulators of a diagCube (see
+        gsidiag.cube.reduceCycle), without building the flat table.
+
+        Returns:
+            The statistics indexed by (varType, lev) and the number of observations
+            indexed by (varType, lev, iuse, idqc).
+        """
+        nchan = np.trunc(self.channels['nchan'].to_numpy(dtype=np.float64)).astype(np.int64)
+
+        values = {'nobs': np.full(self.nChanl, self.nSpots, dtype=np.int64)}
+        for q in ['omf', 'oma', 'imp', 'dfs']:
+            if q in self.data:
+                value = self.data[q].astype(np.float64)
+            else:
+                value = np.full((self.nSpots, self.nChanl), np.nan)
+            values[q] = moments.fromValues(value, np.tile(np.arange(self.nChanl), self.nSpots), self.nChanl)
+            if q == 'imp':
+                values['imp_neg'] = (value < 0).sum(axis=0)
+
+        def _column(q):
+            if q in self.data:
+                return self.data[q].reshape(-1)
+            return np.full(self.nSpots * self.nChanl, np.nan)
+
+        values['des'] = desroziersSums(_column('omf'), _column('oma'), _column('oer'),
+                                       np.tile(np.arange(self.nChanl), self.nSpots), self.nChanl)
+
+        index = pd.MultiIndex.from_arrays([np.full(self.nChanl, str(satId)), nchan], names=['varType', 'lev'])
+        stats = statsFrame(index, values).sort_index()
+
+        iuse = np.nan_to_num(self.channels['iuse'].to_numpy(dtype=np.float64), nan=-999).astype(np.int64)
+        idqc = np.nan_to_num(self.data['idqc'].astype(np.float64), nan=-999).astype(np.int64)
+        qc = pd.DataFrame({'varType': str(satId),
+                           'lev'    : np.tile(nchan, self.nSpots),
+                           'iuse'   : np.tile(iuse, self.nSpots),
+                           'idqc'   : idqc.reshape(-1)})
+        qc = qc.groupby(['varType', 'lev', 'iuse', 'idqc'], sort=True).size().rename('count')
+
+        return stats, qc
+
+
+class lazyTables(MutableMapping):
+    """
+    A dict of tables where some tables are built only when first accessed.
+    It is used as obsInfo of read_diag objects with channel-major radiance data,
+    so that the flat tables are only built if some function needs them.
+    """
+    def __init__(self, tables=None, builders=None):
+        self._tables   = dict(tables or {})
+        self._builders = dict(builders or {})
+
+    def __getitem__(self, key):
+        if key not in self._tables and key in self._builders:
+            self._tables[key] = self._builders.pop(key)()
+        return self._tables[key]
+
+    def __setitem__(self, key, value):
+        self._builders.pop(key, None)
+        self._tables[key] = value
+
+    def __delitem__(self, key):
+        if key in self._builders:
+            del self._builders[key]
+        else:
+            del self._tables[key]
+
+    def __iter__(self):
+        for key in list(self._tables) + [k for k in self._builders if k not in self._tables]:
+            yield key
+
+    def __len__(self):
+        return len(set(self._tables) | set(self._builders))
+
+    def __contains__(self, key):
+        return key in self._tables or key in self._builders
+
+    def built(self):
+        """
+        Returns the tables already built, as a dict.
+        """
+        return dict(self._tables)
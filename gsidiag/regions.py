@@ -0,0 +1,167 @@
+"""
+This module defines named regions and a spatial index of the observations of a
+table, used to select the observations of a region without testing every row.
+
+The index buckets the observations in cells of a regular grid over the normalized
+lon/lat. A region is answered by taking the rows of the cells it covers, and only the
+rows of the cells on its border are tested against its limits. The rows of each
+region are cached by read_diag, so that plots, statcount and the time series reuse
+them.
+"""
+import numpy as np
+
+
+# [Loni, Lati, Lonf, Latf] (Loni > Lonf crosses the dateline)
+REGIONS = {'Globe'          : [-180.0, -90.0, 180.0,  90.0],
+           'NorthHemisphere': [-180.0,   0.0, 180.0,  90.0],
+           'SouthHemisphere': [-180.0, -90.0, 180.0,   0.0],
+           'NH'             : [-180.0,  20.0, 180.0,  90.0],   # northern extratropics
+           'SH'             : [-180.0, -90.0, 180.0, -20.0],   # southern extratropics
+           'Tropics'        : [-180.0, -20.0, 180.0,  20.0],
+           'Arctic'         : [-180.0,  60.0, 180.0,  90.0],
+           'Antarctic'      : [-180.0, -90.0, 180.0, -60.0],
+           'SouthAmerica'   : [ -85.0, -60.0, -30.0,  15.0],
+           'NorthAmerica'   : [-170.0,  15.0, -50.0,  75.0],
+           'Europe'         : [ -15.0,  35.0,  45.0,  72.0],
+           'Africa'         : [ -20.0, -37.0,  55.0,  38.0],
+           'Asia'           : [  60.0,   0.0, 150.0,  60.0],
+           'Australia'      : [ 110.0, -45.0, 160.0, -10.0],
+           'Pacific'        : [ 150.0, -60.0, -70.0,  60.0]}
+
+
+def getRegion(region):
+    """
+    Returns the limits [Loni, Lati, Lonf, Latf] of a region, given by its name (see
+    REGIONS) or by its limits. Longitudes are normalized to [-180, 180].
+    """
+    if isinstance(region, str):
+        if region not in REGIONS:
+            raise KeyError('Unknown region: ' + region + '. Available regions: ' + ', '.join(REGIONS))
+        return list(REGIONS[region])
+
+    loni, lati, lonf, latf = [float(a) for a in region]
+    if lonf - loni < 360.0:
+        loni = (loni + 180.0) % 360.0 - 180.0
+        lonf = (lonf + 180.0) % 360.0 - 180.0 if lonf != 180.0 else 180.0
+    else:
+        loni, lonf = -180.0, 180.0
+    return [loni, lati, lonf, latf]
+
+
+def regionKey(region):
+    """
+    Returns a string identifying a region (its name, or its limits).
+    """
+    if region is None:
+        return ''
+    if isinstance(region, str):
+        return region
+    return ','.join('%g' % a for a in getRegion(region))
+
+
+def _inside(lat, lon, area):
+    loni, lati, lonf, latf = area
+    inLat = (lat >= lati) & (lat <= latf)
+    if loni <= lonf:
+        return inLat & (lon >= loni) & (lon <= lonf)
+    return inLat & ((lon >= loni) | (lon <= lonf))
+
+
+class spatialIndex(object):
+    """
+    The observations of a table bucketed by the cells of a regular lon/lat grid.
+
+    Attributes:
+        res (float): The size of the cells (degrees).
+
+    Example:
+        index = spatialIndex(table['lat'], table['lon'])
+        rows  = index.select('SouthAmerica')
+        table.iloc[rows]
+    """
+    def __init__(self, lat, lon, res=5.0):
+        self.res  = float(res)
+        self._lat = np.asarray(lat, dtype=np.float64)
+        self._lon = (np.asarray(lon, dtype=np.float64) + 180.0) % 360.0 - 180.0
+
+        self._nlon = int(np.ceil(360.0 / self.res))
+        self._nlat = int(np.ceil(180.0 / self.res))
+
+        i = np.clip(np.floor((self._lat + 90.0) / self.res), 0, self._nlat - 1)
+        j = np.clip(np.floor((self._lon + 180.0) / self.res), 0, self._nlon - 1)
+        cell = np.where(np.isfinite(i) & np.isfinite(j), np.nan_to_num(i) * self._nlon + np.nan_to_num(j), -1).astype(np.int64)
+
+        self._order = np.argsort(cell, kind='stable')
+        self._bound = np.searchsorted(cell[self._order], np.arange(-1, self._nlat * self._nlon + 1))
+
+    def __len__(self):
+        return len(self._lat)
+
+    def _cells(self, area):
+        loni, lati, lonf, latf = area
+        i0 = int(np.clip(np.floor((lati + 90.0) / self.res), 0, self._nlat - 1))
+        i1 = int(np.clip(np.floor((latf + 90.0) / self.res), 0, self._nlat - 1))
+        j0 = int(np.clip(np.floor((loni + 180.0) / self.res), 0, self._nlon - 1))
+        j1 = int(np.clip(np.floor((lonf + 180.0) / self.res), 0, self._nlon - 1))
+
+        rows = np.arange(i0, i1 + 1)
+        if loni <= lonf:
+            cols = np.arange(j0, j1 + 1)
+        else:
+            cols = np.concatenate([np.arange(j0, self._nlon), np.arange(0, j1 + 1)])
+        return rows, cols
+
+    def select(self, region):
+        """
+        Returns the sorted positions (as used by DataFrame.iloc) of the observations
+        inside a region, given by name (see REGIONS) or by its limits
+        [Loni, Lati, Lonf, Latf].
+        """
+        area = getRegion(region)
+        rows, cols = self._cells(area)
+        if len(rows) == 0 or len(cols) == 0:
+            return np.array([], dtype=np.int64)
+
+        # cells inside the region are taken whole; the cells of its border are tested
+        border = np.zeros((len(rows), len(cols)), dtype=bool)
+        border[[0, -1], :] = True
+        border[:, [0, -1]] = True
+
+        cells = (rows[:, None] * self._nlon + cols[None, :])
+        first = self._bound[cells + 1]
+        last  = self._bound[cells + 2]
+
+        def _gather(sel):
+            f, l = first[sel], last[sel]
+            n = l - f
+            if n.sum() == 0:
+                return np.array([], dtype=np.int64)
+            return self._order[np.repeat(f - np.cumsum(n) + n, n) + np.arange(n.sum())]
+
+        inner = _gather(~border)
+        edge  = _gather(border)
+        edge  = edge[_inside(self._lat[edge], self._lon[edge], area)]
+
+        return np.sort(np.concatenate([inner, edge]))
+
+
+def tableRows(diag, varName, region):
+    """
+    Returns the positions of the rows of diag.obsInfo[varName] inside region, using
+    the cached rows of read_diag objects (see read_diag.regionRows).
+    """
+    if hasattr(diag, 'regionRows'):
+        return diag.regionRows(varName, region)
+    table = diag.obsInfo[varName]
+    return spatialIndex(table['lat'].to_numpy(), table['lon'].to_numpy()).select(region)
+
+
+def regionTable(diag, varName, region=None):
+    """
+    Returns the table diag.obsInfo[varName], restricted to the observations of region
+    (the whole table if region is None).
+    """
+    table = diag.obsInfo[varName]
+    if region is None:
+        return table
+    return table.iloc[tableRows(diag, varName, region)]
@@ -0,0 +1,113 @@
+"""
+This module defines the rendering of batches of figures.
+
+The plot functions first prepare the data of every figure and describe each figure
+as a job, a (function, args, kwargs) tuple where function draws and saves one
+figure. The jobs are then rendered in the calling process, or sent to a pool of
+worker processes using the Agg backend, so that large sets of figures scale with
+the number of cores. The figures opened by each job are closed as soon as the job
+ends, and each job runs with its own copy of the matplotlib settings, so that the
+figures do not depend on the order in which they are drawn. A job that fails does
+not stop the others, but the batch raises an error once all the jobs are done.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .__main__ import setcolor
+
+
+def _initWorker(rc):
+    """
+    Prepares a worker process: non-interactive backend and the matplotlib settings
+    of the calling process.
+    """
+    import matplotlib as mpl
+
+    mpl.use('Agg', force=True)
+    mpl.rcParams.update(rc)
+
+
+def _renderJob(job, close=True):
+    """
+    Draws one figure. Returns None, or the error message if the figure failed.
+    """
+    import matplotlib as mpl
+    import matplotlib.pyplot as plt
+
+    function, args, kwargs = job
+    opened = set(plt.get_fignums())
+    try:
+        with mpl.rc_context():
+            function(*args, **kwargs)
+        return None
+    except Exception as e:
+        return str(e)
+    finally:
+        if close:
+            for num in set(plt.get_fignums()) - opened:
+                plt.close(num)
+
+
+def _jobName(job):
+    """
+    Returns the figure file of a job (its first argument with an extension), or the
+    name of its function.
+    """
+    function, args, kwargs = job
+    for arg in list(args) + list(kwargs.values()):
+        if isinstance(arg, str) and os.path.splitext(arg)[1] != '':
+            return arg
+    return function.__name__
+
+
+def _settings():
+    import warnings
+    import matplotlib as mpl
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return {k: v for k, v in mpl.rcParams.items() if k != 'backend'}
+
+
+def renderFigures(jobs, nWorkers=1, close=True):
+    """
+    Renders a list of figure jobs.
+
+    Args:
+        jobs (list): (function, args, kwargs) tuples; each function draws and saves one
+                     figure with pyplot.
+        nWorkers (int): Number of worker processes (None: the number of cores). With 1
+                        the figures are drawn in the calling process, with its backend.
+        close (bool): Closes the figures of each job when it ends. Figures drawn by
+                      worker processes are always closed.
+
+    Returns:
+        The number of figures rendered.
+
+    Raises:
+        RuntimeError: If some figure failed, once all the jobs are done (the other
+                      figures are saved). The message lists the failed figures.
+    """
+    if len(jobs) == 0:
+        return 0
+
+    if nWorkers is None:
+        nWorkers = os.cpu_count()
+    nWorkers = max(1, min(int(nWorkers), len(jobs)))
+
+    if nWorkers == 1:
+        errors = [_renderJob(job, close) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=nWorkers, initializer=_initWorker, initargs=(_settings(),)) as executor:
+            errors = list(executor.map(_renderJob, jobs))
+
+    failed = []
+    for job, error in zip(jobs, errors):
+        if error is not None:
+            print(setcolor.WARNING + "    >>> Figure not rendered (" + _jobName(job) + "): " + error + " <<< " + setcolor.ENDC)
+            failed.append(_jobName(job) + ' (' + error + ')')
+
+    if len(failed) > 0:
+        raise RuntimeError(str(len(failed)) + ' of ' + str(len(jobs)) + ' figures not rendered: ' + ', '.join(failed))
+
+    return len(jobs)
@@ -0,0 +1,158 @@
+"""
+This module defines the functions used to share the tables of a read_diag object
+between processes through shared memory blocks (multiprocessing.shared_memory).
+
+The process that read the file publishes its tables once; worker processes
+attach to them and get NumPy views over the same memory, so the memory of
+a cycle is paid once and not once per worker.
+"""
+import numpy as np
+import pandas as pd
+from multiprocessing import shared_memory
+
+from .__main__ import read_diag, _geoTable
+
+
+def _attachBlock(name):
+    """
+    Opens an existing shared memory block without taking its ownership.
+    Only the publishing process should unlink the block.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # python < 3.13: the block is registered again in the resource tracker,
+        # which is shared with the publishing process, so it is released only once
+        return shared_memory.SharedMemory(name=name)
+
+
+class sharedDiag(object):
+    """
+    A handle to the tables of a read_diag object published in shared memory.
+    It holds only the names and layout of the blocks, so it is cheap to pickle
+    and can be passed as an argument to worker processes.
+
+    Each variable is stored in a single (columns x observations) block, with the
+    observations of all its kx/SatId one after the other.
+
+    Attributes:
+        meta (dict): The read_diag metadata (file names, file type, zlevs, ...).
+        tables (dict): For each variable: (columns, keys, counts, block name, dtype).
+    """
+    def __init__(self, meta, tables, blocks=None):
+        self.meta   = meta
+        self.tables = tables
+        self._blocks = blocks
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_blocks'] = None
+        return state
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.unlink()
+
+    def attach(self, geometry=True):
+        """
+        See attach().
+        """
+        return attach(self, geometry=geometry)
+
+    def unlink(self):
+        """
+        Frees the shared memory blocks. Must be called by the publishing process
+        when all workers are done (it is called when leaving a with statement).
+        """
+        if self._blocks is not None:
+            for shm in self._blocks:
+                shm.close()
+                shm.unlink()
+            self._blocks = None
+
+
+def publish(diag):
+    """
+    Copies the tables of a read_diag object into shared memory blocks.
+
+    Args:
+        diag (read_diag): The object to be published.
+
+    Returns:
+        A sharedDiag handle. The blocks live until its unlink() method is called.
+
+    Example:
+        with gd.publish(gdf) as shared:
+            with ProcessPoolExecutor() as executor:
+                executor.map(myPlot, [shared]*nJobs, jobs)
+
+        # and in the worker:
+        def myPlot(shared, job):
+            gdf = shared.attach()
+            gd.plot_diag.plot(gdf, ...)
+    """
+    state = diag.__getstate__()
+
+    meta   = {k: v for k, v in state.items() if k != '_tables'}
+    tables = {}
+    blocks = []
+    for varName, (columns, keys, data) in state['_tables'].items():
+        counts = [array.shape[1] for array in data]
+        dtype  = np.result_type(*data)
+        shape  = (len(columns), sum(counts))
+
+        shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * dtype.itemsize))
+        blocks.append(shm)
+
+        block = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        i = 0
+        for array, n in zip(data, counts):
+            block[:, i:i+n] = array
+            i = i + n
+        del block
+
+        tables[varName] = (columns, keys, counts, shm.name, dtype.str)
+
+    return sharedDiag(meta, tables, blocks)
+
+
+def attach(shared, geometry=True):
+    """
+    Builds a read_diag object over the shared memory blocks of a sharedDiag handle.
+    The observation columns are NumPy views over the shared memory (no copy).
+
+    Args:
+        shared (sharedDiag): The handle returned by publish().
+        geometry (bool): Builds the point geometry of the tables, needed by the map
+                         plots. Use False in workers that only compute statistics,
+                         since the geometry is private to each process.
+
+    Returns:
+        A detached read_diag object. The views are read-only and remain valid while
+        the object is alive and the publishing process has not unlinked the blocks.
+    """
+    diag = read_diag.__new__(read_diag)
+    diag.__dict__.update(shared.meta)
+
+    diag._shm   = []
+    diag.obsInfo = {}
+    for varName, (columns, keys, counts, name, dtype) in shared.tables.items():
+        shm = _attachBlock(name)
+        diag._shm.append(shm)
+
+        block = np.ndarray((len(columns), sum(counts)), dtype=np.dtype(dtype), buffer=shm.buf)
+        block.flags.writeable = False
+
+        index = pd.MultiIndex.from_arrays([np.repeat(keys, counts),
+                                           np.concatenate([np.arange(n) for n in counts])],
+                                          names=[diag._indexName(),'points'])
+
+        d = pd.DataFrame(block.T, index=index, columns=columns, copy=False)
+        if geometry:
+            d = _geoTable(d)
+        diag.obsInfo[varName] = d
+    diag._lazyObsInfo()
+
+    return diag
@@ -0,0 +1,284 @@
+"""
+This module defines mergeable sketches of the distribution of OmF and OmA per
+(kx/SatId, level/channel), accumulated cycle by cycle:
+
+    - fixed-bin histograms, with an underflow and an overflow bin;
+    - an approximate quantile sketch with relative accuracy alpha (DDSketch, Masson
+      et al., 2019): values are counted in logarithmic buckets, so that any quantile
+      is estimated within a relative error alpha of the exact value.
+
+Both are plain counts, so sketches of different cycles, periods or processes are
+merged by adding them, and their memory does not depend on the number of cycles.
+"""
+import os
+import numpy as np
+import pandas as pd
+
+from .cube import _levColumn, _levKeys, _maskKey
+from .masks import maskTable
+
+
+HIST_KEYS   = ['quantity', 'varType', 'lev']
+SKETCH_KEYS = ['quantity', 'varType', 'lev', 'sign', 'key']
+
+
+class diagSketch(object):
+    """
+    Histograms and quantile sketches of OmF and OmA of one variable, optionally
+    persisted in a directory (files config.csv, edges.csv, hist.csv, sketch.csv and
+    cycles.csv). The edges and alpha of a persisted sketch are read from its files.
+
+    Attributes:
+        varName (str): The variable (e.g. 'uv', 'amsua').
+        mask (str): A DataFrame.query expression selecting the observations.
+        edges (ndarray): The edges of the histogram bins (default: -20 to 20 by 0.25).
+        alpha (float): The relative accuracy of the quantiles (default: 0.01).
+        path (str): The directory where the sketches are persisted (None: memory only).
+
+    Example:
+        sk = gd.diagSketch('uv', mask='iuse == 1', edges=np.arange(-10, 10.5, 0.5), path='/dataout/sketch_uv')
+        sk.update(gd.diagCollection('/data/diag_conv_ges.%Y%m%d%H', 2019120100, 2019123118))
+        sk.save()
+        sk.quantile(220, [0.25, 0.5, 0.75], levs=[850])
+    """
+    def __init__(self, varName, mask=None, edges=None, alpha=None, path=None, minValue=1.0e-9):
+        self.varName  = varName
+        self.mask     = mask
+        self.edges    = None if edges is None else np.asarray(edges, dtype=np.float64)
+        self.alpha    = alpha
+        self.minValue = minValue
+        self.path     = path
+        self._hist    = []
+        self._sketch  = []
+        self._dates   = set()
+
+        if path is not None and os.path.exists(os.path.join(path, 'config.csv')):
+            self._load()
+
+        if self.edges is None:
+            self.edges = np.arange(-20.0, 20.25, 0.25)
+        if self.alpha is None:
+            self.alpha = 0.01
+        self._gamma = (1.0 + self.alpha) / (1.0 - self.alpha)
+
+    def _keys(self, values):
+        """
+        Returns the sign and the logarithmic bucket of each value (bucket 0 for the
+        values with magnitude below minValue).
+        """
+        sign = np.sign(values).astype(np.int64)
+        mag  = np.abs(values)
+        zero = mag < self.minValue
+        sign[zero] = 0
+        with np.errstate(divide='ignore'):
+            key = np.where(zero, 0, np.ceil(np.log(np.where(zero, 1.0, mag)) / np.log(self._gamma))).astype(np.int64)
+        return sign, key
+
+    def _values(self, sign, key):
+        """
+        Returns the representative value of each bucket.
+        """
+        return sign * 2.0 * self._gamma ** key / (self._gamma + 1.0)
+
+    def addTable(self, table):
+        """
+        Adds the observations of an obsInfo table (e.g. gdf.obsInfo['uv']) to the sketches.
+        """
+        table = maskTable(table, self.mask)
+
+        keep, types, levs = _levKeys(table, _levColumn(table))
+        nbins = len(self.edges) + 1
+
+        for q in ['omf', 'oma']:
+            if q not in table.columns:
+                continue
+            value = table[q].to_numpy(dtype=np.float64)[keep]
+            valid = np.isfinite(value)
+            value = value[valid]
+            vt, lv = types[valid], levs[valid]
+
+            b = np.searchsorted(self.edges, value, side='right')
+            h = pd.DataFrame({'quantity': q, 'varType': vt, 'lev': lv, 'bin': b})
+            h = h.groupby(HIST_KEYS + ['bin']).size().unstack('bin', fill_value=0)
+            self._hist.append(h.reindex(columns=range(nbins), fill_value=0))
+
+            sign, key = self._keys(value)
+            s = pd.DataFrame({'quantity': q, 'varType': vt, 'lev': lv, 'sign': sign, 'key': key})
+            self._sketch.append(s.groupby(SKETCH_KEYS).size().rename('count'))
+
+    def add(self, date, diag):
+        """
+        Adds one cycle to the sketches. Cycles already added are skipped.
+
+        Returns:
+            True if the cycle was added.
+        """
+        date = pd.Timestamp(date).to_pydatetime()
+        if date in self._dates:
+            return False
+        if self.varName in diag.obsInfo:
+            self.addTable(diag.obsInfo[self.varName])
+            # merge the counts at once, so that only the sketches are kept in memory
+            self._histTable()
+            self._sketchTable()
+        self._dates.add(date)
+        return True
+
+    def update(self, cycles):
+        """
+        Adds the (date, read_diag) pairs of a list, diagCollection or cycleList that
+        were not added yet (see diagCube.update).
+
+        Returns:
+            The number of cycles added.
+        """
+        from .loader import cycleItems
+
+        added = 0
+        for date, diag in cycleItems(cycles, lambda date: pd.Timestamp(date).to_pydatetime() in self._dates):
+            if self.add(date, diag):
+                added = added + 1
+        return added
+
+    def merge(self, other):
+        """
+        Adds the counts of other (a diagSketch with the same edges and alpha) to self.
+        """
+        if not (np.array_equal(self.edges, other.edges) and self.alpha == other.alpha):
+            raise ValueError('diagSketch: sketches with different edges or alpha')
+        self._hist.extend(other._hist)
+        self._sketch.extend(other._sketch)
+        self._dates |= other._dates
+        return self
+
+    def _histTable(self):
+        if len(self._hist) == 0:
+            return pd.DataFrame(columns=range(len(self.edges) + 1), dtype=np.int64)
+        if len(self._hist) > 1:
+            hist = pd.concat(self._hist).fillna(0).astype(np.int64)
+            self._hist = [hist.groupby(level=HIST_KEYS).sum()]
+        return self._hist[0]
+
+    def _sketchTable(self):
+        if len(self._sketch) == 0:
+            return pd.Series(dtype=np.int64)
+        if len(self._sketch) > 1:
+            sketch = pd.concat(self._sketch)
+            self._sketch = [sketch.groupby(level=SKETCH_KEYS).sum()]
+        return self._sketch[0]
+
+    def _select(self, table, q, varType, levs):
+        if table.shape[0] == 0:
+            return table
+        try:
+            sub = table.xs((q, str(varType)), level=('quantity', 'varType'))
+        except KeyError:
+            return table.iloc[0:0]
+        if levs is not None:
+            sub = sub[sub.index.get_level_values('lev').isin(levs)]
+        return sub
+
+    def levels(self, varType, q='omf'):
+        """
+        Returns the sorted levels (or channels) of varType with observations.
+        """
+        sub = self._select(self._histTable(), q, varType, None)
+        if sub.shape[0] == 0:
+            return []
+        return sorted(set(sub.index.get_level_values('lev').tolist()))
+
+    def histogram(self, varType, q='omf', levs=None):
+        """
+        Returns the histogram of q ('omf' or 'oma') of varType, merged over levs.
+
+        Args:
+            varType (int or str): The kx (or SatId).
+            q (str): The quantity.
+            levs (list): The levels (or channels) to be merged. Defaults to all levels.
+
+        Returns:
+            The edges of the bins and the counts, an array of len(edges)+1 values: the
+            first is the number of values below edges[0] and the last the number of
+            values at or above edges[-1].
+        """
+        sub = self._select(self._histTable(), q, varType, levs)
+        return self.edges, sub.sum(axis=0).reindex(range(len(self.edges) + 1), fill_value=0).to_numpy(dtype=np.int64)
+
+    def quantile(self, varType, p, q='omf', levs=None):
+        """
+        Returns approximate quantiles of q ('omf' or 'oma') of varType, merged over levs,
+        within a relative error alpha.
+
+        Args:
+            varType (int or str): The kx (or SatId).
+            p (float or list): The probabilities (e.g. 0.5 for the median).
+            q (str): The quantity.
+            levs (list): The levels (or channels) to be merged. Defaults to all levels.
+
+        Returns:
+            The quantiles (NaN if there are no observations).
+        """
+        p   = np.asarray(p, dtype=np.float64)
+        sub = self._select(self._sketchTable(), q, varType, levs)
+        if sub.shape[0] == 0:
+            return np.full(p.shape, np.nan)
+
+        sub   = sub.groupby(level=['sign', 'key']).sum()
+        sign  = sub.index.get_level_values('sign').to_numpy()
+        key   = sub.index.get_level_values('key').to_numpy()
+        value = self._values(sign, key)
+
+        order = np.argsort(value, kind='stable')
+        value = value[order]
+        cum   = np.cumsum(sub.to_numpy()[order])
+
+        rank = p * (cum[-1] - 1)
+        return value[np.minimum(np.searchsorted(cum, rank, side='right'), len(cum) - 1)]
+
+    def median(self, varType, q='omf', levs=None):
+        """
+        Returns the approximate median of q of varType (see quantile).
+        """
+        return float(self.quantile(varType, 0.5, q, levs))
+
+    def _load(self):
+        config = pd.read_csv(os.path.join(self.path, 'config.csv'), dtype={'varName': str, 'mask': str}, keep_default_na=False)
+        edges  = pd.read_csv(os.path.join(self.path, 'edges.csv'), float_precision='round_trip')['edge'].to_numpy()
+        config = config.iloc[0]
+
+        if config['varName'] != self.varName or config['mask'] != _maskKey(self.mask):
+            raise ValueError('diagSketch: '+self.path+' holds the sketches of '+config['varName']+' '+config['mask'])
+        if self.edges is not None and not np.array_equal(self.edges, edges):
+            raise ValueError('diagSketch: the edges differ from the ones of '+self.path)
+        if self.alpha is not None and self.alpha != config['alpha']:
+            raise ValueError('diagSketch: alpha differs from the one of '+self.path)
+
+        self.edges    = edges
+        self.alpha    = float(config['alpha'])
+        self.minValue = float(config['minValue'])
+
+        hist   = pd.read_csv(os.path.join(self.path, 'hist.csv'), dtype={'quantity': str, 'varType': str})
+        sketch = pd.read_csv(os.path.join(self.path, 'sketch.csv'), dtype={'quantity': str, 'varType': str})
+        dates  = pd.read_csv(os.path.join(self.path, 'cycles.csv'), parse_dates=['date'])
+
+        hist = hist.set_index(HIST_KEYS)
+        hist.columns = hist.columns.astype(int)
+        self._hist   = [hist]
+        self._sketch = [sketch.set_index(SKETCH_KEYS)['count']]
+        self._dates  = set(pd.DatetimeIndex(dates['date']).to_pydatetime())
+
+    def save(self):
+        """
+        Writes the sketches to the files of path (the files are rewritten, since the
+        sketches of all cycles are merged).
+        """
+        if self.path is None:
+            raise ValueError('diagSketch: no path to save the sketches')
+
+        os.makedirs(self.path, exist_ok=True)
+        pd.DataFrame({'varName': [self.varName], 'mask': [_maskKey(self.mask)], 'alpha': [self.alpha],
+                      'minValue': [self.minValue]}).to_csv(os.path.join(self.path, 'config.csv'), index=False)
+        pd.DataFrame({'edge': self.edges}).to_csv(os.path.join(self.path, 'edges.csv'), index=False)
+        self._histTable().reset_index().to_csv(os.path.join(self.path, 'hist.csv'), index=False)
+        self._sketchTable().rename('count').reset_index().to_csv(os.path.join(self.path, 'sketch.csv'), index=False)
+        pd.DataFrame({'date': sorted(self._dates)}).to_csv(os.path.join(self.path, 'cycles.csv'), index=False)
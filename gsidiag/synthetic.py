@@ -0,0 +1,269 @@
+"""
+This module writes synthetic GSI diagnostics files, with the record layout read by
+the Fortran reader of gsidiag (big-endian Fortran sequential records), for
+benchmarks and examples when no real files are at hand.
+
+Conventional files hold one record with the analysis date and, for each variable
+and processor block, a header record (var, nchar, ninfo, nobs, mype) followed by
+the station ids and the (ninfo x nobs) diagnostics. Radiance files hold the header
+of the sensor, one record per channel and one record per spot with the diagnostics
+of the spot and of its channels.
+
+The first guess (ges) and analysis (anl) files of a cycle hold the same
+observations; the anl files hold O-A in place of O-F, so that pairs of files can be
+read together (read_diag(ges, anl)).
+
+Example:
+    gd.writeCycle('/tmp/diag', 2020031100, nobs=100000, sensors={'amsua': ['n19']})
+    gdf = gd.read_diag('/tmp/diag/diag_conv_01.2020031100', '/tmp/diag/diag_conv_03.2020031100')
+"""
+import os
+from datetime import datetime
+
+import numpy as np
+
+
+# kx of each conventional variable (the mix of the observations is uniform over them)
+CONV_KX = {'ps': [120, 180, 181, 187],
+           't' : [120, 130, 180, 181, 187],
+           'q' : [120, 180, 181, 187],
+           'uv': [220, 221, 224, 229, 230, 280, 290]}
+
+# number of diagnostics per observation (ninfo) written by GSI for each variable
+CONV_NINFO = {'ps': 20, 't': 21, 'q': 20, 'uv': 23}
+
+# number of channels of the radiance sensors
+SENSOR_CHANNELS = {'amsua': 15, 'amsub': 5, 'mhs': 5, 'atms': 22, 'hirs4': 19, 'iasi': 616, 'cris-fsr': 431}
+
+STANDARD_LEVELS = np.array([1000.0, 925.0, 850.0, 700.0, 500.0, 400.0, 300.0, 250.0, 200.0, 150.0, 100.0, 50.0])
+
+UPPER_AIR = (120, 220, 221)   # radiosondes and pibals: standard levels
+AIRCRAFT  = (130, 230)        # flight levels
+SURFACE   = (180, 181, 187, 280, 281, 287)
+
+
+def _record(f, payload):
+    """
+    Writes a Fortran sequential record: the payload between two 4-byte markers with
+    its size (big-endian).
+    """
+    size = np.array([len(payload)], dtype='>i4').tobytes()
+    f.write(size)
+    f.write(payload)
+    f.write(size)
+
+
+def _char(value, size):
+    return str(value).ljust(size)[:size].encode('ascii')
+
+
+def convObs(varName, nobs, kx=None, rng=None):
+    """
+    Returns the (nobs x ninfo) diagnostics of a conventional variable (first guess),
+    in the columns of the GSI conventional diagnostics files:
+
+        1 kx, 2 subtype, 3 lat, 4 lon, 5 elevation, 6 pressure, 7 height, 8 time (h),
+        9 prepbufr qc mark, 10 setup qc, 11 usage of read_prepbufr, 12 analysis usage,
+        13 nonlinear qc weight, 14-16 inverse observation errors (prepbufr, read_prepbufr,
+        final), 17 observation, 18 O-F, 19 O-F without bias correction, 20 (uv) wind
+        reduction factor, (q) guess saturation specific humidity, (t) aircraft phase
+
+    Args:
+        varName (str): 'ps', 't', 'q' or 'uv'.
+        nobs (int): The number of observations.
+        kx (list): The kx of the observations (default: CONV_KX).
+        rng (Generator): The random generator.
+    """
+    if rng is None:
+        rng = np.random.default_rng(0)
+    if kx is None:
+        kx = CONV_KX[varName]
+    ninfo = CONV_NINFO.get(varName, 20)
+
+    r    = np.zeros((nobs, ninfo), dtype=np.float32)
+    kxs  = rng.choice(np.asarray(kx), nobs)
+    r[:, 0] = kxs
+    r[:, 2] = np.degrees(np.arcsin(rng.uniform(-1.0, 1.0, nobs)))   # uniform over the sphere
+    r[:, 3] = rng.uniform(0.0, 360.0, nobs)
+    r[:, 4] = np.maximum(rng.normal(200.0, 400.0, nobs), 0.0)
+
+    prs = rng.uniform(100.0, 1000.0, nobs)
+    upper = np.isin(kxs, UPPER_AIR)
+    prs[upper] = rng.choice(STANDARD_LEVELS, upper.sum()) + rng.normal(0.0, 2.0, upper.sum())
+    air = np.isin(kxs, AIRCRAFT)
+    prs[air] = rng.uniform(180.0, 350.0, air.sum())
+    sfc = np.isin(kxs, SURFACE) | (varName == 'ps')
+    prs[sfc] = 1013.0 - r[sfc, 4] / 9.0 + rng.normal(0.0, 5.0, sfc.sum())
+    r[:, 5] = prs
+    r[:, 6] = 44330.0 * (1.0 - (prs / 1013.25) ** 0.19)
+    r[:, 7] = rng.uniform(-3.0, 3.0, nobs)
+
+    r[:, 8]  = rng.choice([1, 2, 3, 9, 15], nobs, p=[0.55, 0.3, 0.08, 0.05, 0.02])
+    r[:, 9]  = 0
+    r[:, 10] = rng.choice([0, 100], nobs, p=[0.95, 0.05])
+    r[:, 11] = np.where(rng.uniform(size=nobs) < 0.85, 1, -1)
+    r[:, 12] = rng.uniform(0.5, 1.0, nobs)
+
+    err = {'ps': 1.0, 't': 1.2, 'q': 1.0e-3, 'uv': 2.5}.get(varName, 1.0)
+    inv = 1.0 / (err * rng.uniform(0.8, 1.2, nobs))
+    r[:, 13] = inv
+    r[:, 14] = inv
+    r[:, 15] = np.where(r[:, 11] > 0, inv, 0.0)
+
+    if varName == 'ps':
+        obs = prs + rng.normal(0.0, 2.0, nobs)
+    elif varName == 't':
+        obs = 288.0 * (prs / 1013.25) ** 0.19 + rng.normal(0.0, 3.0, nobs)
+    elif varName == 'q':
+        obs = 0.015 * (prs / 1013.25) ** 3 * rng.uniform(0.2, 1.0, nobs)
+    else:
+        obs = np.abs(rng.normal(10.0, 8.0, nobs)) * (1.5 - prs / 1013.25)
+    omf = rng.normal(0.0, err, nobs)
+
+    r[:, 16] = obs
+    r[:, 17] = omf
+    r[:, 18] = omf + rng.normal(0.0, 0.1 * err, nobs)
+    if varName == 'uv':
+        r[:, 19] = rng.uniform(0.7, 1.0, nobs)
+    elif varName == 'q':
+        r[:, 19] = np.maximum(obs, 0.0) * rng.uniform(1.0, 2.0, nobs)
+    elif varName == 't' and ninfo >= 21:
+        r[:, 19] = np.where(air, rng.choice([3, 5, 6], nobs), 0)
+        r[:, 20] = 0
+    return r
+
+
+def writeConv(path, idate, nobs=10000, variables=None, nblocks=4, anl=False, seed=0):
+    """
+    Writes a conventional diagnostics file.
+
+    Args:
+        path (str): The file.
+        idate (int): The analysis date (YYYYMMDDHH).
+        nobs (int): The number of observations of each variable.
+        variables (dict): The kx of each variable (default: CONV_KX).
+        nblocks (int): The number of processor blocks of each variable (GSI writes one
+                       block per variable and processor).
+        anl (bool): Writes the analysis file: O-A in place of O-F.
+        seed (int): The seed of the observations; ges and anl files of a cycle must
+                    use the same seed.
+    """
+    if variables is None:
+        variables = CONV_KX
+
+    with open(path, 'wb') as f:
+        _record(f, np.array([idate], dtype='>i4').tobytes())
+        for i, (varName, kx) in enumerate(variables.items()):
+            rng = np.random.default_rng([seed, idate, i])
+            r   = convObs(varName, nobs, kx, rng)
+            if anl:
+                r[:, 17] = 0.6 * r[:, 17] + rng.normal(0.0, 0.2 * np.std(r[:, 17]), nobs)
+                r[:, 18] = r[:, 17]
+
+            ninfo = r.shape[1]
+            for mype, rows in enumerate(np.array_split(np.arange(nobs), nblocks)):
+                if len(rows) == 0:
+                    continue
+                ids = b''.join(_char('ST%06d' % j, 8) for j in rows)
+                _record(f, _char(varName.rjust(3), 3) + np.array([8, ninfo, len(rows), mype], dtype='>i4').tobytes())
+                _record(f, ids + r[rows].astype('>f4').tobytes(order='C'))
+
+
+def writeRad(path, idate, sensor='amsua', sat='n19', nspots=10000, nchanl=None, npred=12, anl=False, seed=0):
+    """
+    Writes a radiance diagnostics file of one sensor and satellite.
+
+    Args:
+        path (str): The file.
+        idate (int): The analysis date (YYYYMMDDHH).
+        sensor (str): The sensor (obstype, e.g. 'amsua').
+        sat (str): The satellite (dplat, e.g. 'n19').
+        nspots (int): The number of spots (each with nchanl channels).
+        nchanl (int): The number of channels (default: SENSOR_CHANNELS).
+        npred (int): The number of bias correction predictors.
+        anl (bool): Writes the analysis file: O-A in place of O-F.
+        seed (int): The seed of the observations.
+    """
+    if nchanl is None:
+        nchanl = SENSOR_CHANNELS.get(sensor, 15)
+    ireal, ipchan = 26, 8
+
+    rng = np.random.default_rng([seed, idate, sum(map(ord, sensor + sat))])
+    with open(path, 'wb') as f:
+        # isis, dplat, obstype, jiter, nchanl, npred, idate, ireal, ipchan, iextra, jextra,
+        # idiag, angord, iversion, inewpc (88 bytes)
+        header = (_char(sensor + '_' + sat, 20) + _char(sat, 10) + _char(sensor, 10) +
+                  np.array([1 if not anl else 3, nchanl, npred, idate, ireal, ipchan, 0, 0,
+                            ipchan + npred + 2, 0, 30303, 1], dtype='>i4').tobytes())
+        _record(f, header)
+
+        iuse = np.where(rng.uniform(size=nchanl) < 0.7, 1, -1)
+        for ch in range(nchanl):
+            info = np.array([23.8 + 10.0 * ch, 1.0, 0.0, 0.3, 0.0], dtype='>f4').tobytes()
+            _record(f, info + np.array([iuse[ch], ch + 1, ch + 1], dtype='>i4').tobytes())
+
+        spot = np.zeros((nspots, ireal), dtype=np.float32)
+        spot[:, 0] = np.degrees(np.arcsin(rng.uniform(-1.0, 1.0, nspots)))
+        spot[:, 1] = rng.uniform(0.0, 360.0, nspots)
+        spot[:, 2] = np.maximum(rng.normal(200.0, 400.0, nspots), 0.0)
+        spot[:, 3] = rng.uniform(-3.0, 3.0, nspots)
+        spot[:, 4] = rng.integers(1, 31, nspots)
+        spot[:, 5] = rng.uniform(0.0, 60.0, nspots)
+        spot[:, 10] = rng.uniform(0.0, 1.0, nspots)
+        spot[:, 11] = 1.0 - spot[:, 10]
+
+        nchv = ipchan + npred + 2
+        chan = np.zeros((nspots, nchanl, nchv), dtype=np.float32)
+        err  = rng.uniform(0.2, 2.0, nchanl)
+        omf  = rng.normal(0.0, 1.0, (nspots, nchanl)) * err
+        if anl:
+            omf = 0.7 * omf + rng.normal(0.0, 0.1, (nspots, nchanl)) * err
+        chan[:, :, 0] = 200.0 + 80.0 * rng.uniform(size=(nspots, nchanl))
+        chan[:, :, 1] = omf
+        chan[:, :, 2] = omf + rng.normal(0.0, 0.5, (nspots, nchanl))
+        chan[:, :, 3] = 1.0 / err
+        chan[:, :, 4] = rng.choice([0, 0, 0, 3, 7, 50], (nspots, nchanl))
+        chan[:, :, 5] = rng.uniform(0.5, 1.0, (nspots, nchanl))
+        chan[:, :, ipchan:] = rng.normal(0.0, 0.1, (nspots, nchanl, npred + 2))
+
+        # one record per spot: diagbuf(ireal), diagbufchan(nchv, nchanl) in Fortran order
+        spot = spot.astype('>f4')
+        chan = chan.astype('>f4')
+        for i in range(nspots):
+            _record(f, spot[i].tobytes() + chan[i].tobytes(order='C'))
+
+
+def writeCycle(path, date, nobs=10000, variables=None, sensors=None, nspots=None, anl=True, seed=0,
+               convName='diag_conv_{}.%Y%m%d%H', radName='diag_{sensor}_{sat}_{}.%Y%m%d%H'):
+    """
+    Writes the files of one cycle: the conventional file and one radiance file per
+    sensor and satellite, for the first guess (01) and, if anl, the analysis (03).
+
+    Args:
+        path (str): The directory of the files (created if needed).
+        date (int or str): The analysis date (YYYYMMDDHH).
+        nobs (int): The number of observations of each conventional variable.
+        variables (dict): The kx of each conventional variable (default: CONV_KX).
+        sensors (dict): The satellites of each sensor, e.g. {'amsua': ['n19', 'metop-b']}.
+        nspots (int): The number of spots of each radiance file (default: nobs // 10).
+
+    Returns:
+        The list of files written.
+    """
+    date  = datetime.strptime(str(date), '%Y%m%d%H')
+    idate = int(date.strftime('%Y%m%d%H'))
+    os.makedirs(path, exist_ok=True)
+    if nspots is None:
+        nspots = max(nobs // 10, 1)
+
+    files = []
+    for outer, isAnl in [('01', False), ('03', True)][:2 if anl else 1]:
+        fname = os.path.join(path, date.strftime(convName.format(outer)))
+        writeConv(fname, idate, nobs, variables, anl=isAnl, seed=seed)
+        files.append(fname)
+        for sensor, sats in (sensors or {}).items():
+            for sat in sats:
+                fname = os.path.join(path, date.strftime(radName.format(outer, sensor=sensor, sat=sat)))
+                writeRad(fname, idate, sensor, sat, nspots, anl=isAnl, seed=seed)
+                files.append(fname)
+    return files
@@ -0,0 +1,32 @@
+"""
+Synthetic diagnostics files shared by the tests (see gsidiag.synthetic). The tests
+that read files are skipped when the Fortran reader (diag2python) is not built.
+"""
+import os
+
+import pytest
+
+DATE = '2020031100'
+
+
+@pytest.fixture(scope='session')
+def syntheticPath(tmp_path_factory):
+    pytest.importorskip('diag2python')
+    import gsidiag as gd
+
+    path = str(tmp_path_factory.mktemp('synthetic'))
+    gd.writeCycle(path, DATE, nobs=3000, sensors={'amsua': ['n19']}, nspots=400, seed=1)
+    return path
+
+
+@pytest.fixture(scope='session')
+def convDiag(syntheticPath):
+    import gsidiag as gd
+    return gd.read_diag(os.path.join(syntheticPath, 'diag_conv_01.' + DATE),
+                        os.path.join(syntheticPath, 'diag_conv_03.' + DATE)).detach()
+
+
+@pytest.fixture(scope='session')
+def radDiag(syntheticPath):
+    import gsidiag as gd
+    return gd.read_diag(os.path.join(syntheticPath, 'diag_amsua_n19_01.' + DATE)).detach()
@@ -0,0 +1,53 @@
+"""
+Tests of the enumeration of close pairs (gsidiag.correlation) against the distances
+of all pairs.
+"""
+import numpy as np
+import pytest
+
+from gsidiag.correlation import closePairs, EARTH_RADIUS
+from gsidiag.synthetic import convObs
+
+
+def _allPairs(lat, lon, maxDist):
+    lat, lon = np.radians(lat), np.radians(lon)
+    i, j = np.triu_indices(len(lat), k=1)
+    a = np.sin((lat[j] - lat[i]) / 2.0) ** 2 + np.cos(lat[i]) * np.cos(lat[j]) * np.sin((lon[j] - lon[i]) / 2.0) ** 2
+    dist = 2.0 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+    near = dist <= maxDist
+    return i[near], j[near], dist[near]
+
+
+def _pairs(lat, lon, maxDist, chunk):
+    found = [(np.minimum(i, j), np.maximum(i, j), d) for i, j, d in closePairs(lat, lon, maxDist, chunk=chunk)]
+    i, j, d = [np.concatenate(x) for x in zip(*found)] if found else [np.array([], dtype=np.int64)] * 3
+    order = np.lexsort((j, i))
+    return i[order], j[order], d[order]
+
+
+@pytest.mark.parametrize('maxDist, chunk', [(300.0, 2000000), (800.0, 5000), (2500.0, 1)])
+def test_close_pairs_as_all_pairs(maxDist, chunk):
+    obs = convObs('uv', 1500, rng=np.random.default_rng(7))
+    lat, lon = obs[:, 2].astype(np.float64), obs[:, 3].astype(np.float64)
+    # pairs across the dateline and near the poles
+    lat = np.concatenate([lat, [0.0, 0.5, 89.9, 89.8, -89.95]])
+    lon = np.concatenate([lon, [179.9, -179.8, 0.0, 180.0, 45.0]])
+
+    i, j, d = _pairs(lat, lon, maxDist, chunk)
+    ei, ej, ed = _allPairs(lat, lon, maxDist)
+    # pairs at the distance limit may fall on either side by rounding
+    keep  = np.abs(ed - maxDist) > 1e-6
+    found = set(zip(i.tolist(), j.tolist()))
+    assert set(zip(ei[keep].tolist(), ej[keep].tolist())) <= found
+    assert len(found) == len(i)
+    assert len(found - set(zip(ei.tolist(), ej.tolist()))) == 0
+
+    expected = dict(zip(zip(ei.tolist(), ej.tolist()), ed))
+    np.testing.assert_allclose(d, [expected[p] for p in zip(i.tolist(), j.tolist())], rtol=1e-9, atol=1e-6)
+
+
+def test_close_pairs_of_few_points():
+    assert list(closePairs([10.0], [20.0], 100.0)) == []
+    i, j, d = _pairs(np.array([0.0, 0.0]), np.array([0.0, 0.5]), 100.0, 10)
+    np.testing.assert_array_equal(i, [0])
+    np.testing.assert_array_equal(j, [1])
@@ -0,0 +1,87 @@
+"""
+Tests of the persistence of gsidiag.cube.diagCube across versions of its files.
+"""
+import os
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from gsidiag.cube import diagCube, cubeVersion, CUBE_VERSION, STATS_KEYS, STATS
+
+
+def _cycle(seed, nobs=200):
+    """
+    A read_diag-like object with the obsInfo table of one conventional variable.
+    """
+    rng   = np.random.default_rng(seed)
+    kx    = rng.choice([120, 220], nobs)
+    table = pd.DataFrame({'prs'  : rng.choice([500.0, 850.0, 1000.0], nobs),
+                          'omf'  : rng.normal(0.0, 1.0, nobs),
+                          'oma'  : rng.normal(0.0, 0.6, nobs),
+                          'imp'  : rng.normal(0.0, 0.1, nobs),
+                          'dfs'  : rng.uniform(0.0, 0.1, nobs),
+                          'oer'  : rng.uniform(0.8, 1.2, nobs),
+                          'iuse' : rng.choice([-1, 1], nobs),
+                          'idqc' : rng.choice([0, 2], nobs)},
+                         index=pd.MultiIndex.from_arrays([kx, np.arange(nobs)], names=['kx', 'points']))
+    return SimpleNamespace(obsInfo={'t': table}, zlevs=None)
+
+
+def _olderCube(path, version):
+    """
+    Rewrites the files of the cube in path as they were saved by an older version.
+    """
+    fstats = os.path.join(path, 'stats.csv')
+    stats  = pd.read_csv(fstats, keep_default_na=False)
+    columns = STATS_KEYS + [c for c in STATS if not c.startswith('des_')]
+    if version == 1:
+        for q in ['omf', 'oma']:
+            n    = stats[q+'_n']
+            mean = pd.to_numeric(stats[q+'_mean'], errors='coerce').fillna(0.0)
+            m2   = pd.to_numeric(stats[q+'_m2'], errors='coerce').fillna(0.0)
+            stats[q+'_sum']   = n * mean
+            stats[q+'_sumsq'] = m2 + n * mean * mean
+        columns = [c.replace('_mean', '_sum').replace('_m2', '_sumsq') for c in columns]
+    stats[columns].to_csv(fstats, index=False)
+    os.remove(os.path.join(path, 'version'))
+
+
+def _saveIntoOlderCube(tmp_path, version):
+    path  = str(tmp_path / 'cube')
+    first, second = datetime(2020, 1, 1, 0), datetime(2020, 1, 1, 6)
+
+    cube = diagCube(path)
+    cube.add(first, _cycle(1), 't')
+    cube.save()
+    expected = cube.stats().copy()
+
+    _olderCube(path, version)
+    assert cubeVersion(path) == version
+
+    cube = diagCube(path)
+    cube.add(second, _cycle(2), 't')
+    cube.save()
+    assert cubeVersion(path) == CUBE_VERSION
+
+    cube   = diagCube(path)
+    stats  = cube.stats()
+    assert cube.dates('t') == [first, second]
+
+    old = stats.xs(pd.Timestamp(first), level='date', drop_level=False)
+    for col in ['nobs', 'omf_n', 'omf_mean', 'omf_m2', 'oma_mean', 'oma_m2', 'imp_sum']:
+        np.testing.assert_allclose(old[col].astype(float), expected[col].astype(float), rtol=1e-9, atol=1e-9)
+    # the statistics added after the older version have zero counts in its cycles
+    assert (old['des_n'] == 0).all()
+
+    new = stats.xs(pd.Timestamp(second), level='date')
+    assert (new['des_n'] > 0).all()
+
+
+def test_save_into_cube_without_desroziers_sums(tmp_path):
+    _saveIntoOlderCube(tmp_path, 2)
+
+
+def test_save_into_cube_with_sums(tmp_path):
+    _saveIntoOlderCube(tmp_path, 1)
@@ -0,0 +1,104 @@
+"""
+Tests of the reading of periods with missing cycles (gsidiag.loader), on synthetic
+diagnostics files (see gsidiag.synthetic).
+"""
+import os
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip('diag2python')
+
+import matplotlib
+matplotlib.use('Agg')
+import pandas as pd
+
+import gsidiag as gd
+from gsidiag.loader import loadCycles, diagCollection, _parseMemory
+
+# the first cycle of the period has no files
+DATES = ['2020031018', '2020031100', '2020031106']
+
+
+@pytest.fixture(scope='module')
+def data(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('data'))
+    for date in DATES[1:]:
+        gd.writeCycle(path, date, nobs=500, seed=int(date) % 97)
+    return (os.path.join(path, 'diag_conv_01.%Y%m%d%H'), os.path.join(path, 'diag_conv_03.%Y%m%d%H'))
+
+
+def test_load_cycles_with_missing_first_cycle(data):
+    cycles = loadCycles(data[0], DATES[0], DATES[-1], templateAnl=data[1], nWorkers=1)
+    assert cycles.dates == [datetime.strptime(d, '%Y%m%d%H') for d in DATES]
+    assert cycles[0] is None
+    assert all(diag is not None for diag in cycles[1:])
+    assert list(cycles.gaps) == [cycles.dates[0]]
+    assert 'File not found' in cycles.gaps[cycles.dates[0]]
+
+
+@pytest.mark.parametrize('nWorkers', [1, 2])
+def test_collection_with_missing_cycles(data, nWorkers):
+    dates  = [datetime.strptime(d, '%Y%m%d%H') for d in DATES]
+    cycles = diagCollection(data[0], DATES[0], '2020031112', templateAnl=data[1])
+    assert cycles.dates == dates + [datetime(2020, 3, 11, 12)]
+
+    cycles.prefetch(None, nWorkers)
+    assert sorted(cycles.gaps) == [dates[0], datetime(2020, 3, 11, 12)]
+    assert cycles.loaded() == dates[1:]
+    assert cycles[0] is None and cycles['2020031112'] is None
+    assert [diag is not None for diag in cycles] == [False, True, True, False]
+
+    # the same cycles are read on demand, without prefetch
+    lazy = diagCollection(data[0], DATES[0], '2020031112', templateAnl=data[1])
+    assert lazy[DATES[0]] is None
+    assert len(lazy[DATES[1]].obsInfo['t']) == len(cycles[DATES[1]].obsInfo['t'])
+    assert list(lazy.gaps) == [dates[0]]
+
+
+def test_truncated_cycle_in_process(tmp_path):
+    # a failed open must not be left in the list of open files of the Fortran module,
+    # or closing the files read afterwards in the same process crashes
+    path  = str(tmp_path)
+    dates = ['2020031100', '2020031106', '2020031112']
+    for date in dates:
+        gd.writeCycle(path, date, nobs=500)
+    for outer in ['01', '03']:
+        fileName = os.path.join(path, 'diag_conv_' + outer + '.' + dates[1])
+        with open(fileName, 'r+b') as f:
+            f.truncate(os.path.getsize(fileName) // 2)
+
+    template = os.path.join(path, 'diag_conv_01.%Y%m%d%H')
+    cycles = loadCycles(template, dates[0], dates[-1], templateAnl=template.replace('_01.', '_03.'), nWorkers=1)
+    assert [diag is not None for diag in cycles] == [True, False, True]
+    assert list(cycles.gaps) == [cycles.dates[1]]
+
+    diag = gd.read_diag(datetime.strptime(dates[2], '%Y%m%d%H').strftime(template))
+    assert len(diag.obsInfo['t']) == len(cycles[2].obsInfo['t'])
+    assert diag.close() == 0
+
+
+def test_products_with_missing_first_cycle(data, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cycles = loadCycles(data[0], DATES[0], DATES[-1], templateAnl=data[1], nWorkers=1)
+    period = dict(varName='t', varType=120, dateIni=DATES[0], dateFin=DATES[-1])
+
+    files = gd.read_diag.tocsv(cycles, **period)
+    table = pd.read_csv(files[0])
+    assert len(table) == len(DATES)
+    assert (table.filter(like='count').iloc[0] == 0).all()
+    assert (table.filter(like='count').iloc[1:].sum(axis=1) > 0).all()
+
+    assert gd.plot_diag.time_series(cycles, Level=500, **period) > 0
+
+
+@pytest.mark.parametrize('size, expected', [('512MB', 512 * 2**20), ('512M', 512 * 2**20), ('4g', 4 * 2**30),
+                                            ('1.5 GB', int(1.5 * 2**30)), ('100', 100), (2048, 2048)])
+def test_parse_memory(size, expected):
+    assert _parseMemory(size) == expected
+
+
+@pytest.mark.parametrize('size', ['4X', 'GB', 'many'])
+def test_parse_invalid_memory(size):
+    with pytest.raises(ValueError):
+        _parseMemory(size)
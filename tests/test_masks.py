@@ -0,0 +1,45 @@
+"""
+Tests of the compiled masks (gsidiag.masks) against DataFrame.query.
+"""
+import numpy as np
+import pytest
+
+from gsidiag.masks import compileMask, maskTable, selectRows
+
+EXPRESSIONS = ['iuse==1', 'iuse == 1', 'idqc==0 & iuse>=1', 'iuse == 1 and idqc == 0', 'not iuse == 1',
+               '~(iuse == 1)', 'iuse == 1 | idqc > 2', '-2 < omf < 2', 'kx == 220', 'kx in [220, 221]',
+               'kx not in (220,)', 'prs > 500 & (iuse == 1 | idqc == 3)', 'abs(omf) < 1', '`omf` > 0',
+               'omf > oma', 'omf != omf', 'lat > 0 and lon < 90']
+
+# expressions evaluated without pandas
+COMPILED = ['iuse == 1', 'idqc==0 & iuse>=1', '-2 < omf < 2', 'kx in [220, 221]', 'omf > oma']
+
+
+@pytest.mark.parametrize('mask', EXPRESSIONS)
+def test_compiled_mask_as_query(convDiag, mask):
+    for varName in ['uv', 't']:
+        table = convDiag.obsInfo[varName]
+        if 'kx' in mask and varName != 'uv':
+            continue
+        expected = table.query(mask)
+        assert maskTable(table, mask).index.equals(expected.index)
+        np.testing.assert_array_equal(compileMask(mask)(table), table.eval(mask).to_numpy(dtype=bool))
+
+
+@pytest.mark.parametrize('mask', COMPILED)
+def test_mask_is_compiled(mask):
+    assert compileMask(mask)._code is not None
+
+
+def test_mask_of_radiance_channels(radDiag):
+    table = radDiag.obsInfo['amsua']
+    mask  = 'nchan == 5 & iuse == 1 & idqc == 0'
+    assert maskTable(table, mask).index.equals(table.query(mask).index)
+
+
+def test_select_rows_with_region(convDiag):
+    table = convDiag.obsInfo['uv']
+    rows  = selectRows(convDiag, 'uv', 'iuse == 1', [-85.0, -60.0, -30.0, 15.0])
+    lon   = (table['lon'] + 180.0) % 360.0 - 180.0
+    expected = np.flatnonzero(((table['iuse'] == 1) & table['lat'].between(-60.0, 15.0) & lon.between(-85.0, -30.0)).to_numpy())
+    np.testing.assert_array_equal(np.sort(rows), expected)
@@ -0,0 +1,86 @@
+"""
+Tests of the mergeable moments (gsidiag.moments) against np.mean and np.var.
+"""
+import numpy as np
+import pytest
+
+from gsidiag.moments import moments
+from gsidiag.synthetic import convObs
+
+
+@pytest.fixture(scope='module')
+def values():
+    obs  = convObs('t', 5000, rng=np.random.default_rng(11))
+    omf  = obs[:, 17].astype(np.float64) + 100.0   # offset mean: cancellation in sums of squares
+    omf[::97] = np.nan
+    cell = np.searchsorted([300.0, 500.0, 700.0, 850.0], obs[:, 5])   # 5 pressure layers
+    return omf, cell
+
+
+def _expected(omf, cell, size):
+    mean = np.array([np.nanmean(omf[cell == c]) for c in range(size)])
+    var  = np.array([np.nanvar(omf[cell == c]) for c in range(size)])
+    count = np.array([np.isfinite(omf[cell == c]).sum() for c in range(size)])
+    return count, mean, var
+
+
+def test_from_values(values):
+    omf, cell = values
+    acc = moments.fromValues(omf, cell, 5)
+    count, mean, var = _expected(omf, cell, 5)
+    np.testing.assert_array_equal(acc.count, count)
+    np.testing.assert_allclose(acc.mean, mean, rtol=1e-12)
+    np.testing.assert_allclose(acc.var, var, rtol=1e-9)
+    np.testing.assert_allclose(acc.std, np.sqrt(var), rtol=1e-9)
+
+
+@pytest.mark.parametrize('nchunks', [2, 7, 50])
+def test_merge_chunks(values, nchunks):
+    omf, cell = values
+    acc = moments.empty(5)
+    for part in np.array_split(np.arange(len(omf)), nchunks):
+        acc = acc.merge(moments.fromValues(omf[part], cell[part], 5))
+    count, mean, var = _expected(omf, cell, 5)
+    np.testing.assert_array_equal(acc.count, count)
+    np.testing.assert_allclose(acc.mean, mean, rtol=1e-12)
+    np.testing.assert_allclose(acc.var, var, rtol=1e-9)
+
+    updated = moments.empty(5)
+    for part in np.array_split(np.arange(len(omf)), nchunks):
+        updated.update(omf[part], cell[part])
+    np.testing.assert_allclose(updated.var, var, rtol=1e-9)
+
+
+def test_sum(values):
+    omf, cell = values
+    # (2 cycles x 5 layers)
+    half = len(omf) // 2
+    acc = moments(*[np.stack([getattr(moments.fromValues(omf[s], cell[s], 5), a) for s in [slice(None, half), slice(half, None)]])
+                    for a in ['count', 'mean', 'm2']])
+
+    total = acc.sum()
+    np.testing.assert_allclose(total.mean, np.nanmean(omf), rtol=1e-12)
+    np.testing.assert_allclose(total.var, np.nanvar(omf), rtol=1e-9)
+
+    byLayer = acc.sum(axis=0)
+    count, mean, var = _expected(omf, cell, 5)
+    np.testing.assert_array_equal(byLayer.count, count)
+    np.testing.assert_allclose(byLayer.mean, mean, rtol=1e-12)
+    np.testing.assert_allclose(byLayer.var, var, rtol=1e-9)
+
+    where = np.array([True, False, True, True, False])
+    sub = acc.sum(axis=1, where=where)
+    for t, s in enumerate([slice(None, half), slice(half, None)]):
+        selected = omf[s][where[cell[s]]]
+        np.testing.assert_allclose(sub.mean[t], np.nanmean(selected), rtol=1e-12)
+        np.testing.assert_allclose(sub.var[t], np.nanvar(selected), rtol=1e-9)
+
+
+def test_empty_cells():
+    acc = moments.fromValues([1.0, 2.0, np.nan], [0, 0, 2], 3)
+    np.testing.assert_array_equal(acc.count, [2, 0, 0])
+    assert np.isnan(acc.mean[1]) and np.isnan(acc.var[2])
+    merged = acc.merge(moments.empty(3))
+    np.testing.assert_array_equal(merged.count, acc.count)
+    np.testing.assert_allclose(merged.mean[0], 1.5)
+    assert np.isnan(acc.sum(where=[False, True, True]).mean)
@@ -0,0 +1,55 @@
+"""
+Tests of the QC classification (gsidiag.qc) against the DataFrame.query counts used
+by statcount before it.
+"""
+import numpy as np
+import pytest
+
+from gsidiag.qc import (classify, classifyConv, classifyRad, countCategories, limQm,
+                        ASSIMILATED, MONITORED, REJECTED, MONITORED_ASSIM, MONITORED_REJECT)
+
+
+def _queryConv(table, lim_qm):
+    return {ASSIMILATED: len(table.query("(iuse==1)")),
+            MONITORED  : len(table.query("(iuse==-1) & (idqc >= " + str(lim_qm) + " and idqc <= 15)")),
+            REJECTED   : len(table.query("(iuse==-1) & ((idqc > 15 or idqc <= 0) or (idqc > 0 and idqc < " + str(lim_qm) + "))"))}
+
+
+def _queryRad(table, channel):
+    return {ASSIMILATED     : len(table.query("(nchan==" + str(channel) + ") & (iuse >= 1 & idqc==0.0)")),
+            MONITORED_ASSIM : len(table.query("(nchan==" + str(channel) + ") & ((iuse >= -1 and iuse < 1) & idqc==0.0)")),
+            MONITORED_REJECT: len(table.query("(nchan==" + str(channel) + ") & ((iuse >= -1 and iuse < 1) & idqc!=0.0)")),
+            REJECTED        : len(table.query("(nchan==" + str(channel) + ") & (iuse >= 1 & idqc!=0.0)"))}
+
+
+@pytest.mark.parametrize('noiqc', [False, True])
+@pytest.mark.parametrize('varName', ['ps', 't', 'q', 'uv'])
+def test_classify_conv_as_query(convDiag, varName, noiqc):
+    lim_qm = limQm(varName, noiqc)
+    for kx, table in convDiag.obsInfo[varName].groupby(level='kx'):
+        counts = countCategories(classify(table, varName, noiqc))
+        for category, count in _queryConv(table, lim_qm).items():
+            assert counts[category] == count, (kx, category)
+
+
+def test_classify_rad_as_query(radDiag):
+    table  = radDiag.obsInfo['amsua'].loc['n19']
+    counts = countCategories(classify(table), channels=table['nchan'].to_numpy())
+    assert sorted(counts) == sorted(int(ch) for ch in table['nchan'].unique())
+    for channel, chanCounts in counts.items():
+        for category, count in _queryRad(table, channel).items():
+            assert chanCounts[category] == count, (channel, category)
+
+
+def test_classify_conv_edges():
+    iuse = np.array([1, -1, -1, -1, -1, -1, -1, 0])
+    idqc = np.array([0, 0, 3, 4, 15, 16, -1, 4])
+    codes = classifyConv(iuse, idqc, 4)
+    np.testing.assert_array_equal(codes, [ASSIMILATED, REJECTED, REJECTED, MONITORED, MONITORED, REJECTED, REJECTED, -1])
+
+
+def test_classify_rad_edges():
+    iuse = np.array([1, 1, -1, 0, -2])
+    idqc = np.array([0, 3, 0, 7, 0])
+    codes = classifyRad(iuse, idqc)
+    np.testing.assert_array_equal(codes, [ASSIMILATED, REJECTED, MONITORED_ASSIM, MONITORED_REJECT, -1])
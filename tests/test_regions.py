@@ -0,0 +1,46 @@
+"""
+Tests of the spatial index (gsidiag.regions) against a test of every observation.
+"""
+import numpy as np
+import pytest
+
+from gsidiag.regions import REGIONS, spatialIndex, getRegion, _inside
+from gsidiag.synthetic import convObs
+
+
+@pytest.fixture(scope='module')
+def points():
+    obs = convObs('t', 20000, rng=np.random.default_rng(3))
+    lat, lon = obs[:, 2].astype(np.float64), obs[:, 3].astype(np.float64)
+    # points on the edges of the cells and of the regions, and at the poles
+    edges = np.array([[-60.0, -85.0], [15.0, -30.0], [90.0, 0.0], [-90.0, 180.0], [0.0, -180.0],
+                      [0.0, 180.0], [60.0, 150.0], [-60.0, 290.0], [35.0, 345.0], [10.0, 5.0]])
+    return np.concatenate([lat, edges[:, 0]]), np.concatenate([lon, edges[:, 1]])
+
+
+def _bruteForce(lat, lon, region):
+    lon = (lon + 180.0) % 360.0 - 180.0
+    return np.flatnonzero(_inside(lat, lon, getRegion(region)))
+
+
+@pytest.mark.parametrize('res', [5.0, 2.5, 7.0])
+@pytest.mark.parametrize('region', sorted(REGIONS))
+def test_select_region(points, region, res):
+    lat, lon = points
+    index = spatialIndex(lat, lon, res=res)
+    np.testing.assert_array_equal(index.select(region), _bruteForce(lat, lon, region))
+
+
+@pytest.mark.parametrize('area', [[-10.0, -10.0, 10.0, 10.0], [-12.3, 4.7, 33.3, 61.1], [170.0, -30.0, -170.0, 30.0],
+                                  [0.0, -90.0, 360.0, 90.0], [100.0, 10.0, 260.0, 50.0], [20.0, 5.0, 20.0, 80.0],
+                                  [-40.0, 30.0, 40.0, 30.0]])
+def test_select_area(points, area):
+    lat, lon = points
+    index = spatialIndex(lat, lon)
+    np.testing.assert_array_equal(index.select(area), _bruteForce(lat, lon, area))
+
+
+def test_select_with_missing_coordinates():
+    lat = np.array([0.0, np.nan, 10.0, 5.0])
+    lon = np.array([0.0, 5.0, np.nan, 5.0])
+    np.testing.assert_array_equal(spatialIndex(lat, lon).select([-10.0, -10.0, 10.0, 10.0]), [0, 3])
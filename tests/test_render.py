@@ -0,0 +1,40 @@
+"""
+Tests of the rendering of batches of figures (gsidiag.render).
+"""
+import os
+
+import matplotlib
+matplotlib.use('Agg')
+import pytest
+
+from gsidiag.render import renderFigures
+
+
+def _figure(figName, fail=False):
+    import matplotlib.pyplot as plt
+
+    plt.figure()
+    plt.plot([0, 1], [1, 0])
+    if fail:
+        raise ValueError('no observations')
+    plt.savefig(figName)
+
+
+@pytest.mark.parametrize('nWorkers', [1, 2])
+def test_render_figures(tmp_path, nWorkers):
+    names = [str(tmp_path / ('fig{}.png'.format(i))) for i in range(4)]
+    assert renderFigures([(_figure, (name,), {}) for name in names], nWorkers) == 4
+    assert all(os.path.exists(name) for name in names)
+
+
+@pytest.mark.parametrize('nWorkers', [1, 2])
+def test_failed_figure_raises_after_the_others(tmp_path, nWorkers):
+    names = [str(tmp_path / ('fig{}.png'.format(i))) for i in range(4)]
+    jobs  = [(_figure, (name,), {'fail': i == 1}) for i, name in enumerate(names)]
+    with pytest.raises(RuntimeError, match='1 of 4 figures not rendered: .*fig1.png \\(no observations\\)'):
+        renderFigures(jobs, nWorkers)
+    assert [os.path.exists(name) for name in names] == [True, False, True, True]
+
+
+def test_no_jobs():
+    assert renderFigures([], 4) == 0